@@ -5,4 +5,6 @@ class AccountsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "accounts"
 
-
+    def ready(self):
+        # Connects the group membership cache invalidation signals.
+        from . import roles  # noqa: F401
@@ -0,0 +1,93 @@
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.core.exceptions import PermissionDenied
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+
+CACHE_KEY = "accounts:groups:{}"
+
+
+def group_names(user) -> frozenset[str]:
+    """
+    Names of the groups ``user`` belongs to.
+
+    Memoised on the user object, which lives for one request, and cached
+    across requests for ``ROLE_CACHE_SECONDS``; membership and group changes
+    clear the cached entry. Use a shared cache backend with several worker
+    processes, or other workers see changes only when the entry expires.
+    """
+    if not user.is_authenticated:
+        return frozenset()
+    names = getattr(user, "_group_names", None)
+    if names is None:
+        key = CACHE_KEY.format(user.pk)
+        names = cache.get(key)
+        if names is None:
+            names = frozenset(user.groups.values_list("name", flat=True))
+            cache.set(key, names, getattr(settings, "ROLE_CACHE_SECONDS", 300))
+        user._group_names = names
+    return names
+
+
+def has_role(user, group_name: str) -> bool:
+    """Superusers hold every role; other users need to be in ``group_name``."""
+    if not user.is_authenticated:
+        return False
+    return user.is_superuser or group_name in group_names(user)
+
+
+def role_required(group_name: str):
+    def decorator(view_func):
+        @wraps(view_func)
+        def _wrapped(request, *args, **kwargs):
+            if not has_role(request.user, group_name):
+                raise PermissionDenied
+            return view_func(request, *args, **kwargs)
+
+        return _wrapped
+
+    return decorator
+
+
+def forget_groups(user_ids) -> None:
+    cache.delete_many([CACHE_KEY.format(pk) for pk in user_ids])
+
+
+def _membership_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == "pre_clear" and reverse:
+        # pk_set is not given for clear(); note the members before they go.
+        instance._cleared_member_ids = list(instance.user_set.values_list("pk", flat=True))
+        return
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if not reverse:
+        instance.__dict__.pop("_group_names", None)
+        forget_groups([instance.pk])
+    elif action == "post_clear":
+        forget_groups(getattr(instance, "_cleared_member_ids", []))
+    else:
+        forget_groups(pk_set)
+
+
+def _group_changed(sender, instance, **kwargs):
+    # A rename changes every member's names; a deleted group's members are
+    # noted before the delete cascades away.
+    if kwargs.get("created"):
+        return
+    member_ids = getattr(instance, "_deleted_member_ids", None)
+    if member_ids is None:
+        member_ids = instance.user_set.values_list("pk", flat=True)
+    forget_groups(member_ids)
+
+
+def _group_deleting(sender, instance, **kwargs):
+    instance._deleted_member_ids = list(instance.user_set.values_list("pk", flat=True))
+
+
+m2m_changed.connect(_membership_changed, sender=get_user_model().groups.through, weak=False)
+post_save.connect(_group_changed, sender=Group, weak=False)
+pre_delete.connect(_group_deleting, sender=Group, weak=False)
+post_delete.connect(_group_changed, sender=Group, weak=False)
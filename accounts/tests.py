@@ -0,0 +1,51 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.test import TestCase
+
+from .roles import group_names, has_role
+
+
+class GroupNamesTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user("driver", password="x")
+        self.group = Group.objects.create(name="workshop")
+
+    def names(self):
+        # A fresh instance, as the next request would load it.
+        return group_names(get_user_model().objects.get(pk=self.user.pk))
+
+    def test_names_are_cached(self):
+        self.assertEqual(self.names(), frozenset())
+        with self.assertNumQueries(1):
+            self.assertEqual(self.names(), frozenset())
+
+    def test_user_side_add_and_remove(self):
+        self.assertEqual(self.names(), frozenset())
+        self.user.groups.add(self.group)
+        self.assertEqual(self.names(), {"workshop"})
+        self.assertTrue(has_role(self.user, "workshop"))
+        self.user.groups.remove(self.group)
+        self.assertEqual(self.names(), frozenset())
+        self.assertFalse(has_role(self.user, "workshop"))
+
+    def test_group_side_add_remove_and_clear(self):
+        self.assertEqual(self.names(), frozenset())
+        self.group.user_set.add(self.user)
+        self.assertEqual(self.names(), {"workshop"})
+        self.group.user_set.remove(self.user)
+        self.assertEqual(self.names(), frozenset())
+        self.group.user_set.add(self.user)
+        self.assertEqual(self.names(), {"workshop"})
+        self.group.user_set.clear()
+        self.assertEqual(self.names(), frozenset())
+
+    def test_group_rename_and_delete(self):
+        self.user.groups.add(self.group)
+        self.assertEqual(self.names(), {"workshop"})
+        self.group.name = "fleet"
+        self.group.save()
+        self.assertEqual(self.names(), {"fleet"})
+        self.group.delete()
+        self.assertEqual(self.names(), frozenset())
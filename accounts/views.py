@@ -2,11 +2,12 @@ from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth import get_user_model, login
 from django.contrib.auth.decorators import login_required
-from django.core.mail import send_mail
 from django.http import HttpRequest, HttpResponse, HttpResponseBadRequest
 from django.shortcuts import redirect, render
 from django.urls import reverse
 
+from mailqueue.outbox import queue_mail
+
 from .forms import EmailLoginForm, ProfileForm
 from .models import UserProfile
 from .utils import InvalidToken, generate_login_token, is_allowed_email, verify_login_token
@@ -57,12 +58,12 @@ def request_link(request: HttpRequest) -> HttpResponse:
                 f"{url}\n\n"
                 "If you did not request this link you can ignore this email."
             )
-            send_mail(subject, body, settings.DEFAULT_FROM_EMAIL, [email])
+            queue_mail(subject, body, settings.DEFAULT_FROM_EMAIL, [email])
 
             messages.success(
                 request,
                 "We’ve sent a sign-in link to your email. "
-                "For development it will also appear in the console.",
+                "For development it is printed by the send_queued_mail worker.",
             )
             return redirect("accounts:link_sent")
     else:
@@ -0,0 +1,112 @@
+from django.db.models import Count
+
+from myapp.exports import Column, local_day_bounds
+
+from .models import (
+    CorrectiveAction,
+    FieldSample,
+    Incident,
+    NonConformance,
+    SampleCollection,
+    SampleResult,
+)
+
+
+def samples(start, end):
+    low, high = local_day_bounds(start, end)
+    columns = [
+        Column("Sample", "pk"),
+        Column("Collected at", "collected_at"),
+        Column("Test point", "test_point__reference"),
+        Column("Scheme", "test_point__scheme__description"),
+        Column("Collected by", "collected_by__email"),
+    ]
+    queryset = FieldSample.objects.filter(collected_at__gte=low, collected_at__lt=high)
+    return columns, queryset.order_by("collected_at", "pk")
+
+
+def results(start, end):
+    low, high = local_day_bounds(start, end)
+    columns = [
+        Column("Result", "pk"),
+        Column("Sample", "field_sample_id"),
+        Column("Collected at", "field_sample__collected_at"),
+        Column("Test point", "field_sample__test_point__reference"),
+        Column("Test", "test_type__description"),
+        Column("Value", "value"),
+        Column("Units", "test_type__units"),
+        Column("Limit", "test_type__limit"),
+        Column("Comments", "comments"),
+    ]
+    queryset = SampleResult.objects.filter(
+        field_sample__collected_at__gte=low, field_sample__collected_at__lt=high
+    )
+    return columns, queryset.order_by("field_sample__collected_at", "pk")
+
+
+def collections(start, end):
+    low, high = local_day_bounds(start, end)
+    columns = [
+        Column("Collection", "pk"),
+        Column("Sent at", "sent_at"),
+        Column("Received at", "received_at"),
+        Column("Samples", "sample_count"),
+    ]
+    queryset = SampleCollection.objects.filter(sent_at__gte=low, sent_at__lt=high).annotate(
+        sample_count=Count("field_samples")
+    )
+    return columns, queryset.order_by("sent_at", "pk")
+
+
+def non_conformances(start, end):
+    low, high = local_day_bounds(start, end)
+    columns = [
+        Column("Non-conformance", "pk"),
+        Column("Created at", "date_created"),
+        Column("Status", "status", dict(NonConformance.STATUS_CHOICES).get),
+        Column("Test point", "sample_result__field_sample__test_point__reference"),
+        Column("Test", "sample_result__test_type__description"),
+        Column("Value", "sample_result__value"),
+        Column("Limit", "sample_result__test_type__limit"),
+    ]
+    queryset = NonConformance.objects.filter(date_created__gte=low, date_created__lt=high)
+    return columns, queryset.order_by("date_created", "pk")
+
+
+def incidents(start, end):
+    low, high = local_day_bounds(start, end)
+    columns = [
+        Column("Incident", "incident_id"),
+        Column("Occurred at", "occurred_at"),
+        Column("Status", "status", dict(Incident.STATUS_CHOICES).get),
+        Column("Non-conformance", "non_conformance_id"),
+    ]
+    queryset = Incident.objects.filter(occurred_at__gte=low, occurred_at__lt=high)
+    return columns, queryset.order_by("occurred_at", "pk")
+
+
+def corrective_actions(start, end):
+    columns = [
+        Column("Action", "pk"),
+        Column("Incident", "incident__incident_id"),
+        Column("Description", "short_description"),
+        Column("Status", "status", dict(CorrectiveAction.STATUS_CHOICES).get),
+        Column("Estimated delivery", "estimated_delivery_date"),
+        Column("Actual delivery", "actual_delivery_date"),
+        Column("Estimated cost", "estimated_cost"),
+    ]
+    queryset = CorrectiveAction.objects.filter(
+        estimated_delivery_date__gte=start, estimated_delivery_date__lte=end
+    )
+    return columns, queryset.order_by("estimated_delivery_date", "pk")
+
+
+# Export name: (sheet title, function of (start, end) returning columns and rows).
+EXPORTS = {
+    "samples": ("Field samples", samples),
+    "results": ("Sample results", results),
+    "collections": ("Sample collections", collections),
+    "non-conformances": ("Non-conformances", non_conformances),
+    "incidents": ("Incidents", incidents),
+    "actions": ("Corrective actions", corrective_actions),
+}
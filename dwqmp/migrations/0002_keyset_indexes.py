@@ -0,0 +1,31 @@
+# Generated by Django 5.1.4 on 2026-10-18 17:02
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dwqmp', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='fieldsample',
+            index=models.Index(fields=['collected_at', 'id'], name='dwqmp_sample_collected_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='incident',
+            index=models.Index(fields=['occurred_at', 'id'], name='dwqmp_incident_occurred_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='nonconformance',
+            index=models.Index(fields=['date_created', 'id'], name='dwqmp_nc_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='samplecollection',
+            index=models.Index(fields=['sent_at', 'id'], name='dwqmp_collection_sent_idx'),
+        ),
+    ]
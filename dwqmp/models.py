@@ -79,6 +79,9 @@ class FieldSample(models.Model):
         related_name="water_samples_collected",
     )
 
+    class Meta:
+        indexes = [models.Index(fields=["collected_at", "id"], name="dwqmp_sample_collected_idx")]
+
     def __str__(self) -> str:
         return f"Sample at {self.test_point.reference} on {self.collected_at:%Y-%m-%d %H:%M}"
 
@@ -101,6 +104,9 @@ class SampleCollection(models.Model):
         upload_to="sample_attachments/", null=True, blank=True
     )
 
+    class Meta:
+        indexes = [models.Index(fields=["sent_at", "id"], name="dwqmp_collection_sent_idx")]
+
     def __str__(self) -> str:
         return f"Collection sent {self.sent_at:%Y-%m-%d}"
 
@@ -131,6 +137,9 @@ class NonConformance(models.Model):
     date_created = models.DateTimeField(auto_now_add=True)
     status = models.CharField(max_length=2, choices=STATUS_CHOICES)
 
+    class Meta:
+        indexes = [models.Index(fields=["date_created", "id"], name="dwqmp_nc_created_idx")]
+
     def __str__(self) -> str:
         return f"NC for {self.sample_result}"
 
@@ -147,6 +156,9 @@ class Incident(models.Model):
     occurred_at = models.DateTimeField()
     status = models.CharField(max_length=1, choices=STATUS_CHOICES)
 
+    class Meta:
+        indexes = [models.Index(fields=["occurred_at", "id"], name="dwqmp_incident_occurred_idx")]
+
     def __str__(self) -> str:
         return f"Incident {self.incident_id}"
 
@@ -4,6 +4,7 @@ from .views import (
     CorrectiveActionCreateView,
     CorrectiveActionListView,
     CorrectiveActionUpdateView,
+    DWQMPReportExportView,
     DWQMPReportView,
     FieldSampleCreateView,
     FieldSampleListView,
@@ -114,4 +115,9 @@ urlpatterns = [
         name="correctiveaction_update",
     ),
     path("reports/", DWQMPReportView.as_view(), name="report"),
+    path(
+        "reports/<slug:dataset>.<str:fmt>",
+        DWQMPReportExportView.as_view(),
+        name="report_export",
+    ),
 ]
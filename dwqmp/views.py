@@ -1,8 +1,13 @@
 from django.contrib.auth.decorators import login_required
+from django.http import Http404, HttpResponseBadRequest
 from django.utils.decorators import method_decorator
-from django.views.generic import CreateView, DetailView, ListView, TemplateView, UpdateView
+from django.views.generic import CreateView, DetailView, ListView, TemplateView, UpdateView, View
 from django.urls import reverse_lazy
 
+from myapp.exports import EXPORT_FORMATS, export_response
+from myapp.pagination import KeysetPaginationMixin
+
+from .exports import EXPORTS
 from .forms import (
     CorrectiveActionForm,
     DWQMPReportForm,
@@ -103,8 +108,9 @@ class HomeView(TemplateView):
 
 
 @method_decorator(login_required, name="dispatch")
-class ServiceProviderListView(ListView):
+class ServiceProviderListView(KeysetPaginationMixin, ListView):
     model = ServiceProvider
+    ordering = ("name",)
     template_name = "dwqmp/serviceprovider_list.html"
 
 
@@ -125,8 +131,9 @@ class ServiceProviderUpdateView(UpdateView):
 
 
 @method_decorator(login_required, name="dispatch")
-class SchemeListView(ListView):
+class SchemeListView(KeysetPaginationMixin, ListView):
     model = Scheme
+    ordering = ("pk",)
     template_name = "dwqmp/scheme_list.html"
 
 
@@ -162,8 +169,9 @@ class SchemeUpdateView(UpdateView):
 
 
 @method_decorator(login_required, name="dispatch")
-class TestPointListView(ListView):
+class TestPointListView(KeysetPaginationMixin, ListView):
     model = TestPoint
+    ordering = ("pk",)
     template_name = "dwqmp/testpoint_list.html"
 
 
@@ -191,8 +199,9 @@ class TestPointUpdateView(UpdateView):
 
 
 @method_decorator(login_required, name="dispatch")
-class FieldSampleListView(ListView):
+class FieldSampleListView(KeysetPaginationMixin, ListView):
     model = FieldSample
+    ordering = ("-collected_at",)
     template_name = "dwqmp/fieldsample_list.html"
 
 
@@ -213,8 +222,9 @@ class FieldSampleUpdateView(UpdateView):
 
 
 @method_decorator(login_required, name="dispatch")
-class SampleCollectionListView(ListView):
+class SampleCollectionListView(KeysetPaginationMixin, ListView):
     model = SampleCollection
+    ordering = ("-sent_at",)
     template_name = "dwqmp/samplecollection_list.html"
 
 
@@ -235,8 +245,9 @@ class SampleCollectionUpdateView(UpdateView):
 
 
 @method_decorator(login_required, name="dispatch")
-class SampleResultListView(ListView):
+class SampleResultListView(KeysetPaginationMixin, ListView):
     model = SampleResult
+    ordering = ("-pk",)
     template_name = "dwqmp/sampleresult_list.html"
 
 
@@ -257,8 +268,9 @@ class SampleResultUpdateView(UpdateView):
 
 
 @method_decorator(login_required, name="dispatch")
-class NonConformanceListView(ListView):
+class NonConformanceListView(KeysetPaginationMixin, ListView):
     model = NonConformance
+    ordering = ("-date_created",)
     template_name = "dwqmp/nonconformance_list.html"
 
 
@@ -279,8 +291,9 @@ class NonConformanceUpdateView(UpdateView):
 
 
 @method_decorator(login_required, name="dispatch")
-class IncidentListView(ListView):
+class IncidentListView(KeysetPaginationMixin, ListView):
     model = Incident
+    ordering = ("-occurred_at",)
     template_name = "dwqmp/incident_list.html"
 
 
@@ -301,8 +314,9 @@ class IncidentUpdateView(UpdateView):
 
 
 @method_decorator(login_required, name="dispatch")
-class CorrectiveActionListView(ListView):
+class CorrectiveActionListView(KeysetPaginationMixin, ListView):
     model = CorrectiveAction
+    ordering = ("-pk",)
     template_name = "dwqmp/correctiveaction_list.html"
 
 
@@ -358,4 +372,21 @@ class DWQMPReportView(TemplateView):
                 "incidents": incidents,
                 "actions": corrective_actions,
             }
+        context["exports"] = [(name, title) for name, (title, _) in EXPORTS.items()]
         return context
+
+
+@method_decorator(login_required, name="dispatch")
+class DWQMPReportExportView(View):
+    def get(self, request, dataset, fmt):
+        if dataset not in EXPORTS or fmt not in EXPORT_FORMATS:
+            raise Http404
+        form = DWQMPReportForm(request.GET)
+        if not form.is_valid():
+            return HttpResponseBadRequest("start_date and end_date are required.")
+        start, end = form.cleaned_data["start_date"], form.cleaned_data["end_date"]
+        title, build = EXPORTS[dataset]
+        columns, queryset = build(start, end)
+        return export_response(
+            fmt, f"water-{dataset}-{start}-to-{end}", columns, queryset, sheet_name=title
+        )
@@ -5,4 +5,6 @@ class FleetConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "fleet"
 
-
+    def ready(self):
+        # Connects the signals that drop stale monthly report summaries.
+        from . import reports  # noqa: F401
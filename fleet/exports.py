@@ -0,0 +1,54 @@
+from myapp.exports import Column, local_day_bounds
+
+from .models import DefectReport, MaintenanceRecord, Vehicle
+
+_CATEGORIES = dict(Vehicle.CATEGORY_CHOICES)
+
+VEHICLE_COLUMNS = [
+    Column("Unit", "vehicle__unit_number"),
+    Column("Registration", "vehicle__registration"),
+    Column("Category", "vehicle__category", _CATEGORIES.get),
+    Column("Department", "vehicle__department"),
+]
+
+DEFECT_COLUMNS = [
+    Column("Defect", "pk"),
+    Column("Reported at", "reported_at"),
+    *VEHICLE_COLUMNS,
+    Column("Severity", "severity", dict(DefectReport.SEVERITY_CHOICES).get),
+    Column("Status", "status", dict(DefectReport.STATUS_CHOICES).get),
+    Column("Description", "description"),
+    Column("Reported by", "reported_by__email"),
+    Column("Resolved at", "resolved_at"),
+    Column("Workshop notes", "workshop_notes"),
+]
+
+MAINTENANCE_COLUMNS = [
+    Column("Record", "pk"),
+    Column("Date", "date"),
+    *VEHICLE_COLUMNS,
+    Column("Description", "description"),
+    Column("Odometer (km)", "odometer_km"),
+    Column("Cost", "cost"),
+    Column("Next due", "next_due_date"),
+    Column("Defect", "defect_report_id"),
+    Column("Submitted by", "submitted_by__email"),
+]
+
+
+def defects(start, end):
+    low, high = local_day_bounds(start, end)
+    queryset = DefectReport.objects.filter(reported_at__gte=low, reported_at__lt=high)
+    return DEFECT_COLUMNS, queryset.order_by("reported_at", "pk")
+
+
+def maintenance(start, end):
+    queryset = MaintenanceRecord.objects.filter(date__gte=start, date__lte=end)
+    return MAINTENANCE_COLUMNS, queryset.order_by("date", "pk")
+
+
+# Export name: (sheet title, function of (start, end) returning columns and rows).
+EXPORTS = {
+    "defects": ("Defects", defects),
+    "maintenance": ("Maintenance", maintenance),
+}
@@ -0,0 +1,29 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from fleet.reports import rebuild_monthly_summaries
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the stored monthly fleet report summaries, e.g. after "
+        "defects or maintenance records were changed in bulk."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--since",
+            metavar="YYYY-MM-DD",
+            help="Only months from this date on (default: all).",
+        )
+
+    def handle(self, *args, **options) -> None:
+        since = None
+        if options["since"]:
+            try:
+                since = datetime.date.fromisoformat(options["since"])
+            except ValueError:
+                raise CommandError(f"Invalid date {options['since']!r}") from None
+        count = rebuild_monthly_summaries(since)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} monthly summaries"))
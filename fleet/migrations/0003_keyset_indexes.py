@@ -0,0 +1,23 @@
+# Generated by Django 5.1.4 on 2026-10-18 17:02
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fleet', '0002_remove_maintenancerecord_created_by_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='defectreport',
+            index=models.Index(fields=['reported_at', 'id'], name='fleet_defect_reported_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='maintenancerecord',
+            index=models.Index(fields=['date', 'id'], name='fleet_maint_date_idx'),
+        ),
+    ]
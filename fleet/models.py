@@ -1,8 +1,9 @@
 from django.conf import settings
-from django.core.mail import send_mail
 from django.db import models
 from django.utils import timezone
 
+from mailqueue.outbox import queue_mail
+
 
 def maintenance_evidence_upload_to(instance, filename):
     record = None
@@ -18,6 +19,10 @@ def maintenance_evidence_upload_to(instance, filename):
     return f"fleet/maintenance/{unit_folder}/{date.year}/{date.month:02d}/{filename}"
 
 
+def _loaded_values(field_names, values, wanted) -> dict:
+    return {name: value for name, value in zip(field_names, values) if name in wanted}
+
+
 class Vehicle(models.Model):
     CATEGORY_CHOICES = [
         ("light", "Light Vehicle"),
@@ -58,6 +63,9 @@ class DefectReport(models.Model):
         ("resolved", "Resolved"),
         ("closed", "Closed"),
     ]
+    CLOSED_STATUSES = ("resolved", "closed")
+    # Fields that decide which report months (fleet.reports) a row counts in.
+    SUMMARY_FIELDS = ("reported_at", "resolved_at")
 
     vehicle = models.ForeignKey(
         Vehicle, on_delete=models.CASCADE, related_name="defects"
@@ -82,19 +90,42 @@ class DefectReport(models.Model):
 
     class Meta:
         ordering = ["-reported_at"]
+        indexes = [
+            models.Index(fields=["reported_at", "id"], name="fleet_defect_reported_idx"),
+            models.Index(fields=["resolved_at"], name="fleet_defect_resolved_idx"),
+        ]
 
     def __str__(self) -> str:
         return f"Defect on {self.vehicle} ({self.get_severity_display()})"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored status so save() can spot a change without
+        # querying for it again.
+        if "status" in field_names:
+            instance._loaded_status = instance.status
+        instance._loaded_summary_fields = _loaded_values(field_names, values, cls.SUMMARY_FIELDS)
+        return instance
+
     def save(self, *args, **kwargs):
         previous_status = None
-        if self.pk:
-            previous_status = (
-                DefectReport.objects.filter(pk=self.pk)
-                .values_list("status", flat=True)
-                .first()
-            )
+        if not self._state.adding:
+            previous_status = getattr(self, "_loaded_status", None)
+            if previous_status is None:
+                # Loaded with status deferred.
+                previous_status = (
+                    DefectReport.objects.filter(pk=self.pk)
+                    .values_list("status", flat=True)
+                    .first()
+                )
+        if self.status in self.CLOSED_STATUSES:
+            if self.resolved_at is None:
+                self.resolved_at = timezone.now()
+        elif previous_status in self.CLOSED_STATUSES:
+            self.resolved_at = None
         super().save(*args, **kwargs)
+        self._loaded_status = self.status
         if (
             previous_status is not None
             and previous_status != self.status
@@ -114,13 +145,7 @@ class DefectReport(models.Model):
             f"{self.workshop_notes or 'No notes added.'}\n\n"
             "You will receive further updates as the status changes."
         )
-        send_mail(
-            subject,
-            message,
-            settings.DEFAULT_FROM_EMAIL,
-            [self.reported_by.email],
-            fail_silently=True,
-        )
+        queue_mail(subject, message, settings.DEFAULT_FROM_EMAIL, [self.reported_by.email])
 
     def get_status_display_value(self, value: str) -> str:
         return dict(self.STATUS_CHOICES).get(value, value)
@@ -150,12 +175,23 @@ class MaintenanceRecord(models.Model):
     cost = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
     next_due_date = models.DateField(null=True, blank=True)
 
+    SUMMARY_FIELDS = ("date",)
+
     class Meta:
         ordering = ["-date"]
+        indexes = [
+            models.Index(fields=["date", "id"], name="fleet_maint_date_idx"),
+        ]
 
     def __str__(self) -> str:
         return f"{self.vehicle} maintenance on {self.date}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_summary_fields = _loaded_values(field_names, values, cls.SUMMARY_FIELDS)
+        return instance
+
 
 class MaintenanceEvidence(models.Model):
     maintenance_record = models.ForeignKey(
@@ -181,3 +217,21 @@ class MaintenanceEvidence(models.Model):
             f"Evidence for {self.maintenance_record.vehicle} on "
             f"{self.maintenance_record.date}"
         )
+
+
+class MonthlySummary(models.Model):
+    """
+    Fleet report aggregates for one calendar month, per vehicle, written by
+    ``fleet.reports`` once the month is over and dropped when a defect or
+    maintenance record in it changes.
+    """
+
+    month = models.DateField(unique=True)
+    data = models.JSONField()
+    computed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["month"]
+
+    def __str__(self) -> str:
+        return f"Fleet summary for {self.month:%Y-%m}"
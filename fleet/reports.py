@@ -0,0 +1,296 @@
+import datetime
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.utils import timezone
+
+from .models import DefectReport, MaintenanceRecord, MonthlySummary, Vehicle
+
+METRICS = ("new_defects", "closed_defects", "resolve_seconds", "maintenance_records", "maintenance_cost")
+
+
+def local_midnight(day: datetime.date) -> datetime.datetime:
+    return timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+
+
+def month_start(day: datetime.date) -> datetime.date:
+    return day.replace(day=1)
+
+
+def next_month(month: datetime.date) -> datetime.date:
+    return (month + datetime.timedelta(days=32)).replace(day=1)
+
+
+def _empty_row() -> dict:
+    return {
+        "new_defects": 0,
+        "closed_defects": 0,
+        "resolve_seconds": 0.0,
+        "maintenance_records": 0,
+        "maintenance_cost": Decimal("0"),
+    }
+
+
+def compute_period(start: datetime.date, end: datetime.date) -> dict:
+    """
+    Aggregates for the days ``start`` up to but excluding ``end``, per
+    vehicle and by severity, in three grouped queries.
+
+    Times are compared against local midnights (``reported_at >= a AND
+    reported_at < b``), which can use the indexes on the columns, where
+    ``__date`` lookups wrap each column in a function.
+    """
+    low, high = local_midnight(start), local_midnight(end)
+    vehicles = defaultdict(_empty_row)
+    severity = {}
+
+    new_defects = (
+        DefectReport.objects.filter(reported_at__gte=low, reported_at__lt=high)
+        .order_by()
+        .values("vehicle_id", "severity")
+        .annotate(count=Count("pk"))
+    )
+    for row in new_defects:
+        vehicles[row["vehicle_id"]]["new_defects"] += row["count"]
+        severity[row["severity"]] = severity.get(row["severity"], 0) + row["count"]
+
+    closed_defects = (
+        DefectReport.objects.filter(
+            status__in=DefectReport.CLOSED_STATUSES, resolved_at__gte=low, resolved_at__lt=high
+        )
+        .order_by()
+        .values("vehicle_id")
+        .annotate(count=Count("pk"), duration=Sum(F("resolved_at") - F("reported_at")))
+    )
+    for row in closed_defects:
+        totals = vehicles[row["vehicle_id"]]
+        totals["closed_defects"] = row["count"]
+        totals["resolve_seconds"] = row["duration"].total_seconds() if row["duration"] else 0.0
+
+    maintenance = (
+        MaintenanceRecord.objects.filter(date__gte=start, date__lt=end)
+        .order_by()
+        .values("vehicle_id")
+        .annotate(count=Count("pk"), cost=Sum("cost"))
+    )
+    for row in maintenance:
+        totals = vehicles[row["vehicle_id"]]
+        totals["maintenance_records"] = row["count"]
+        totals["maintenance_cost"] = row["cost"] or Decimal("0")
+
+    return {"severity": severity, "vehicles": dict(vehicles)}
+
+
+def _to_json(period: dict) -> dict:
+    return {
+        "severity": period["severity"],
+        "vehicles": {
+            str(vehicle_id): {**row, "maintenance_cost": str(row["maintenance_cost"])}
+            for vehicle_id, row in period["vehicles"].items()
+        },
+    }
+
+
+def _from_json(data: dict) -> dict:
+    return {
+        "severity": data["severity"],
+        "vehicles": {
+            int(vehicle_id): {**row, "maintenance_cost": Decimal(row["maintenance_cost"])}
+            for vehicle_id, row in data["vehicles"].items()
+        },
+    }
+
+
+def monthly_summaries(months: list[datetime.date]) -> list[dict]:
+    """Stored aggregates for whole past ``months``, computing and saving any missing."""
+    stored = {
+        summary.month: _from_json(summary.data)
+        for summary in MonthlySummary.objects.filter(month__in=months)
+    }
+    missing = [month for month in months if month not in stored]
+    for month in missing:
+        stored[month] = compute_period(month, next_month(month))
+    if missing:
+        MonthlySummary.objects.bulk_create(
+            [MonthlySummary(month=month, data=_to_json(stored[month])) for month in missing],
+            update_conflicts=True,
+            unique_fields=["month"],
+            update_fields=["data", "computed_at"],
+        )
+    return [stored[month] for month in months]
+
+
+def rebuild_monthly_summaries(since: datetime.date | None = None) -> int:
+    """
+    Recompute stored summaries for every ended month from ``since`` (default:
+    the earliest defect or maintenance record). Needed after bulk changes that
+    skip model signals, such as ``QuerySet.update()``.
+    """
+    if since is None:
+        earliest = [
+            DefectReport.objects.order_by("reported_at").values_list("reported_at", flat=True).first(),
+            MaintenanceRecord.objects.order_by("date").values_list("date", flat=True).first(),
+        ]
+        if earliest[0] is not None:
+            earliest[0] = timezone.localtime(earliest[0]).date()
+        earliest = [day for day in earliest if day is not None]
+        if not earliest:
+            MonthlySummary.objects.all().delete()
+            return 0
+        since = min(earliest)
+    months = []
+    month, current = month_start(since), month_start(timezone.localdate())
+    while month < current:
+        months.append(month)
+        month = next_month(month)
+    MonthlySummary.objects.filter(month__gte=month_start(since)).delete()
+    monthly_summaries(months)
+    return len(months)
+
+
+def period_parts(start: datetime.date, end: datetime.date, today: datetime.date):
+    """
+    Split the inclusive range ``start``..``end`` into whole months that are
+    over by ``today`` and the ``(start, end)`` day ranges either side of them.
+    """
+    first = start if start.day == 1 else next_month(start)
+    current = month_start(today)
+    months = []
+    month = first
+    while next_month(month) <= end + datetime.timedelta(days=1) and month < current:
+        months.append(month)
+        month = next_month(month)
+    if not months:
+        return [], [(start, end + datetime.timedelta(days=1))]
+    ranges = []
+    if start < months[0]:
+        ranges.append((start, months[0]))
+    after = next_month(months[-1])
+    if after <= end:
+        ranges.append((after, end + datetime.timedelta(days=1)))
+    return months, ranges
+
+
+def _merge(periods: list[dict]) -> dict:
+    severity = defaultdict(int)
+    vehicles = defaultdict(_empty_row)
+    for period in periods:
+        for key, count in period["severity"].items():
+            severity[key] += count
+        for vehicle_id, row in period["vehicles"].items():
+            totals = vehicles[vehicle_id]
+            for metric in METRICS:
+                totals[metric] += row[metric]
+    return {"severity": severity, "vehicles": vehicles}
+
+
+def _finish(label, row: dict) -> dict:
+    closed = row["closed_defects"]
+    mean = datetime.timedelta(seconds=round(row["resolve_seconds"] / closed)) if closed else None
+    return {
+        "label": label,
+        **row,
+        "mean_time_to_resolve": mean,
+        "mean_days_to_resolve": round(mean.total_seconds() / 86400, 1) if mean is not None else None,
+    }
+
+
+def _group(vehicles: dict, key) -> list[dict]:
+    groups = defaultdict(_empty_row)
+    for vehicle, row in vehicles.items():
+        totals = groups[key(vehicle)]
+        for metric in METRICS:
+            totals[metric] += row[metric]
+    return [_finish(label, row) for label, row in sorted(groups.items())]
+
+
+def fleet_summary(start: datetime.date, end: datetime.date) -> dict:
+    """
+    Fleet report for ``start``..``end`` inclusive: totals, new defects by
+    severity, and counts, costs and mean time to resolve per vehicle,
+    vehicle category and department.
+
+    Whole months that have ended come from ``MonthlySummary`` rows, so a
+    year is twelve stored rows plus at most two partial months.
+    """
+    months, ranges = period_parts(start, end, timezone.localdate())
+    merged = _merge(monthly_summaries(months) + [compute_period(a, b) for a, b in ranges])
+
+    by_vehicle = {
+        vehicle: merged["vehicles"][vehicle.pk]
+        for vehicle in Vehicle.objects.filter(pk__in=merged["vehicles"])
+    }
+    totals = _empty_row()
+    for row in merged["vehicles"].values():
+        for metric in METRICS:
+            totals[metric] += row[metric]
+    categories = dict(Vehicle.CATEGORY_CHOICES)
+    return {
+        "start": start,
+        "end": end,
+        "totals": _finish("All vehicles", totals),
+        "by_severity": [
+            (label, merged["severity"].get(value, 0)) for value, label in DefectReport.SEVERITY_CHOICES
+        ],
+        "by_vehicle": [
+            _finish(vehicle, row) for vehicle, row in sorted(by_vehicle.items(), key=lambda item: item[0].unit_number)
+        ],
+        "by_category": _group(by_vehicle, lambda vehicle: categories.get(vehicle.category, vehicle.category)),
+        "by_department": _group(by_vehicle, lambda vehicle: vehicle.department or "Unassigned"),
+    }
+
+
+def forget_months(months) -> None:
+    months = {month for month in months if month is not None}
+    if months:
+        transaction.on_commit(lambda: MonthlySummary.objects.filter(month__in=months).delete())
+
+
+def _months_of(values: dict) -> set:
+    months = set()
+    for value in values.values():
+        if isinstance(value, datetime.datetime):
+            value = timezone.localtime(value).date()
+        if value is not None:
+            months.add(month_start(value))
+    return months
+
+
+def _current_values(instance) -> dict:
+    return {name: getattr(instance, name) for name in type(instance).SUMMARY_FIELDS}
+
+
+def _remember_stored(sender, instance, raw=False, **kwargs):
+    # from_db() records what the row held when it was loaded; query only for
+    # instances built by hand or loaded with those fields deferred.
+    if raw or instance._state.adding:
+        return
+    loaded = getattr(instance, "_loaded_summary_fields", None)
+    if loaded is None or len(loaded) != len(sender.SUMMARY_FIELDS):
+        instance._loaded_summary_fields = (
+            sender.objects.filter(pk=instance.pk).values(*sender.SUMMARY_FIELDS).first() or {}
+        )
+
+
+def _record_saved(sender, instance, created, **kwargs):
+    current = _current_values(instance)
+    months = _months_of(current)
+    stored = getattr(instance, "_loaded_summary_fields", None)
+    if not created and stored and stored != current:
+        months |= _months_of(stored)
+    forget_months(months)
+    instance._loaded_summary_fields = current
+
+
+def _record_deleted(sender, instance, **kwargs):
+    stored = getattr(instance, "_loaded_summary_fields", {})
+    forget_months(_months_of(_current_values(instance)) | _months_of(stored))
+
+
+for model in (DefectReport, MaintenanceRecord):
+    pre_save.connect(_remember_stored, sender=model, weak=False)
+    post_save.connect(_record_saved, sender=model, weak=False)
+    post_delete.connect(_record_deleted, sender=model, weak=False)
@@ -0,0 +1,88 @@
+import datetime
+from decimal import Decimal
+
+from django.test import TestCase
+from django.utils import timezone
+
+from .models import DefectReport, MaintenanceRecord, MonthlySummary, Vehicle
+from .reports import fleet_summary
+
+JAN, FEB = datetime.date(2024, 1, 1), datetime.date(2024, 2, 1)
+
+
+def at(day: datetime.date) -> datetime.datetime:
+    return timezone.make_aware(datetime.datetime.combine(day, datetime.time(9)))
+
+
+class FleetSummaryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        heavy = Vehicle.objects.create(unit_number=1, category="heavy", department="Roads")
+        light = Vehicle.objects.create(unit_number=2, category="light")
+        cls.resolved = DefectReport.objects.create(vehicle=heavy, description="brakes", severity="high")
+        cls.open = DefectReport.objects.create(vehicle=light, description="mirror")
+        # update() keeps these fixed times from reaching the summary signals.
+        DefectReport.objects.filter(pk=cls.resolved.pk).update(
+            reported_at=at(datetime.date(2024, 1, 10)),
+            resolved_at=at(datetime.date(2024, 1, 12)),
+            status="resolved",
+        )
+        DefectReport.objects.filter(pk=cls.open.pk).update(reported_at=at(datetime.date(2024, 2, 5)))
+        cls.service = MaintenanceRecord.objects.create(
+            vehicle=heavy, date=datetime.date(2024, 1, 20), description="service", cost=Decimal("100")
+        )
+        MaintenanceRecord.objects.create(
+            vehicle=light, date=datetime.date(2024, 2, 10), description="tyres", cost=Decimal("50.50")
+        )
+
+    def summary(self, start=JAN, end=datetime.date(2024, 2, 29)):
+        return fleet_summary(start, end)
+
+    def stored_months(self):
+        return set(MonthlySummary.objects.values_list("month", flat=True))
+
+    def test_totals_and_groups(self):
+        report = self.summary()
+        totals = report["totals"]
+        self.assertEqual(
+            [totals[metric] for metric in ("new_defects", "closed_defects", "maintenance_records", "maintenance_cost")],
+            [2, 1, 2, Decimal("150.50")],
+        )
+        self.assertEqual(totals["mean_days_to_resolve"], 2.0)
+        self.assertEqual(dict(report["by_severity"]), {"Low": 1, "Medium": 0, "High": 1, "Critical": 0})
+        self.assertEqual([row["label"] for row in report["by_category"]], ["Heavy Vehicle", "Light Vehicle"])
+        self.assertEqual([row["label"] for row in report["by_department"]], ["Roads", "Unassigned"])
+        self.assertEqual(self.stored_months(), {JAN, FEB})
+        # Served from the stored months the second time.
+        self.assertEqual(self.summary(), report)
+
+    def test_partial_months_are_computed_from_rows(self):
+        totals = self.summary(start=datetime.date(2024, 1, 15))["totals"]
+        self.assertEqual((totals["new_defects"], totals["maintenance_records"]), (1, 2))
+        self.assertEqual(self.stored_months(), {FEB})
+
+    def test_moving_a_record_between_months_forgets_both(self):
+        self.summary()
+        record = MaintenanceRecord.objects.get(pk=self.service.pk)
+        record.date = datetime.date(2024, 2, 20)
+        with self.captureOnCommitCallbacks(execute=True):
+            record.save()
+        self.assertEqual(self.stored_months(), set())
+        self.assertEqual(self.summary(end=datetime.date(2024, 1, 31))["totals"]["maintenance_records"], 0)
+
+        defect = DefectReport.objects.get(pk=self.open.pk)
+        defect.reported_at = at(datetime.date(2024, 1, 25))
+        with self.captureOnCommitCallbacks(execute=True):
+            defect.save()
+        self.assertEqual(self.stored_months(), set())
+        self.assertEqual(self.summary(end=datetime.date(2024, 1, 31))["totals"]["new_defects"], 2)
+
+    def test_reopening_a_defect_forgets_the_month_it_was_resolved(self):
+        self.summary()
+        defect = DefectReport.objects.get(pk=self.resolved.pk)
+        defect.status = "open"
+        with self.captureOnCommitCallbacks(execute=True):
+            defect.save()
+        self.assertIsNone(defect.resolved_at)
+        self.assertEqual(self.stored_months(), {FEB})
+        self.assertEqual(self.summary()["totals"]["closed_defects"], 0)
@@ -34,4 +34,9 @@ urlpatterns = [
         name="maintenance_update",
     ),
     path("reports/", views.fleet_report, name="report"),
+    path(
+        "reports/<slug:dataset>.<str:fmt>",
+        views.fleet_report_export,
+        name="report_export",
+    ),
 ]
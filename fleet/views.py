@@ -1,10 +1,15 @@
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.http import Http404, HttpResponseBadRequest
 from django.shortcuts import get_object_or_404, redirect, render
 
+from myapp.exports import EXPORT_FORMATS, export_response
+from myapp.pagination import paginate_by_key
+
+from .exports import EXPORTS
 from .forms import FleetReportForm, DefectReportForm, MaintenanceRecordForm, VehicleForm
 from .models import DefectReport, MaintenanceEvidence, MaintenanceRecord, Vehicle
 from .permissions import fleet_admin_required, user_is_fleet_admin
+from .reports import fleet_summary
 
 
 @login_required
@@ -13,11 +18,8 @@ def defect_list(request):
     defects_qs = (
         DefectReport.objects.filter(status__in=["open", "in_progress"])
         .select_related("vehicle", "reported_by")
-        .order_by("-reported_at")
     )
-    paginator = Paginator(defects_qs, 20)
-    page_number = request.GET.get("page")
-    page_obj = paginator.get_page(page_number)
+    page_obj = paginate_by_key(request, defects_qs, 20, ("-reported_at", "-pk"))
     return render(
         request,
         "fleet/defect_list.html",
@@ -31,11 +33,8 @@ def defect_all_list(request):
     defects = (
         DefectReport.objects.select_related("vehicle", "reported_by")
         .prefetch_related("maintenance_records")
-        .order_by("-reported_at")
     )
-    paginator = Paginator(defects, 50)
-    page_number = request.GET.get("page")
-    page_obj = paginator.get_page(page_number)
+    page_obj = paginate_by_key(request, defects, 50, ("-reported_at", "-pk"))
     return render(
         request,
         "fleet/defect_all_list.html",
@@ -60,11 +59,8 @@ def maintenance_list(request):
     records = (
         MaintenanceRecord.objects.select_related("vehicle", "submitted_by", "defect_report")
         .prefetch_related("evidence_documents")
-        .order_by("-date", "-pk")
     )
-    paginator = Paginator(records, 50)
-    page_number = request.GET.get("page")
-    page_obj = paginator.get_page(page_number)
+    page_obj = paginate_by_key(request, records, 50, ("-date", "-pk"))
     return render(
         request,
         "fleet/maintenance_list.html",
@@ -293,32 +289,37 @@ def _save_record_evidence(record, files, user):
 @fleet_admin_required
 def fleet_report(request):
     form = FleetReportForm(request.GET or None)
-    results = None
+    results = breakdowns = None
     if form.is_valid():
-        start = form.cleaned_data["start_date"]
-        end = form.cleaned_data["end_date"]
-        new_defects = (
-            DefectReport.objects.filter(reported_at__date__gte=start, reported_at__date__lte=end)
-            .select_related("vehicle", "reported_by")
-            .order_by("-reported_at")
-        )
-        closed_defects = (
-            DefectReport.objects.filter(
-                status__in=["resolved", "closed"], resolved_at__date__gte=start, resolved_at__date__lte=end
-            )
-            .select_related("vehicle", "reported_by")
-            .order_by("-resolved_at")
-        )
-        maintenance = (
-            MaintenanceRecord.objects.filter(date__gte=start, date__lte=end)
-            .select_related("vehicle", "submitted_by", "defect_report")
-            .order_by("-date")
-        )
-        results = {
-            "start": start,
-            "end": end,
-            "new_defects": new_defects,
-            "closed_defects": closed_defects,
-            "maintenance_records": maintenance,
-        }
-    return render(request, "fleet/report.html", {"form": form, "results": results})
+        results = fleet_summary(form.cleaned_data["start_date"], form.cleaned_data["end_date"])
+        breakdowns = [
+            ("By category", results["by_category"]),
+            ("By department", results["by_department"]),
+            ("By vehicle", results["by_vehicle"]),
+        ]
+    return render(
+        request,
+        "fleet/report.html",
+        {
+            "form": form,
+            "results": results,
+            "breakdowns": breakdowns,
+            "exports": [(name, title) for name, (title, _) in EXPORTS.items()],
+        },
+    )
+
+
+@login_required
+@fleet_admin_required
+def fleet_report_export(request, dataset, fmt):
+    if dataset not in EXPORTS or fmt not in EXPORT_FORMATS:
+        raise Http404
+    form = FleetReportForm(request.GET)
+    if not form.is_valid():
+        return HttpResponseBadRequest("start_date and end_date are required.")
+    start, end = form.cleaned_data["start_date"], form.cleaned_data["end_date"]
+    title, build = EXPORTS[dataset]
+    columns, queryset = build(start, end)
+    return export_response(
+        fmt, f"fleet-{dataset}-{start}-to-{end}", columns, queryset, sheet_name=title
+    )
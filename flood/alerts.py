@@ -0,0 +1,234 @@
+import queue
+import threading
+
+from django.conf import settings
+from django.core.mail import send_mail
+from django.db import connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .levels import level_state, site_thresholds
+from .models import FloodAlert, FloodSite
+
+# Order of the level states from dry to flooded; "unknown" is the band
+# between the low and high triggers.
+SEVERITY = {"low_low": 0, "low": 1, "unknown": 2, "high": 3, "high_high": 4}
+NORMAL = SEVERITY["unknown"]
+BOUNDARIES = ("low_low", "low", "high", "high_high")
+
+# Alerts into or out of these states are sent to the notification backends;
+# other transitions are only recorded.
+NOTIFY_STATES = ("high", "high_high")
+
+_STOP = object()
+
+
+def next_state(current: str, distance_mm: int, thresholds, hysteresis_mm: int = 0) -> str:
+    """
+    The level state a reading moves a site to, given its current state.
+
+    Moving further from normal (rising into high or high_high, drying into
+    low or low_low) happens at the trigger. Moving back towards normal only
+    happens once the reading has cleared the current state's trigger by
+    ``hysteresis_mm``, so a level hovering at a trigger does not flap.
+    """
+    proposed = level_state(distance_mm, thresholds)
+    if proposed == current or current not in SEVERITY:
+        return proposed
+    rank, proposed_rank = SEVERITY[current], SEVERITY[proposed]
+    boundary = dict(zip(BOUNDARIES, thresholds)).get(current)
+    if boundary is not None and hysteresis_mm:
+        if rank > NORMAL and proposed_rank < rank and distance_mm > boundary - hysteresis_mm:
+            return current
+        if rank < NORMAL and proposed_rank > rank and distance_mm < boundary + hysteresis_mm:
+            return current
+    return proposed
+
+
+def is_notifiable(alert: FloodAlert) -> bool:
+    return alert.state in NOTIFY_STATES or alert.previous_state in NOTIFY_STATES
+
+
+def pending_alerts():
+    return FloodAlert.objects.filter(notified_at__isnull=True).filter(
+        Q(state__in=NOTIFY_STATES) | Q(previous_state__in=NOTIFY_STATES)
+    )
+
+
+class AlertEngine:
+    """
+    Per-site level state machine evaluated as uplinks are stored.
+
+    State lives in memory (seeded from ``FloodSite.alert_state``) and
+    thresholds come from the ingest ``SiteIndex``, so checking an uplink is
+    a dictionary lookup and a few comparisons; the database is only written
+    when a transition is confirmed. A new state must be seen on ``debounce``
+    consecutive uplinks before it is confirmed.
+    """
+
+    def __init__(
+        self,
+        sites,
+        *,
+        hysteresis_mm: int = 50,
+        debounce: int = 2,
+        dispatcher=None,
+        on_error=None,
+    ):
+        self.sites = sites
+        self.hysteresis_mm = hysteresis_mm
+        self.debounce = max(1, debounce)
+        self.dispatcher = dispatcher
+        self.on_error = on_error
+        self.raised = 0
+        # site pk -> [confirmed state, candidate state, consecutive count]
+        self._tracks: dict[int, list] = {}
+
+    def process(self, uplinks) -> list[FloodAlert]:
+        alerts = []
+        for uplink in uplinks:
+            site = self.sites.get(uplink.site_id)
+            if site is None:
+                continue
+            track = self._tracks.get(site.pk)
+            if track is None:
+                track = self._tracks[site.pk] = [site.alert_state, None, 0]
+            confirmed = track[0]
+            proposed = next_state(
+                confirmed, uplink.distance_mm, site_thresholds(site), self.hysteresis_mm
+            )
+            if proposed == confirmed:
+                track[1], track[2] = None, 0
+                continue
+            if proposed == track[1]:
+                track[2] += 1
+            else:
+                track[1], track[2] = proposed, 1
+            if track[2] < self.debounce:
+                continue
+            track[:] = [proposed, None, 0]
+            alerts.append(
+                FloodAlert(
+                    site_id=site.pk,
+                    previous_state=confirmed,
+                    state=proposed,
+                    distance_mm=uplink.distance_mm,
+                    uplink_id=uplink.pk,
+                    created_at=uplink.received_at,
+                )
+            )
+        if alerts:
+            try:
+                self._record(alerts)
+            except Exception as exc:  # noqa: BLE001
+                self._report(f"Could not record {len(alerts)} flood alerts: {exc}")
+                return []
+        return alerts
+
+    def _record(self, alerts: list[FloodAlert]) -> None:
+        with transaction.atomic():
+            alerts = FloodAlert.objects.bulk_create(alerts)
+            latest = {alert.site_id: alert.state for alert in alerts}
+            for site_id, state in latest.items():
+                FloodSite.objects.filter(pk=site_id).update(alert_state=state)
+        self.raised += len(alerts)
+        if self.dispatcher is not None:
+            self.dispatcher.submit([alert.pk for alert in alerts if is_notifiable(alert)])
+
+    def _report(self, message: str) -> None:
+        if self.on_error is not None:
+            self.on_error(message)
+
+
+def load_backends(paths=None) -> list:
+    if paths is None:
+        paths = getattr(settings, "FLOOD_ALERT_BACKENDS", ["flood.alerts.EmailBackend"])
+    return [import_string(path)() for path in paths]
+
+
+def deliver_alerts(alerts, backends) -> tuple[int, int]:
+    """Send alerts through every backend, recording success or the error."""
+    sent = failed = 0
+    for alert in alerts:
+        try:
+            for backend in backends:
+                backend.send(alert)
+        except Exception as exc:  # noqa: BLE001
+            alert.notify_error = str(exc)
+            alert.save(update_fields=["notify_error"])
+            failed += 1
+        else:
+            alert.notified_at = timezone.now()
+            alert.notify_error = ""
+            alert.save(update_fields=["notified_at", "notify_error"])
+            sent += 1
+    return sent, failed
+
+
+class AlertDispatcher:
+    """
+    Deliver alerts from a background thread so slow notification backends
+    (SMTP, webhooks) never hold up ingest. Alerts that fail stay pending and
+    are retried by ``send_flood_alerts``.
+    """
+
+    def __init__(self, backends, *, on_error=None):
+        self.backends = backends
+        self.on_error = on_error
+        self._queue: queue.Queue = queue.Queue()
+        self._thread = threading.Thread(
+            target=self._run, name="flood-alert-dispatcher", daemon=True
+        )
+
+    def start(self) -> "AlertDispatcher":
+        self._thread.start()
+        return self
+
+    def submit(self, alert_ids: list[int]) -> None:
+        if alert_ids:
+            self._queue.put(alert_ids)
+
+    def close(self, timeout: float | None = None) -> None:
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def _run(self) -> None:
+        try:
+            while True:
+                item = self._queue.get()
+                if item is _STOP:
+                    return
+                try:
+                    alerts = FloodAlert.objects.filter(pk__in=item).select_related(
+                        "site", "site__owner"
+                    )
+                    _, failed = deliver_alerts(alerts, self.backends)
+                    if failed and self.on_error is not None:
+                        self.on_error(f"{failed} flood alerts could not be sent; will retry")
+                except Exception as exc:  # noqa: BLE001
+                    if self.on_error is not None:
+                        self.on_error(f"Flood alert dispatch failed: {exc}")
+        finally:
+            connections.close_all()
+
+
+class EmailBackend:
+    """Email ``FLOOD_ALERT_EMAILS`` and the site owner."""
+
+    def send(self, alert: FloodAlert) -> None:
+        site = alert.site
+        recipients = list(getattr(settings, "FLOOD_ALERT_EMAILS", []))
+        if site.owner_id and site.owner.email:
+            recipients.append(site.owner.email)
+        if not recipients:
+            return
+        label = alert.state.replace("_", " ")
+        subject = f"Floodway {site.name}: {label}"
+        message = (
+            f"{site.name} [{site.handle}] ({site.location_description}) changed from "
+            f"'{alert.previous_state.replace('_', ' ')}' to '{label}' "
+            f"at {timezone.localtime(alert.created_at):%Y-%m-%d %H:%M}.\n\n"
+            f"Latest reading: {alert.distance_mm} mm."
+        )
+        send_mail(subject, message, settings.DEFAULT_FROM_EMAIL, sorted(set(recipients)))
@@ -0,0 +1,96 @@
+import gzip
+import json
+import os
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+ARCHIVE_FIELDS = (
+    "id",
+    "site_id",
+    "site__handle",
+    "received_at",
+    "distance_mm",
+    "battery_v",
+    "signal_dbm",
+    "raw_payload",
+)
+
+
+def archive_root() -> Path:
+    return Path(getattr(settings, "FLOOD_ARCHIVE_DIR", settings.BASE_DIR / "archive"))
+
+
+def partition_path(day: date) -> Path:
+    return (
+        archive_root()
+        / "uplinks"
+        / f"{day:%Y}"
+        / f"{day:%m}"
+        / f"{day:%Y-%m-%d}.ndjson.gz"
+    )
+
+
+def write_archive(rows) -> int:
+    """
+    Append uplink rows (dicts keyed by ``ARCHIVE_FIELDS``) to gzip'd NDJSON
+    files partitioned by local calendar day.
+
+    Each call appends a new gzip member, which readers treat as one stream,
+    so partitions can be extended safely by later runs.
+    """
+    partitions: dict[date, list[str]] = defaultdict(list)
+    for row in rows:
+        received_at = row["received_at"]
+        record = {
+            "id": row["id"],
+            "site": row["site_id"],
+            "handle": row["site__handle"],
+            "received_at": received_at.isoformat(),
+            "distance_mm": row["distance_mm"],
+            "battery_v": row["battery_v"],
+            "signal_dbm": row["signal_dbm"],
+            "raw_payload": row["raw_payload"],
+        }
+        partitions[timezone.localdate(received_at)].append(
+            json.dumps(record, separators=(",", ":"))
+        )
+
+    written = 0
+    for day, lines in partitions.items():
+        path = partition_path(day)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "ab") as raw:
+            with gzip.GzipFile(fileobj=raw, mode="wb") as fh:
+                fh.write(("\n".join(lines) + "\n").encode("utf-8"))
+            raw.flush()
+            os.fsync(raw.fileno())
+        written += len(lines)
+    return written
+
+
+def iter_archived(site_id: int, since: datetime, until: datetime):
+    """Yield archived records for one site with ``since <= received_at < until``."""
+    day = timezone.localdate(since)
+    last = timezone.localdate(until)
+    seen: set[int] = set()
+    while day <= last:
+        path = partition_path(day)
+        day += timedelta(days=1)
+        if not path.exists():
+            continue
+        with gzip.open(path, "rt", encoding="utf-8") as fh:
+            for line in fh:
+                record = json.loads(line)
+                if record["site"] != site_id or record["id"] in seen:
+                    continue
+                received_at = parse_datetime(record["received_at"])
+                if since <= received_at < until:
+                    # A run interrupted before deleting can archive a row twice.
+                    seen.add(record["id"])
+                    record["received_at"] = received_at
+                    yield record
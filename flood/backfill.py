@@ -0,0 +1,349 @@
+import csv
+import gzip
+import io
+import json
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timezone as dt_timezone
+from pathlib import Path
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .decoders import DEFAULT_KEYS
+from .models import FloodSite, Uplink
+
+SOURCE_FORMATS = ("csv", "ndjson")
+
+# Column names accepted for the reading time, in priority order. The other
+# columns use the same names as JSON payloads (see ``decoders.DEFAULT_KEYS``),
+# so files written by ``prune_flood_uplinks`` can be loaded back unchanged.
+TIME_KEYS = ("received_at", "timestamp", "time", "datetime")
+COLUMN_KEYS = {**DEFAULT_KEYS, "received_at": TIME_KEYS}
+
+# Uplink fields written by the importer, in the order of parsed rows.
+INSERT_FIELDS = ("site", "received_at", "distance_mm", "battery_v", "signal_dbm", "raw_payload")
+
+
+class BackfillError(Exception):
+    """A source file that cannot be imported at all."""
+
+
+class UnreadableRow:
+    """Stands in for a source line that could not be read; ``RowParser`` rejects it."""
+
+    __slots__ = ("reason",)
+
+    def __init__(self, reason: str):
+        self.reason = reason
+
+
+def source_format(path: str) -> str:
+    suffixes = [suffix.lower() for suffix in Path(path).suffixes if suffix.lower() != ".gz"]
+    if suffixes and suffixes[-1] == ".csv":
+        return "csv"
+    if suffixes and suffixes[-1] in (".ndjson", ".jsonl", ".json"):
+        return "ndjson"
+    raise ValueError(f"Cannot tell the format of {path}; pass --format")
+
+
+def open_source(path: str):
+    if path == "-":
+        return io.TextIOWrapper(sys.stdin.buffer, encoding="utf-8", newline="")
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", newline="")
+    return open(path, encoding="utf-8", newline="")
+
+
+def iter_records(fh, source: str):
+    """
+    Yield one dict per row, reading ``fh`` a line at a time. A line that
+    cannot be read yields an ``UnreadableRow`` instead, so one bad line does
+    not end an import whose earlier chunks are already committed.
+    """
+    if source == "csv":
+        reader = csv.reader(fh)
+        header = next(reader, None)
+        if header is None:
+            return
+        header = [name.strip() for name in header]
+        while True:
+            try:
+                row = next(reader)
+            except StopIteration:
+                return
+            except csv.Error:
+                yield UnreadableRow("Unreadable CSV row")
+                continue
+            if row:
+                yield dict(zip(header, row))
+    else:
+        loads = json.loads
+        for line in fh:
+            if line.strip():
+                try:
+                    yield loads(line)
+                except ValueError:
+                    yield UnreadableRow("Invalid JSON")
+
+
+def _column(keys, names) -> str | None:
+    for name in names:
+        if name in keys:
+            return name
+    return None
+
+
+class RowParser:
+    """
+    Turn source rows into tuples of ``INSERT_FIELDS`` values.
+
+    Sites are resolved from in-memory maps of handle and IMEI, built once,
+    and the columns to read are chosen from the first row's keys, so each
+    row costs a few dictionary lookups. Timestamps may be ISO 8601 or Unix
+    seconds; naive ones are taken to be in ``tz``, and all are returned in
+    UTC. Rows that cannot be used, including lines that are not JSON
+    objects, raise ``ValueError``; a file without the needed columns raises
+    ``BackfillError``.
+    """
+
+    def __init__(self, *, default_site: int | None = None, tz=None, keep_payload: bool = False):
+        self.handles = dict(FloodSite.objects.values_list("handle", "pk"))
+        self.imeis = {
+            imei: pk for pk, imei in FloodSite.objects.exclude(imei="").values_list("pk", "imei")
+        }
+        self.default_site = default_site
+        self.tz = tz or timezone.get_current_timezone()
+        self.keep_payload = keep_payload
+        self.columns = None
+        # Naive timestamps: UTC offset suffix by "YYYY-MM-DDTHH" prefix.
+        self._offsets: dict[str, str] = {}
+
+    def bind(self, keys) -> None:
+        self.columns = {name: _column(keys, names) for name, names in COLUMN_KEYS.items()}
+        if self.columns["received_at"] is None:
+            raise BackfillError(f"No time column; expected one of {', '.join(TIME_KEYS)}")
+        if self.columns["distance_mm"] is None:
+            raise BackfillError(
+                f"No distance column; expected one of {', '.join(DEFAULT_KEYS['distance_mm'])}"
+            )
+        if (
+            self.columns["handle"] is None
+            and self.columns["imei"] is None
+            and self.default_site is None
+        ):
+            raise BackfillError("No site column; pass --site to load every row into one site")
+
+    def parse(self, record: dict) -> tuple:
+        if not isinstance(record, dict):
+            if isinstance(record, UnreadableRow):
+                raise ValueError(record.reason)
+            raise ValueError("Row is not an object")
+        if self.columns is None:
+            self.bind(record.keys())
+        columns = self.columns
+        try:
+            distance_mm = int(float(record[columns["distance_mm"]]))
+        except (KeyError, OverflowError, TypeError, ValueError):
+            raise ValueError("Missing or unparseable distance") from None
+        return (
+            self._site(record),
+            self._time(record.get(columns["received_at"])),
+            distance_mm,
+            self._number(record, columns["battery_v"], float),
+            self._number(record, columns["signal_dbm"], int),
+            record if self.keep_payload else None,
+        )
+
+    def _site(self, record: dict) -> int:
+        column = self.columns["handle"]
+        if column is not None and record.get(column):
+            site_id = self.handles.get(str(record[column]))
+            if site_id is None:
+                raise ValueError(f"Unknown site {record[column]!r}")
+            return site_id
+        column = self.columns["imei"]
+        if column is not None and record.get(column):
+            site_id = self.imeis.get(str(record[column]))
+            if site_id is None:
+                raise ValueError(f"Unknown IMEI {record[column]!r}")
+            return site_id
+        if self.default_site is None:
+            raise ValueError("Row has no site")
+        return self.default_site
+
+    def _time(self, value) -> datetime:
+        if value is None or value == "":
+            raise ValueError("Row has no time")
+        if isinstance(value, (int, float)):
+            return self._from_timestamp(value)
+        if not isinstance(value, str):
+            raise ValueError("Unparseable time")
+        try:
+            parsed = datetime.fromisoformat(value)
+        except ValueError:
+            try:
+                return self._from_timestamp(float(value))
+            except ValueError:
+                raise ValueError("Unparseable time") from None
+        if parsed.tzinfo is None:
+            parsed = self._localise(value, parsed)
+        return parsed.astimezone(dt_timezone.utc)
+
+    @staticmethod
+    def _from_timestamp(value: float) -> datetime:
+        try:
+            return datetime.fromtimestamp(value, dt_timezone.utc)
+        except (OSError, OverflowError, ValueError):
+            raise ValueError("Unparseable time") from None
+
+    def _localise(self, value: str, parsed: datetime) -> datetime:
+        # Attaching a ZoneInfo costs more than parsing. Offsets only change
+        # on the hour, so parse again with a cached offset suffix instead.
+        prefix = value[:13]
+        suffix = self._offsets.get(prefix)
+        if suffix is None:
+            offset = parsed.replace(tzinfo=self.tz).strftime("%z")
+            suffix = f"{offset[:3]}:{offset[3:]}" if len(value) >= 13 and len(offset) == 5 else ""
+            self._offsets[prefix] = suffix
+        if not suffix:
+            return parsed.replace(tzinfo=self.tz)
+        return datetime.fromisoformat(value + suffix)
+
+    @staticmethod
+    def _number(record: dict, column, cast):
+        if column is None:
+            return None
+        value = record.get(column)
+        if value is None or value == "":
+            return None
+        try:
+            return cast(float(value))
+        except (OverflowError, TypeError, ValueError):
+            return None
+
+
+class HistoryImporter:
+    """
+    Load parsed rows in chunks of ``batch_size``, one transaction per chunk.
+
+    Each chunk is one prepared ``INSERT`` run with ``executemany``. Building
+    a model instance per row, plus SQLite's cap on query parameters (a few
+    hundred rows per statement), made ``bulk_create`` several times slower.
+    Only nullable columns are left out, so rows match what the ORM would
+    write.
+
+    With ``skip_existing`` each chunk is first checked against the readings
+    already stored for its sites and time range, so an interrupted import
+    can simply be run again. ``on_progress`` is called after every chunk.
+    """
+
+    def __init__(
+        self,
+        parser: RowParser,
+        *,
+        batch_size: int = 20000,
+        skip_existing: bool = False,
+        dry_run: bool = False,
+        on_progress=None,
+    ):
+        self.parser = parser
+        self.batch_size = max(1, batch_size)
+        self.skip_existing = skip_existing
+        self.dry_run = dry_run
+        self.on_progress = on_progress
+        self.read = 0
+        self.imported = 0
+        self.existing = 0
+        self.rejected: Counter[str] = Counter()
+        self.site_ids: set[int] = set()
+        self.earliest: datetime | None = None
+        self.started = time.monotonic()
+        meta = Uplink._meta
+        quote = connection.ops.quote_name
+        columns = ", ".join(quote(meta.get_field(name).column) for name in INSERT_FIELDS)
+        placeholders = ", ".join(["%s"] * len(INSERT_FIELDS))
+        self._sql = f"INSERT INTO {quote(meta.db_table)} ({columns}) VALUES ({placeholders})"
+
+    @property
+    def rate(self) -> float:
+        return self.read / max(time.monotonic() - self.started, 1e-9)
+
+    def load(self, records) -> None:
+        """Import one source; columns are chosen afresh from its first row."""
+        self.parser.columns = None
+        parse = self.parser.parse
+        chunk: list[tuple] = []
+        for record in records:
+            self.read += 1
+            try:
+                chunk.append(parse(record))
+            except ValueError as exc:
+                self.rejected[str(exc)] += 1
+                continue
+            except (AttributeError, TypeError):
+                # A value of a type the parser does not expect somewhere.
+                self.rejected["Unreadable row"] += 1
+                continue
+            if len(chunk) >= self.batch_size:
+                self._write(chunk)
+                chunk = []
+        if chunk:
+            self._write(chunk)
+
+    def _write(self, chunk: list[tuple]) -> None:
+        if self.skip_existing:
+            chunk = self._without_existing(chunk)
+        if chunk:
+            if not self.dry_run:
+                self._insert(chunk)
+            self.imported += len(chunk)
+            self.site_ids |= {row[0] for row in chunk}
+            earliest = min(row[1] for row in chunk)
+            if self.earliest is None or earliest < self.earliest:
+                self.earliest = earliest
+        if self.on_progress is not None:
+            self.on_progress(self)
+
+    def _insert(self, chunk: list[tuple]) -> None:
+        if connection.vendor == "sqlite":
+            # What adapt_datetimefield_value returns for a UTC datetime
+            # (naive UTC text), at a tenth of the cost.
+            def adapt_time(value):
+                return value.isoformat(" ")[:-6]
+
+        else:
+            adapt_time = connection.ops.adapt_datetimefield_value
+        payload_field = Uplink._meta.get_field("raw_payload")
+        params = [
+            (
+                site_id,
+                adapt_time(received_at),
+                distance,
+                battery,
+                signal,
+                None if payload is None else payload_field.get_db_prep_save(payload, connection),
+            )
+            for site_id, received_at, distance, battery, signal, payload in chunk
+        ]
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.executemany(self._sql, params)
+
+    def _without_existing(self, chunk: list[tuple]) -> list[tuple]:
+        times = [row[1] for row in chunk]
+        stored = set(
+            Uplink.objects.filter(
+                site_id__in={row[0] for row in chunk},
+                received_at__range=(min(times), max(times)),
+            ).values_list("site_id", "received_at")
+        )
+        fresh = []
+        for row in chunk:
+            key = row[:2]
+            if key in stored:
+                self.existing += 1
+            else:
+                stored.add(key)
+                fresh.append(row)
+        return fresh
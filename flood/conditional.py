@@ -0,0 +1,111 @@
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max, Sum
+from django.http import HttpResponse
+from django.utils.cache import (
+    get_conditional_response,
+    patch_cache_control,
+    patch_vary_headers,
+)
+from django.utils.http import http_date, quote_etag
+
+from .models import FloodSite
+
+
+def uplinks_state(request):
+    # latest_uplink ids only ever grow, so their sum changes whenever any
+    # site receives a reading; count and updated_at catch site edits, and
+    # the health changed_at catches sensor flags set by update_flood_health.
+    state = FloodSite.objects.aggregate(
+        count=Count("pk"),
+        pointers=Sum("latest_uplink_id"),
+        edited=Max("updated_at"),
+        received=Max("latest_uplink__received_at"),
+        health=Max("health__changed_at"),
+    )
+    return state, [state["received"], state["edited"], state["health"]]
+
+
+def history_state(request):
+    handle = request.GET.get("handle")
+    if not handle:
+        return None
+    state = (
+        FloodSite.objects.filter(handle=handle)
+        .values("pk", "latest_uplink_id", "updated_at", "latest_uplink__received_at")
+        .first()
+    )
+    if state is None:
+        return None
+    return state, [state["latest_uplink__received_at"], state["updated_at"]]
+
+
+def conditional_api(state_func):
+    """
+    Add ETag/Last-Modified validation and a short-lived response cache to a
+    JSON endpoint.
+
+    ``state_func`` returns a small, cheap-to-query summary of the data behind
+    the response (plus candidate modification times), or ``None`` to bypass
+    caching. The ETag and cache key are derived from that summary, the query
+    string, the ``Accept`` header and the current minute (responses include
+    minutes since the last reading), so new uplinks stored by the listener
+    produce a new key and stale entries simply expire.
+    """
+
+    def decorator(view_func):
+        @wraps(view_func)
+        def _wrapped(request, *args, **kwargs):
+            result = state_func(request)
+            if result is None:
+                return view_func(request, *args, **kwargs)
+            state, modified = result
+
+            minute = int(time.time() // 60)
+            fingerprint = repr(
+                (
+                    request.path,
+                    sorted(request.GET.lists()),
+                    request.headers.get("Accept", ""),
+                    sorted(state.items()),
+                    minute,
+                )
+            )
+            digest = hashlib.md5(fingerprint.encode()).hexdigest()
+            etag = quote_etag(digest)
+            modified = [value for value in modified if value is not None]
+            last_modified = int(max(modified).timestamp()) if modified else None
+
+            response = get_conditional_response(
+                request, etag=etag, last_modified=last_modified
+            )
+            if response is None:
+                ttl = getattr(settings, "FLOOD_API_CACHE_SECONDS", 30)
+                key = f"flood:api:{digest}"
+                cached = cache.get(key)
+                if cached is not None:
+                    content_type, content = cached
+                    response = HttpResponse(content, content_type=content_type)
+                else:
+                    response = view_func(request, *args, **kwargs)
+                    if response.status_code != 200:
+                        return response
+                    if ttl:
+                        cache.set(key, (response["Content-Type"], response.content), ttl)
+
+            response["ETag"] = etag
+            if last_modified is not None:
+                response["Last-Modified"] = http_date(last_modified)
+            # Browsers may keep a copy but must revalidate it, which is a 304.
+            patch_cache_control(response, public=True, no_cache=True)
+            patch_vary_headers(response, ["Accept"])
+            return response
+
+        return _wrapped
+
+    return decorator
+
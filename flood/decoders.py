@@ -0,0 +1,270 @@
+import datetime
+import json
+import math
+import struct
+from dataclasses import dataclass
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+PAYLOAD_FORMATS = ("json", "cbor", "struct")
+
+# Uplink fields a decoder can fill, plus the identifiers used to find a site.
+UPLINK_FIELDS = ("distance_mm", "battery_v", "signal_dbm")
+ID_FIELDS = ("imei", "handle")
+
+# Field names accepted from key/value payloads, in priority order. This is the
+# long-standing "json" profile, so existing sensors keep working unchanged.
+DEFAULT_KEYS = {
+    "imei": ("IMEI", "imei"),
+    "handle": ("handle", "site", "station"),
+    "distance_mm": ("distance_mm", "distance", "WL_Ht"),
+    "battery_v": ("battery", "battery_v"),
+    "signal_dbm": ("signal", "rssi"),
+}
+
+# IntegerField's range on every database Django supports; distance_mm and
+# signal_dbm outside it would fail the whole write batch.
+INTEGER_RANGE = (-(2**31), 2**31 - 1)
+
+BUILTIN_PROFILES = {
+    "json": {"format": "json"},
+    "cbor": {"format": "cbor"},
+    # 5 bytes: distance (mm, uint16), battery (mV, uint16), signal (dBm, int8).
+    "struct": {
+        "format": "struct",
+        "layout": "<HHb",
+        "fields": ["distance_mm", "battery_v", "signal_dbm"],
+        "scale": {"battery_v": 0.001},
+    },
+}
+
+
+class PayloadError(ValueError):
+    pass
+
+
+@dataclass
+class Reading:
+    distance_mm: int
+    battery_v: float | None
+    signal_dbm: int | None
+    raw: dict
+    imei: str | None = None
+    handle: str | None = None
+
+
+def _json_safe(value):
+    """``value`` with CBOR-only types (bytes, tags, datetimes...) turned into JSON ones."""
+    if isinstance(value, dict):
+        return {
+            key if isinstance(key, str) else str(_json_safe(key)): _json_safe(item)
+            for key, item in value.items()
+        }
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return [_json_safe(item) for item in value]
+    if value is None or isinstance(value, (str, bool, int)):
+        return value
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return bytes(value).hex()
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if hasattr(value, "tag") and hasattr(value, "value"):
+        return {"tag": value.tag, "value": _json_safe(value.value)}
+    return str(value)
+
+
+def _getter(keys):
+    if isinstance(keys, str):
+        keys = (keys,)
+    if len(keys) == 1:
+        key = keys[0]
+        return lambda payload: payload.get(key)
+
+    def get(payload):
+        # Same result as ``payload.get(a) or payload.get(b) or ...``.
+        value = None
+        for key in keys:
+            value = payload.get(key)
+            if value:
+                return value
+        return value
+
+    return get
+
+
+class MappingDecoder:
+    """
+    Decode key/value payloads (JSON, or CBOR when ``cbor2`` is installed).
+
+    The field lookups are resolved to getters once, when the profile is
+    built; a profile that names its keys exactly does one ``dict.get`` per
+    field and message. CBOR values JSON cannot hold are converted (bytes to
+    hex, datetimes to ISO 8601) so the payload can be stored.
+    """
+
+    def __init__(self, *, format: str = "json", keys: dict | None = None):
+        self.format = format
+        if format == "cbor":
+            try:
+                import cbor2  # type: ignore[import-not-found]
+            except ImportError as exc:
+                raise ImproperlyConfigured(
+                    "CBOR payload profiles need the 'cbor2' package: pip install cbor2"
+                ) from exc
+            self._loads = cbor2.loads
+        else:
+            self._loads = lambda data: json.loads(data.decode("utf-8"))
+        keys = {**DEFAULT_KEYS, **(keys or {})}
+        self._get = {name: _getter(keys[name]) for name in UPLINK_FIELDS + ID_FIELDS}
+
+    def decode(self, data: bytes) -> Reading:
+        try:
+            payload = self._loads(data)
+        except Exception as exc:  # noqa: BLE001
+            raise PayloadError(f"Received non-{self.format.upper()} payload; ignoring") from exc
+        if not isinstance(payload, dict):
+            raise PayloadError(f"Received non-object {self.format.upper()} payload; ignoring")
+        if self.format == "cbor":
+            # The payload is stored as raw_payload, a JSON column.
+            payload = _json_safe(payload)
+        return self.from_mapping(payload)
+
+    def from_mapping(self, payload: dict) -> Reading:
+        get = self._get
+        distance = get["distance_mm"](payload)
+        if distance is None:
+            raise PayloadError("Payload missing distance field; ignoring")
+        try:
+            distance_mm = int(float(distance))
+        except (OverflowError, TypeError, ValueError) as exc:
+            raise PayloadError("Could not parse distance field; ignoring") from exc
+        if not INTEGER_RANGE[0] <= distance_mm <= INTEGER_RANGE[1]:
+            raise PayloadError("Distance field out of range; ignoring")
+
+        battery = get["battery_v"](payload)
+        signal = get["signal_dbm"](payload)
+        try:
+            battery_v = float(battery) if battery is not None else None
+        except (TypeError, ValueError):
+            battery_v = None
+        if battery_v is not None and not math.isfinite(battery_v):
+            battery_v = None
+        try:
+            signal_dbm = int(signal) if signal is not None else None
+        except (OverflowError, TypeError, ValueError):
+            signal_dbm = None
+        if signal_dbm is not None and not INTEGER_RANGE[0] <= signal_dbm <= INTEGER_RANGE[1]:
+            signal_dbm = None
+
+        return Reading(
+            distance_mm=distance_mm,
+            battery_v=battery_v,
+            signal_dbm=signal_dbm,
+            raw=payload,
+            imei=get["imei"](payload),
+            handle=get["handle"](payload),
+        )
+
+
+class StructDecoder:
+    """
+    Decode fixed-layout binary frames with a precompiled ``struct.Struct``.
+
+    ``fields`` names each packed value; names outside the Uplink fields (a
+    sequence number, ``sent_at``) are kept in ``raw_payload`` only, and
+    ``None`` skips a value. ``scale`` multiplies a field, e.g. millivolts to
+    volts. Frames carry no site identifier, so the site comes from the topic.
+    """
+
+    def __init__(self, *, layout: str, fields: list, scale: dict | None = None):
+        try:
+            self._struct = struct.Struct(layout)
+        except struct.error as exc:
+            raise ImproperlyConfigured(f"Invalid struct layout {layout!r}: {exc}") from exc
+        if len(fields) != len(self._struct.unpack(bytes(self._struct.size))):
+            raise ImproperlyConfigured(
+                f"Struct layout {layout!r} does not match {len(fields)} fields"
+            )
+        if "distance_mm" not in fields:
+            raise ImproperlyConfigured("Struct payload profiles must include distance_mm")
+        self._fields = [(index, name) for index, name in enumerate(fields) if name]
+        self._scale = scale or {}
+
+    def decode(self, data: bytes) -> Reading:
+        if len(data) != self._struct.size:
+            raise PayloadError(
+                f"Expected a {self._struct.size}-byte frame, got {len(data)} bytes; ignoring"
+            )
+        values = self._struct.unpack(data)
+        raw = {}
+        for index, name in self._fields:
+            value = values[index]
+            if name in self._scale:
+                value = round(value * self._scale[name], 6)
+            raw[name] = value
+        return Reading(
+            distance_mm=int(raw["distance_mm"]),
+            battery_v=raw.get("battery_v"),
+            signal_dbm=raw.get("signal_dbm"),
+            raw=raw,
+        )
+
+
+def build_decoder(spec: dict):
+    spec = dict(spec)
+    payload_format = spec.pop("format", "json")
+    if payload_format not in PAYLOAD_FORMATS:
+        raise ImproperlyConfigured(f"Unknown payload format {payload_format!r}")
+    if payload_format == "struct":
+        return StructDecoder(**spec)
+    return MappingDecoder(format=payload_format, **spec)
+
+
+class DecoderRegistry:
+    """
+    Payload decoders keyed by profile name, built once at startup.
+
+    Sites choose a profile with ``FloodSite.payload_profile``; blank means
+    ``default``. Profiles from ``FLOOD_PAYLOAD_PROFILES`` are added to (or
+    replace) the built-in ``json``, ``cbor`` and ``struct`` profiles. The
+    built-in ``cbor`` profile is skipped when ``cbor2`` is not installed.
+    """
+
+    def __init__(self, profiles: dict | None = None, default: str = "json"):
+        self._decoders = {}
+        for name, spec in BUILTIN_PROFILES.items():
+            try:
+                self._decoders[name] = build_decoder(spec)
+            except ImproperlyConfigured:
+                pass
+        for name, spec in (profiles or {}).items():
+            self._decoders[name] = build_decoder(spec)
+        if default not in self._decoders:
+            raise ImproperlyConfigured(f"Unknown default payload profile {default!r}")
+        self.default = self._decoders[default]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._decoders
+
+    def for_site(self, site):
+        name = site.payload_profile if site is not None else ""
+        if not name:
+            return self.default
+        try:
+            return self._decoders[name]
+        except KeyError:
+            raise PayloadError(
+                f"Unknown payload profile {name!r} for site {site.handle}; ignoring"
+            ) from None
+
+
+@lru_cache(maxsize=None)
+def default_registry() -> DecoderRegistry:
+    return DecoderRegistry(
+        getattr(settings, "FLOOD_PAYLOAD_PROFILES", {}),
+        default=getattr(settings, "FLOOD_DEFAULT_PAYLOAD_PROFILE", "json"),
+    )
@@ -0,0 +1,81 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from .models import Uplink
+
+# Payload fields that identify a reading at the device. Decoder profiles can
+# map their own names onto these (for struct frames, name the packed values).
+DEVICE_TIME_KEYS = ("device_time", "ts", "timestamp", "time", "sent_at")
+SEQUENCE_KEYS = ("seq", "fcnt", "sequence")
+
+
+def _first(payload: dict, keys):
+    for key in keys:
+        value = payload.get(key)
+        if value is not None:
+            return value
+    return None
+
+
+def _digest(value) -> str:
+    data = json.dumps(value, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.blake2b(data.encode("utf-8"), digest_size=20).hexdigest()
+
+
+def dedupe_key(uplink: Uplink) -> tuple[str, bool]:
+    """
+    Return ``(key, durable)`` identifying the reading behind an uplink.
+
+    A payload with a device timestamp gets a durable key built from the
+    site, that timestamp and any sequence number; it is stored as the
+    uplink's ``ingest_key`` so the unique constraint catches copies that
+    reach another worker or arrive after a restart. Otherwise the key is a
+    hash of the site and payload content, which is only trusted for a time
+    window: a sensor without a clock can legitimately send identical
+    readings hours apart.
+    """
+    payload = uplink.raw_payload if isinstance(uplink.raw_payload, dict) else {}
+    device_time = _first(payload, DEVICE_TIME_KEYS)
+    if device_time is not None:
+        seq = _first(payload, SEQUENCE_KEYS)
+        return "d" + _digest([uplink.site_id, device_time, seq]), True
+    return "c" + _digest([uplink.site_id, payload]), False
+
+
+class Deduplicator:
+    """
+    Bounded in-memory LRU of recently seen readings.
+
+    Catches retransmissions before they reach the write queue. Content-hash
+    keys only count as duplicates within ``window`` seconds. The LRU forgets
+    the oldest readings beyond ``max_entries``; durable keys are still
+    caught by the database's unique ``ingest_key`` after that.
+    """
+
+    def __init__(self, *, max_entries: int = 100000, window: float = 3600.0):
+        self.max_entries = max(1, max_entries)
+        self.window = window
+        self._seen: OrderedDict[str, float] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._seen)
+
+    def is_duplicate(self, uplink: Uplink) -> bool:
+        key, durable = dedupe_key(uplink)
+        if durable:
+            uplink.ingest_key = key
+        now = time.monotonic()
+        with self._lock:
+            seen_at = self._seen.get(key)
+            if seen_at is not None and (durable or now - seen_at < self.window):
+                self._seen.move_to_end(key)
+                return True
+            self._seen[key] = now
+            self._seen.move_to_end(key)
+            if len(self._seen) > self.max_entries:
+                self._seen.popitem(last=False)
+        return False
@@ -0,0 +1,95 @@
+import json
+import struct
+import sys
+from array import array
+
+from django.http import HttpResponse, JsonResponse
+
+from .levels import LEVEL_STATES
+
+HISTORY_FORMATS = ("json", "columns", "binary")
+BINARY_CONTENT_TYPE = "application/vnd.floodway.history"
+BINARY_MAGIC = b"FLH1"
+
+# Typed-array element type for each history column in the binary format;
+# the names match JavaScript's typed arrays (Float64Array and so on).
+COLUMN_TYPES = {
+    "time": ("d", "f8"),
+    "distance": ("f", "f4"),
+    "level_state": ("B", "u1"),
+    "min": ("i", "i4"),
+    "max": ("i", "i4"),
+    "count": ("I", "u4"),
+}
+
+_LEVEL_CODES = {state: code for code, state in enumerate(LEVEL_STATES)}
+
+
+def history_format(request) -> str | None:
+    """
+    The history format asked for with ``?format=`` or, failing that, the
+    ``Accept`` header; ``None`` for an unknown ``format``.
+    """
+    requested = request.GET.get("format")
+    if requested:
+        return requested if requested in HISTORY_FORMATS else None
+    accept = request.headers.get("Accept", "")
+    if BINARY_CONTENT_TYPE in accept or "application/octet-stream" in accept:
+        return "binary"
+    return "json"
+
+
+def encode_columns(columns: dict[str, list]) -> dict[str, list]:
+    """Times as whole epoch seconds and level states as indexes into ``LEVEL_STATES``."""
+    encoded = dict(columns)
+    encoded["time"] = [int(value.timestamp()) for value in columns["time"]]
+    encoded["level_state"] = [_LEVEL_CODES[state] for state in columns["level_state"]]
+    return encoded
+
+
+def history_response(output: str, meta: dict, columns: dict[str, list]) -> HttpResponse:
+    """
+    Render history ``columns`` (parallel lists keyed by name) as:
+
+    * ``json``: the original list of point objects with ISO timestamps;
+    * ``columns``: JSON with one array per column;
+    * ``binary``: ``FLH1``, a little-endian uint32 header length, a JSON
+      header, then each column as a packed little-endian typed array
+      starting on an 8-byte boundary, so the browser can view it in place.
+    """
+    if output == "json":
+        names = [name for name in columns if name != "time"]
+        points = [
+            {"created_at": row[0].isoformat(), **dict(zip(names, row[1:]))}
+            for row in zip(columns["time"], *(columns[name] for name in names))
+        ]
+        return JsonResponse({**meta, "history": points})
+
+    encoded = encode_columns(columns)
+    count = len(encoded["time"])
+    if output == "columns":
+        return JsonResponse(
+            {**meta, "count": count, "level_states": LEVEL_STATES, "columns": encoded}
+        )
+
+    header = json.dumps(
+        {
+            **meta,
+            "count": count,
+            "level_states": LEVEL_STATES,
+            "columns": [[name, COLUMN_TYPES[name][1]] for name in encoded],
+        },
+        separators=(",", ":"),
+    ).encode("utf-8")
+    parts = [BINARY_MAGIC, struct.pack("<I", len(header)), header]
+    size = len(BINARY_MAGIC) + 4 + len(header)
+    for name, values in encoded.items():
+        parts.append(bytes(-size % 8))
+        size += -size % 8
+        packed = array(COLUMN_TYPES[name][0], values)
+        if sys.byteorder == "big":
+            packed.byteswap()
+        data = packed.tobytes()
+        parts.append(data)
+        size += len(data)
+    return HttpResponse(b"".join(parts), content_type=BINARY_CONTENT_TYPE)
@@ -0,0 +1,154 @@
+import statistics
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import FloodSite, SiteHealth, Uplink
+
+HEALTH_FIELDS = [
+    "last_seen",
+    "expected_interval_s",
+    "offline_after_s",
+    "battery_v",
+    "battery_slope_v_per_day",
+    "signal_mean_dbm",
+    "signal_slope_db_per_day",
+    "sample_count",
+    "offline",
+    "battery_failing",
+    "computed_at",
+    "changed_at",
+]
+
+# Battery and signal trends are only fitted over at least this much history;
+# a few hours of readings say more about temperature than about the cell.
+MIN_TREND_SPAN = timedelta(days=1)
+
+
+def _slope_per_day(times: list[float], values: list) -> float | None:
+    points = [(t, v) for t, v in zip(times, values) if v is not None]
+    if len(points) < 3 or points[0][0] == points[-1][0]:
+        return None
+    xs, ys = zip(*points)
+    return statistics.linear_regression(xs, ys).slope * 86400
+
+
+def compute_health(
+    site_id: int,
+    last_seen,
+    rows: list[tuple],
+    now,
+    *,
+    offline_factor: float = 3.0,
+    offline_min_s: float = 3600.0,
+    default_offline_s: float = 12 * 3600.0,
+    battery_min_v: float = 3.3,
+    battery_warn_days: float = 14.0,
+) -> SiteHealth:
+    """
+    Health for one site from its recent ``(received_at, battery_v, signal_dbm)``
+    rows, oldest first.
+
+    The expected reporting interval is the median gap between uplinks, so
+    a few outages or bursts do not skew it. A sensor is offline once it has
+    been silent for ``offline_factor`` intervals (at least ``offline_min_s``);
+    until an interval is known, ``default_offline_s`` applies. The battery is
+    failing when it is below ``battery_min_v`` or its fitted trend reaches it
+    within ``battery_warn_days``.
+    """
+    times = [received_at.timestamp() for received_at, _, _ in rows]
+    gaps = [later - earlier for earlier, later in zip(times, times[1:]) if later > earlier]
+    interval = statistics.median(gaps) if gaps else None
+    if interval is not None:
+        offline_after = max(offline_min_s, offline_factor * interval)
+    else:
+        offline_after = default_offline_s
+
+    batteries = [battery for _, battery, _ in rows]
+    signals = [signal for _, _, signal in rows]
+    battery_v = next((value for value in reversed(batteries) if value is not None), None)
+    present_signals = [value for value in signals if value is not None]
+    battery_slope = signal_slope = None
+    if rows and rows[-1][0] - rows[0][0] >= MIN_TREND_SPAN:
+        battery_slope = _slope_per_day(times, batteries)
+        signal_slope = _slope_per_day(times, signals)
+
+    battery_failing = False
+    if battery_v is not None:
+        if battery_v < battery_min_v:
+            battery_failing = True
+        elif battery_slope is not None and battery_slope < 0:
+            battery_failing = (battery_v - battery_min_v) / -battery_slope < battery_warn_days
+
+    health = SiteHealth(
+        site_id=site_id,
+        last_seen=last_seen,
+        expected_interval_s=interval,
+        offline_after_s=offline_after,
+        battery_v=battery_v,
+        battery_slope_v_per_day=battery_slope,
+        signal_mean_dbm=statistics.fmean(present_signals) if present_signals else None,
+        signal_slope_db_per_day=signal_slope,
+        sample_count=len(rows),
+        battery_failing=battery_failing,
+        computed_at=now,
+        changed_at=now,
+    )
+    health.offline = health.is_offline(last_seen, now)
+    return health
+
+
+def update_site_health(*, site_ids=None, now=None) -> list[SiteHealth]:
+    """
+    Recompute health for active sites from their recent uplinks.
+
+    Each site costs one indexed query for at most ``FLOOD_HEALTH_MAX_SAMPLES``
+    rows within ``FLOOD_HEALTH_WINDOW_DAYS``; the last-seen time comes from
+    the site's latest-uplink pointer, so silent sites are not scanned at all.
+    """
+    now = now or timezone.now()
+    since = now - timedelta(days=getattr(settings, "FLOOD_HEALTH_WINDOW_DAYS", 14))
+    max_samples = getattr(settings, "FLOOD_HEALTH_MAX_SAMPLES", 2000)
+    options = {
+        "offline_factor": getattr(settings, "FLOOD_HEALTH_OFFLINE_FACTOR", 3.0),
+        "offline_min_s": getattr(settings, "FLOOD_HEALTH_OFFLINE_MIN_MINUTES", 60) * 60.0,
+        "default_offline_s": getattr(settings, "FLOOD_HEALTH_DEFAULT_OFFLINE_HOURS", 12) * 3600.0,
+        "battery_min_v": getattr(settings, "FLOOD_HEALTH_BATTERY_MIN_V", 3.3),
+        "battery_warn_days": getattr(settings, "FLOOD_HEALTH_BATTERY_WARN_DAYS", 14),
+    }
+
+    sites = FloodSite.objects.filter(active=True)
+    if site_ids is not None:
+        sites = sites.filter(pk__in=site_ids)
+    sites = list(sites.values_list("pk", "latest_uplink__received_at"))
+    previous = {
+        health.site_id: health
+        for health in SiteHealth.objects.filter(site_id__in=[pk for pk, _ in sites])
+    }
+
+    results = []
+    for site_id, last_seen in sites:
+        rows = list(
+            Uplink.objects.filter(site_id=site_id, received_at__gte=since)
+            .order_by("-received_at")
+            .values_list("received_at", "battery_v", "signal_dbm")[:max_samples]
+        )
+        rows.reverse()
+        health = compute_health(site_id, last_seen, rows, now, **options)
+        old = previous.get(site_id)
+        if old is not None and (old.offline, old.battery_failing) == (
+            health.offline,
+            health.battery_failing,
+        ):
+            health.changed_at = old.changed_at
+        results.append(health)
+
+    if results:
+        SiteHealth.objects.bulk_create(
+            results,
+            update_conflicts=True,
+            unique_fields=["site"],
+            update_fields=HEALTH_FIELDS,
+        )
+    return results
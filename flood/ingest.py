@@ -0,0 +1,348 @@
+import queue
+import statistics
+import threading
+import time
+import zlib
+
+from django.db import OperationalError, connections, transaction
+from django.db.models import Q
+
+from .decoders import PayloadError, Reading, default_registry
+from .models import FloodSite, Uplink
+
+BACKPRESSURE_POLICIES = ("block", "drop_oldest", "drop_newest")
+
+_STOP = object()
+
+
+def topic_device(topic: str | None) -> str | None:
+    """Return the device segment of ``flood/<device>/uplink``, if any."""
+    if not topic:
+        return None
+    parts = topic.split("/")
+    if len(parts) == 3 and parts[0] == "flood" and parts[2] == "uplink":
+        return parts[1] or None
+    return None
+
+
+def topic_shard(topic: str | None, shards: int) -> int:
+    """
+    Deterministic shard for a topic, stable across processes and restarts.
+
+    Every message from one device maps to the same shard, which is what keeps
+    per-site ordering when ingest is split across workers.
+    """
+    device = topic_device(topic) or ""
+    return zlib.crc32(device.encode("utf-8")) % shards
+
+
+def decode_message(data: bytes, sites, topic: str | None = None, decoders=None) -> Uplink:
+    """
+    Turn a raw MQTT payload into an unsaved Uplink.
+
+    The topic's device segment (an IMEI or handle) picks the site and with it
+    the payload profile; identifiers inside the payload take precedence, as
+    they always have for JSON. Sites are looked up in memory only (see
+    ``SiteIndex.lookup``), so this is safe to call from an event loop;
+    callers refresh the index themselves.
+    """
+    decoders = decoders or default_registry()
+    device = topic_device(topic)
+    topic_site = sites.lookup(imei=device, handle=device) if device else None
+    reading = decoders.for_site(topic_site).decode(data)
+
+    site = None
+    if reading.imei or reading.handle:
+        site = sites.lookup(imei=reading.imei, handle=reading.handle)
+    site = site or topic_site
+    if site is None:
+        raise PayloadError(
+            "No FloodSite found for incoming payload; "
+            "ensure IMEI or handle fields match configured sites."
+        )
+    return build_uplink(reading, site)
+
+
+def build_uplink(reading: Reading, site: FloodSite) -> Uplink:
+    return Uplink(
+        site=site,
+        distance_mm=reading.distance_mm,
+        battery_v=reading.battery_v,
+        signal_dbm=reading.signal_dbm,
+        raw_payload=reading.raw,
+    )
+
+
+def store_uplinks(uplinks: list[Uplink]) -> list[Uplink]:
+    with transaction.atomic():
+        if any(uplink.ingest_key for uplink in uplinks):
+            uplinks = _store_keyed(uplinks)
+        elif len(uplinks) == 1:
+            uplinks[0].save()
+        else:
+            uplinks = Uplink.objects.bulk_create(uplinks)
+        update_latest_uplinks(uplinks)
+    return uplinks
+
+
+def _store_keyed(uplinks: list[Uplink]) -> list[Uplink]:
+    # Uplinks whose ingest_key is already stored (replays, retransmissions)
+    # are skipped, and only newly stored ones are returned. ignore_conflicts
+    # covers a concurrent insert by another worker, but leaves pks unset, so
+    # keyed rows are read back by key. Uplinks without a key (no device time)
+    # cannot conflict and go through a plain bulk_create, which sets pks.
+    unkeyed = [uplink for uplink in uplinks if not uplink.ingest_key]
+    keys = [uplink.ingest_key for uplink in uplinks if uplink.ingest_key]
+    existing = set(
+        Uplink.objects.filter(ingest_key__in=keys).values_list("ingest_key", flat=True)
+    )
+    fresh, seen = [], set(existing)
+    for uplink in uplinks:
+        if uplink.ingest_key and uplink.ingest_key not in seen:
+            seen.add(uplink.ingest_key)
+            fresh.append(uplink)
+    Uplink.objects.bulk_create(fresh, ignore_conflicts=True)
+    pks = dict(
+        Uplink.objects.filter(ingest_key__in=seen - existing).values_list("ingest_key", "pk")
+    )
+    for uplink in fresh:
+        uplink.pk = pks.get(uplink.ingest_key)
+    if unkeyed:
+        Uplink.objects.bulk_create(unkeyed)
+    stored = {id(uplink) for uplink in fresh if uplink.pk is not None}
+    stored.update(id(uplink) for uplink in unkeyed)
+    return [uplink for uplink in uplinks if id(uplink) in stored]
+
+
+def update_latest_uplinks(uplinks: list[Uplink]) -> None:
+    newest: dict[int, Uplink] = {}
+    for uplink in uplinks:
+        current = newest.get(uplink.site_id)
+        if current is None or uplink.received_at >= current.received_at:
+            newest[uplink.site_id] = uplink
+
+    for site_id, uplink in newest.items():
+        # Guarded so a late or replayed batch never moves the pointer backwards.
+        FloodSite.objects.filter(pk=site_id).filter(
+            Q(latest_uplink__isnull=True)
+            | Q(latest_uplink__received_at__lte=uplink.received_at)
+        ).update(latest_uplink=uplink)
+
+
+def refresh_latest_uplinks(site_ids=None) -> int:
+    sites = FloodSite.objects.all()
+    if site_ids is not None:
+        sites = sites.filter(pk__in=site_ids)
+    updated = 0
+    for site_id in sites.values_list("pk", flat=True):
+        latest_pk = (
+            Uplink.objects.filter(site_id=site_id)
+            .order_by("-received_at", "-pk")
+            .values_list("pk", flat=True)
+            .first()
+        )
+        updated += FloodSite.objects.filter(pk=site_id).update(
+            latest_uplink_id=latest_pk
+        )
+    return updated
+
+
+class UplinkBuffer:
+    """
+    Bounded queue of parsed uplinks drained by a single writer thread.
+
+    Batches are flushed when ``batch_size`` uplinks are waiting or when the
+    oldest waiting uplink is ``flush_interval`` seconds old, whichever comes
+    first. When the queue is full, ``policy`` decides whether producers
+    block, the oldest queued uplink is discarded, or the new one is.
+    """
+
+    def __init__(
+        self,
+        *,
+        batch_size: int = 200,
+        flush_interval: float = 1.0,
+        max_size: int = 10000,
+        policy: str = "block",
+        retries: int = 3,
+        on_error=None,
+        on_flush=None,
+    ):
+        if policy not in BACKPRESSURE_POLICIES:
+            raise ValueError(f"Unknown backpressure policy: {policy}")
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = max(0.0, flush_interval)
+        self.policy = policy
+        self.retries = retries
+        self.on_error = on_error
+        self.on_flush = on_flush
+        self.written = 0
+        self.dropped = 0
+        self._queue: queue.Queue = queue.Queue(maxsize=max_size)
+        self._thread = threading.Thread(
+            target=self._run, name="flood-uplink-writer", daemon=True
+        )
+        self._closed = False
+
+    def start(self) -> "UplinkBuffer":
+        self._thread.start()
+        return self
+
+    def put(self, uplink: Uplink) -> bool:
+        if self._closed:
+            return False
+        if self.policy == "block":
+            self._queue.put(uplink)
+            return True
+        while True:
+            try:
+                self._queue.put_nowait(uplink)
+                return True
+            except queue.Full:
+                self.dropped += 1
+                if self.policy == "drop_newest":
+                    return False
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                pass
+
+    def close(self, timeout: float | None = None) -> None:
+        """Stop accepting uplinks and wait for everything queued to be written."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def _run(self) -> None:
+        batch: list[Uplink] = []
+        deadline = 0.0
+        try:
+            while True:
+                if batch:
+                    timeout = max(0.0, deadline - time.monotonic())
+                else:
+                    timeout = None
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    item = None
+
+                if item is _STOP:
+                    self._flush(batch)
+                    return
+                if item is not None:
+                    if not batch:
+                        deadline = time.monotonic() + self.flush_interval
+                    batch.append(item)
+
+                if len(batch) >= self.batch_size or (
+                    batch and time.monotonic() >= deadline
+                ):
+                    self._flush(batch)
+                    batch = []
+        finally:
+            connections.close_all()
+
+    def _flush(self, batch: list[Uplink]) -> None:
+        if not batch:
+            return
+        for attempt in range(self.retries + 1):
+            try:
+                stored = store_uplinks(batch)
+            except OperationalError as exc:
+                # Typically "database is locked" on SQLite; back off and retry.
+                if attempt == self.retries:
+                    self._report(f"Dropping {len(batch)} uplinks after write failure: {exc}")
+                    self.dropped += len(batch)
+                    return
+                time.sleep(0.1 * 2**attempt)
+                continue
+            except Exception as exc:  # noqa: BLE001
+                # One bad uplink fails the whole insert; store the rest one
+                # at a time so only the bad ones are lost.
+                self._report(f"Batch write failed, storing {len(batch)} uplinks singly: {exc}")
+                stored = self._store_individually(batch)
+            self.written += len(stored)
+            if self.on_flush is not None:
+                self.on_flush(stored, len(batch))
+            return
+
+    def _store_individually(self, batch: list[Uplink]) -> list[Uplink]:
+        stored = []
+        for uplink in batch:
+            try:
+                stored += store_uplinks([uplink])
+            except Exception as exc:  # noqa: BLE001
+                self.dropped += 1
+                self._report(f"Dropping uplink for site {uplink.site_id}: {exc}")
+        return stored
+
+    def _report(self, message: str) -> None:
+        if self.on_error is not None:
+            self.on_error(message)
+
+
+class IngestStats:
+    """
+    Throughput and latency counters for the listener.
+
+    Latency is measured from a ``sent_at`` epoch timestamp in the payload (as
+    published by ``flood_load_test``) to the moment the uplink is stored, so
+    it covers the broker, decoding, queueing and the database write.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.received = 0
+        self.rejected = 0
+        self.duplicates = 0
+        self.db_duplicates = 0
+        self.stored = 0
+        self._latencies: list[float] = []
+        self._window_started = time.monotonic()
+        self._window_stored = 0
+
+    def record_received(self, rejected: bool = False, duplicate: bool = False) -> None:
+        with self._lock:
+            self.received += 1
+            if rejected:
+                self.rejected += 1
+            if duplicate:
+                self.duplicates += 1
+
+    def record_stored(self, uplinks: list[Uplink], attempted: int | None = None) -> None:
+        """Count stored uplinks; ``attempted - len(uplinks)`` were already in the database."""
+        now = time.time()
+        with self._lock:
+            if attempted is not None:
+                self.db_duplicates += attempted - len(uplinks)
+            self.stored += len(uplinks)
+            self._window_stored += len(uplinks)
+            for uplink in uplinks:
+                sent_at = (uplink.raw_payload or {}).get("sent_at")
+                if isinstance(sent_at, (int, float)):
+                    self._latencies.append(now - sent_at)
+
+    def snapshot(self) -> str:
+        """Summarise and reset the current reporting window."""
+        with self._lock:
+            elapsed = max(time.monotonic() - self._window_started, 1e-9)
+            rate = self._window_stored / elapsed
+            latencies = sorted(self._latencies)
+            self._latencies = []
+            self._window_started = time.monotonic()
+            self._window_stored = 0
+            line = (
+                f"received={self.received} rejected={self.rejected} "
+                f"duplicates={self.duplicates + self.db_duplicates} "
+                f"(db={self.db_duplicates}) stored={self.stored} rate={rate:.0f}/s"
+            )
+        if latencies:
+            p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+            line += (
+                f" latency_ms mean={statistics.fmean(latencies) * 1000:.1f}"
+                f" p95={p95 * 1000:.1f} max={latencies[-1] * 1000:.1f}"
+            )
+        return line
@@ -0,0 +1,62 @@
+LEVEL_STATES = ("unknown", "low_low", "low", "high", "high_high")
+
+
+def site_thresholds(site) -> tuple:
+    """A site's triggers as ``(low_low, low, high, high_high)``; ``None`` if unset."""
+    return (
+        site.trigger_low_low_mm,
+        site.trigger_low_mm,
+        site.trigger_high_mm,
+        site.trigger_high_high_mm,
+    )
+
+
+def level_state(distance_mm, thresholds) -> str:
+    if distance_mm is None:
+        return "unknown"
+    low_low, low, high, high_high = thresholds
+    if high_high is not None and distance_mm >= high_high:
+        return "high_high"
+    if high is not None and distance_mm >= high:
+        return "high"
+    if low_low is not None and distance_mm <= low_low:
+        return "low_low"
+    if low is not None and distance_mm <= low:
+        return "low"
+    return "unknown"
+
+
+def classify(distances, thresholds) -> list[str]:
+    """
+    Level states for many readings from one site.
+
+    The thresholds are read once rather than from the site for every row;
+    unset ones are replaced by bounds no reading can cross, which leaves a
+    plain comparison ladder per reading.
+    """
+    low_low, low, high, high_high = thresholds
+    low_low = float("-inf") if low_low is None else low_low
+    low = float("-inf") if low is None else low
+    high = float("inf") if high is None else high
+    high_high = float("inf") if high_high is None else high_high
+    states = []
+    append = states.append
+    for distance in distances:
+        if distance is None:
+            append("unknown")
+        elif distance >= high_high:
+            append("high_high")
+        elif distance >= high:
+            append("high")
+        elif distance <= low_low:
+            append("low_low")
+        elif distance <= low:
+            append("low")
+        else:
+            append("unknown")
+    return states
+
+
+def classify_sites(distances, thresholds) -> list[str]:
+    """Level states for readings paired row by row with their site's thresholds."""
+    return [level_state(distance, row) for distance, row in zip(distances, thresholds)]
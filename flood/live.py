@@ -0,0 +1,100 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Count, Max, Sum
+from django.utils import timezone
+
+from .levels import classify_sites, site_thresholds
+from .models import FloodSite
+
+
+class SiteStateBroadcaster:
+    """
+    Fan out changed floodway site states to every connected stream client.
+
+    A single task per process watches for new readings, so the database cost
+    is the same whether one browser or a thousand are listening. It first
+    runs a one-row aggregate and only loads site states when that changes,
+    then sends each subscriber just the sites whose latest uplink or sensor
+    health flags changed.
+    In-process producers can skip the poll entirely by calling ``publish``.
+    """
+
+    def __init__(self, *, poll_interval: float = 2.0, queue_size: int = 100):
+        self.poll_interval = poll_interval
+        self.queue_size = queue_size
+        self._subscribers: set[asyncio.Queue] = set()
+        self._task: asyncio.Task | None = None
+        self._marker = None
+        self._pointers: dict[int, tuple] = {}
+
+    def subscribe(self) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.add(queue)
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        self._subscribers.discard(queue)
+
+    def publish(self, states: dict[str, dict]) -> None:
+        if not states:
+            return
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(states)
+            except asyncio.QueueFull:
+                # A stalled client is closed; EventSource reconnects and the
+                # page reloads the full map.
+                self.unsubscribe(queue)
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(None)
+
+    async def _run(self) -> None:
+        await sync_to_async(self._changed_states)()  # prime without sending
+        while self._subscribers:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                states = await sync_to_async(self._changed_states)()
+            except Exception:  # noqa: BLE001
+                continue
+            self.publish(states)
+
+    def _changed_states(self) -> dict[str, dict]:
+        marker = FloodSite.objects.filter(active=True).aggregate(
+            count=Count("pk"),
+            pointers=Sum("latest_uplink_id"),
+            edited=Max("updated_at"),
+            health=Max("health__changed_at"),
+        )
+        if marker == self._marker:
+            return {}
+        first_run = self._marker is None
+        self._marker = marker
+
+        now = timezone.now()
+        sites = FloodSite.objects.filter(
+            active=True, latest_uplink__isnull=False
+        ).select_related("latest_uplink", "health")
+        moved = []
+        for site in sites:
+            health = getattr(site, "health", None)
+            pointer = (site.latest_uplink_id, health and health.changed_at)
+            if self._pointers.get(site.pk) != pointer:
+                self._pointers[site.pk] = pointer
+                moved.append(site)
+        if first_run:
+            return {}
+        states = classify_sites(
+            [site.latest_uplink.distance_mm for site in moved],
+            [site_thresholds(site) for site in moved],
+        )
+        return {site.handle: site.map_state(now, state) for site, state in zip(moved, states)}
+
+
+broadcaster = SiteStateBroadcaster(
+    poll_interval=getattr(settings, "FLOOD_STREAM_POLL_INTERVAL", 2.0),
+)
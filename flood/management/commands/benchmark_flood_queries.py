@@ -0,0 +1,159 @@
+import gzip
+import random
+import statistics
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+from django.test import RequestFactory
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from flood.encoding import HISTORY_FORMATS
+from flood.ingest import refresh_latest_uplinks
+from flood.models import FloodSite, Uplink
+from flood.views import api_history
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed N benchmark sites with M uplinks each, then report timings and "
+        "query plans for the map (latest per site) and history queries, and the "
+        "size and server time of each history response format.\n"
+        "Everything runs in one transaction that is rolled back unless --keep "
+        "is given, so existing data is untouched."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sites", type=int, default=50)
+        parser.add_argument("--uplinks", type=int, default=5000, help="Uplinks per site.")
+        parser.add_argument(
+            "--interval",
+            type=int,
+            default=15,
+            help="Minutes between seeded readings.",
+        )
+        parser.add_argument("--days", type=int, default=7, help="History window to query.")
+        parser.add_argument("--repeat", type=int, default=5, help="Timed runs per query.")
+        parser.add_argument(
+            "--history-points",
+            type=int,
+            help="Points per history response for the format comparison "
+            "(default: FLOOD_HISTORY_MAX_POINTS).",
+        )
+        parser.add_argument(
+            "--keep",
+            action="store_true",
+            help="Commit the seeded benchmark rows instead of rolling them back.",
+        )
+
+    def handle(self, *args, **options) -> None:
+        with transaction.atomic():
+            sites = self._seed(options)
+            self._report(sites, options)
+            self._report_formats(sites[len(sites) // 2], options)
+            if not options["keep"]:
+                transaction.set_rollback(True)
+                self.stdout.write("Rolled back benchmark data.")
+
+    def _seed(self, options) -> list[FloodSite]:
+        now = timezone.now()
+        started = time.perf_counter()
+        sites = FloodSite.objects.bulk_create(
+            FloodSite(
+                handle=f"bench-{i:05d}",
+                name=f"Benchmark site {i}",
+                location_description="Benchmark",
+                latitude=-26.4,
+                longitude=146.2,
+                trigger_high_mm=800,
+                trigger_high_high_mm=1200,
+            )
+            for i in range(options["sites"])
+        )
+        step = timedelta(minutes=options["interval"])
+        for site in sites:
+            Uplink.objects.bulk_create(
+                (
+                    Uplink(
+                        site=site,
+                        distance_mm=random.randint(0, 1500),
+                        battery_v=3.6,
+                        signal_dbm=-90,
+                        received_at=now - step * n,
+                    )
+                    for n in range(options["uplinks"])
+                ),
+                batch_size=2000,
+            )
+        refresh_latest_uplinks([site.pk for site in sites])
+        self.stdout.write(
+            f"Seeded {len(sites)} sites x {options['uplinks']} uplinks "
+            f"in {time.perf_counter() - started:.2f}s"
+        )
+        return sites
+
+    def _report(self, sites: list[FloodSite], options) -> None:
+        site_ids = [site.pk for site in sites]
+        probe = sites[len(sites) // 2]
+        since = timezone.now() - timedelta(days=options["days"])
+
+        newest = Uplink.objects.filter(site=OuterRef("pk")).order_by("-received_at")
+        queries = {
+            "map: latest uplink pointer (api_uplinks)": FloodSite.objects.filter(
+                pk__in=site_ids, latest_uplink__isnull=False
+            ).select_related("latest_uplink"),
+            "map: latest per site via subquery": FloodSite.objects.filter(
+                pk__in=site_ids
+            ).annotate(latest_distance=Subquery(newest.values("distance_mm")[:1])),
+            f"history: {options['days']} days for {probe.handle}": Uplink.objects.filter(
+                site=probe, received_at__gte=since
+            )
+            .order_by("received_at")
+            .values_list("received_at", "distance_mm"),
+        }
+
+        for label, queryset in queries.items():
+            timings = []
+            rows = 0
+            for _ in range(max(1, options["repeat"])):
+                started = time.perf_counter()
+                rows = len(list(queryset.all()))
+                timings.append((time.perf_counter() - started) * 1000)
+            self.stdout.write(self.style.MIGRATE_HEADING(label))
+            self.stdout.write(
+                f"  rows={rows} median={statistics.median(timings):.2f}ms "
+                f"min={min(timings):.2f}ms max={max(timings):.2f}ms"
+            )
+            for line in queryset.explain().splitlines():
+                self.stdout.write(f"  {line}")
+
+    def _report_formats(self, probe: FloodSite, options) -> None:
+        points = options["history_points"] or getattr(settings, "FLOOD_HISTORY_MAX_POINTS", 2000)
+        factory = RequestFactory()
+        # Call the view without its response cache so every run encodes.
+        view = api_history.__wrapped__
+        self.stdout.write(
+            self.style.MIGRATE_HEADING(
+                f"history formats: {options['days']} days for {probe.handle}, "
+                f"up to {points} points"
+            )
+        )
+        with override_settings(FLOOD_HISTORY_MAX_POINTS=points):
+            for output in HISTORY_FORMATS:
+                request = factory.get(
+                    "/flood/api/history/",
+                    {"handle": probe.handle, "days": options["days"], "format": output},
+                )
+                timings = []
+                for _ in range(max(1, options["repeat"])):
+                    started = time.perf_counter()
+                    content = view(request).content
+                    timings.append((time.perf_counter() - started) * 1000)
+                self.stdout.write(
+                    f"  {output:<8} bytes={len(content)} gzip={len(gzip.compress(content))} "
+                    f"median={statistics.median(timings):.2f}ms min={min(timings):.2f}ms"
+                )
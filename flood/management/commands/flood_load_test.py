@@ -0,0 +1,129 @@
+import asyncio
+import json
+import random
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from flood.models import FloodSite
+
+LOAD_TEST_PREFIX = "loadtest-"
+
+
+class Command(BaseCommand):
+    help = (
+        "Publish synthetic floodway uplinks to the MQTT broker to measure ingest "
+        "throughput and latency.\n"
+        "Each payload carries a 'sent_at' timestamp; run the listener with "
+        "--stats-interval to see end-to-end latency from publish to database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--messages", type=int, default=10000)
+        parser.add_argument(
+            "--rate",
+            type=float,
+            default=0,
+            help="Target messages per second (0 publishes as fast as possible).",
+        )
+        parser.add_argument("--sites", type=int, default=20, help="Number of sites to report as.")
+        parser.add_argument("--qos", type=int, choices=[0, 1], default=0)
+        parser.add_argument(
+            "--duplicates",
+            type=float,
+            default=0,
+            help="Fraction of messages re-sent as exact retransmissions (0-1).",
+        )
+        parser.add_argument(
+            "--create-sites",
+            action="store_true",
+            help=f"Create '{LOAD_TEST_PREFIX}NNN' sites if they do not exist.",
+        )
+        parser.add_argument(
+            "--delete-sites",
+            action="store_true",
+            help=f"Delete all '{LOAD_TEST_PREFIX}' sites and their uplinks, then exit.",
+        )
+
+    def handle(self, *args, **options) -> None:
+        if options["delete_sites"]:
+            deleted, _ = FloodSite.objects.filter(
+                handle__startswith=LOAD_TEST_PREFIX
+            ).delete()
+            self.stdout.write(f"Deleted {deleted} load test rows")
+            return
+
+        try:
+            from amqtt.client import MQTTClient  # type: ignore[import-not-found]
+        except Exception:  # noqa: BLE001
+            self.stderr.write(
+                "The 'amqtt' package is not installed.\n"
+                "Install it with:\n"
+                "  pip install amqtt\n"
+            )
+            return
+
+        handles = [f"{LOAD_TEST_PREFIX}{i:03d}" for i in range(options["sites"])]
+        if options["create_sites"]:
+            for handle in handles:
+                FloodSite.objects.get_or_create(
+                    handle=handle,
+                    defaults={
+                        "name": f"Load test {handle}",
+                        "location_description": "Load test",
+                        "latitude": -26.4,
+                        "longitude": 146.2,
+                        "active": False,
+                    },
+                )
+        missing = len(handles) - FloodSite.objects.filter(handle__in=handles).count()
+        if missing:
+            raise CommandError(
+                f"{missing} load test sites do not exist; pass --create-sites."
+            )
+
+        host = getattr(settings, "MQTT_BROKER_HOST", "127.0.0.1")
+        port = getattr(settings, "MQTT_BROKER_PORT", 1883)
+        total = options["messages"]
+        interval = 1 / options["rate"] if options["rate"] > 0 else 0
+
+        async def run():
+            client = MQTTClient()
+            await client.connect(f"mqtt://{host}:{port}/")
+            started = time.perf_counter()
+            retransmitted = 0
+            for seq in range(total):
+                handle = handles[seq % len(handles)]
+                payload = {
+                    "handle": handle,
+                    "distance": random.randint(0, 1500),
+                    "battery": 3.7,
+                    "signal": -85,
+                    "seq": seq,
+                    "sent_at": time.time(),
+                }
+                data = json.dumps(payload).encode("utf-8")
+                await client.publish(f"flood/{handle}/uplink", data, qos=options["qos"])
+                if random.random() < options["duplicates"]:
+                    await client.publish(f"flood/{handle}/uplink", data, qos=options["qos"])
+                    retransmitted += 1
+                if interval:
+                    delay = started + (seq + 1) * interval - time.perf_counter()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+            elapsed = time.perf_counter() - started
+            await client.disconnect()
+            return elapsed, retransmitted
+
+        self.stdout.write(
+            f"Publishing {total} uplinks for {len(handles)} sites to {host}:{port}..."
+        )
+        elapsed, retransmitted = asyncio.run(run())
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Published {total} uplinks in {elapsed:.2f}s "
+                f"({total / max(elapsed, 1e-9):.0f} msg/s)"
+                + (f", plus {retransmitted} retransmissions" if retransmitted else "")
+            )
+        )
@@ -0,0 +1,122 @@
+import zoneinfo
+
+from django.core.management.base import BaseCommand, CommandError
+
+from flood.backfill import (
+    SOURCE_FORMATS,
+    BackfillError,
+    HistoryImporter,
+    RowParser,
+    iter_records,
+    open_source,
+    source_format,
+)
+from flood.health import update_site_health
+from flood.ingest import refresh_latest_uplinks
+from flood.models import FloodSite
+from flood.rollups import update_rollups
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk-load historical floodway readings from CSV or NDJSON files "
+        "(optionally gzip'd, '-' for stdin) without going through MQTT.\n"
+        "Rows need a time column (received_at/timestamp/time/datetime), a distance "
+        "and a site handle or IMEI, using the same field names as sensor payloads. "
+        "Archive files written by prune_flood_uplinks can be loaded as they are."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("paths", nargs="+", metavar="FILE")
+        parser.add_argument("--format", choices=SOURCE_FORMATS, help="Default: from the file name.")
+        parser.add_argument(
+            "--site",
+            metavar="HANDLE",
+            help="Site for rows that do not name one (e.g. a per-sensor export).",
+        )
+        parser.add_argument(
+            "--timezone",
+            help="Time zone of timestamps without an offset (default: TIME_ZONE).",
+        )
+        parser.add_argument("--batch-size", type=int, default=20000)
+        parser.add_argument(
+            "--skip-existing",
+            action="store_true",
+            help="Skip readings already stored for the same site and time, so a "
+            "partial import can be re-run.",
+        )
+        parser.add_argument(
+            "--keep-payload",
+            action="store_true",
+            help="Store each source row as the uplink's raw_payload.",
+        )
+        parser.add_argument(
+            "--skip-rollups",
+            action="store_true",
+            help="Do not update rollups and sensor health afterwards.",
+        )
+        parser.add_argument("--dry-run", action="store_true", help="Parse and count only.")
+
+    def handle(self, *args, **options) -> None:
+        default_site = None
+        if options["site"]:
+            try:
+                default_site = FloodSite.objects.get(handle=options["site"]).pk
+            except FloodSite.DoesNotExist:
+                raise CommandError(f"Unknown site {options['site']!r}") from None
+        tz = None
+        if options["timezone"]:
+            try:
+                tz = zoneinfo.ZoneInfo(options["timezone"])
+            except (zoneinfo.ZoneInfoNotFoundError, ValueError):
+                raise CommandError(f"Unknown time zone {options['timezone']!r}") from None
+
+        self._interactive = self.stderr.isatty()
+        importer = HistoryImporter(
+            RowParser(default_site=default_site, tz=tz, keep_payload=options["keep_payload"]),
+            batch_size=options["batch_size"],
+            skip_existing=options["skip_existing"],
+            dry_run=options["dry_run"],
+            on_progress=self._progress,
+        )
+        for path in options["paths"]:
+            try:
+                source = options["format"] or source_format(path)
+                with open_source(path) as fh:
+                    importer.load(iter_records(fh, source))
+            except (BackfillError, OSError, ValueError) as exc:
+                raise CommandError(f"{path}: {exc}") from exc
+        if self._interactive:
+            self.stderr.write("")
+
+        for reason, count in importer.rejected.most_common():
+            self.stderr.write(f"Rejected {count} rows: {reason}")
+        summary = (
+            f"Imported {importer.imported} of {importer.read} rows "
+            f"({importer.existing} already stored, {sum(importer.rejected.values())} rejected) "
+            f"at {importer.rate:,.0f} rows/s"
+        )
+        if options["dry_run"]:
+            self.stdout.write(f"Dry run: {summary}")
+            return
+        self.stdout.write(self.style.SUCCESS(summary))
+        if not importer.imported:
+            return
+
+        site_ids = sorted(importer.site_ids)
+        refresh_latest_uplinks(site_ids=site_ids)
+        if not options["skip_rollups"]:
+            written = update_rollups(since=importer.earliest, site_ids=site_ids)
+            update_site_health(site_ids=site_ids)
+            self.stdout.write(f"Updated {written} rollup buckets for {len(site_ids)} sites")
+
+    def _progress(self, importer: HistoryImporter) -> None:
+        line = (
+            f"{importer.read:,} rows read, {importer.imported:,} imported "
+            f"({importer.rate:,.0f} rows/s)"
+        )
+        if self._interactive:
+            self.stderr.write(f"\r{line}", ending="")
+            self.stderr.flush()
+        else:
+            self.stderr.write(line)
@@ -0,0 +1,134 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from flood.archive import ARCHIVE_FIELDS, archive_root, write_archive
+from flood.models import FloodSite, Uplink
+from flood.rollups import update_rollups
+
+
+class Command(BaseCommand):
+    help = (
+        "Apply the floodway uplink retention policy.\n"
+        "Raw payloads are stripped after --strip-payload-days. Uplinks older "
+        "than --archive-days are written to gzip'd NDJSON files partitioned by "
+        "day under FLOOD_ARCHIVE_DIR and then deleted. Work is done in small "
+        "chunks with a pause between them so the MQTT listener is never blocked "
+        "for long."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--archive-days",
+            type=int,
+            default=getattr(settings, "FLOOD_RETENTION_ARCHIVE_DAYS", 365),
+            help="Archive and delete uplinks older than this many days (0 disables).",
+        )
+        parser.add_argument(
+            "--strip-payload-days",
+            type=int,
+            default=getattr(settings, "FLOOD_RETENTION_STRIP_PAYLOAD_DAYS", 90),
+            help="Clear raw_payload on uplinks older than this many days (0 disables).",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=1000,
+            help="Rows updated or deleted per transaction.",
+        )
+        parser.add_argument(
+            "--pause",
+            type=float,
+            default=0.2,
+            help="Seconds to sleep between chunks so ingest can take the write lock.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report what would be changed without touching any rows.",
+        )
+
+    def handle(self, *args, **options) -> None:
+        now = timezone.now()
+        chunk_size = max(1, options["chunk_size"])
+
+        if options["archive_days"] > 0:
+            cutoff = now - timedelta(days=options["archive_days"])
+            archived = self._archive(cutoff, chunk_size, options)
+            verb = "Would archive" if options["dry_run"] else "Archived"
+            self.stdout.write(
+                f"{verb} {archived} uplinks older than {cutoff:%Y-%m-%d} to {archive_root()}"
+            )
+
+        if options["strip_payload_days"] > 0:
+            cutoff = now - timedelta(days=options["strip_payload_days"])
+            stripped = self._strip_payloads(cutoff, chunk_size, options)
+            verb = "Would strip" if options["dry_run"] else "Stripped"
+            self.stdout.write(
+                f"{verb} raw payloads from {stripped} uplinks older than {cutoff:%Y-%m-%d}"
+            )
+
+        self.stdout.write(self.style.SUCCESS("Retention run complete"))
+
+    def _archive(self, cutoff, chunk_size: int, options) -> int:
+        # Never remove a site's latest reading; the map depends on it.
+        latest_ids = FloodSite.objects.exclude(latest_uplink=None).values_list(
+            "latest_uplink_id", flat=True
+        )
+        candidates = Uplink.objects.filter(received_at__lt=cutoff).exclude(
+            pk__in=latest_ids
+        )
+        if options["dry_run"]:
+            count = candidates.count()
+            if count:
+                self.stdout.write("Would refresh rollups before archiving")
+            return count
+        if not candidates.exists():
+            return 0
+
+        # Rollups must cover the rows before they leave the table.
+        update_rollups()
+        total = 0
+        last_pk = 0
+        while True:
+            rows = list(
+                candidates.filter(pk__gt=last_pk)
+                .order_by("pk")
+                .values(*ARCHIVE_FIELDS)[:chunk_size]
+            )
+            if not rows:
+                return total
+            write_archive(rows)
+            pks = [row["id"] for row in rows]
+            with transaction.atomic():
+                Uplink.objects.filter(pk__in=pks).delete()
+            total += len(rows)
+            last_pk = pks[-1]
+            time.sleep(options["pause"])
+
+    def _strip_payloads(self, cutoff, chunk_size: int, options) -> int:
+        candidates = Uplink.objects.filter(
+            received_at__lt=cutoff, raw_payload__isnull=False
+        )
+        if options["dry_run"]:
+            return candidates.count()
+
+        total = 0
+        last_pk = 0
+        while True:
+            pks = list(
+                candidates.filter(pk__gt=last_pk)
+                .order_by("pk")
+                .values_list("pk", flat=True)[:chunk_size]
+            )
+            if not pks:
+                return total
+            with transaction.atomic():
+                Uplink.objects.filter(pk__in=pks).update(raw_payload=None)
+            total += len(pks)
+            last_pk = pks[-1]
+            time.sleep(options["pause"])
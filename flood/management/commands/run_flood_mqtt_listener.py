@@ -1,9 +1,57 @@
-import json
+import argparse
+import asyncio
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 from django.conf import settings
 from django.core.management.base import BaseCommand
 
-from flood.models import FloodSite, Uplink
+from flood.alerts import AlertDispatcher, AlertEngine, load_backends
+from flood.decoders import default_registry
+from flood.dedupe import Deduplicator
+from flood.ingest import (
+    BACKPRESSURE_POLICIES,
+    IngestStats,
+    PayloadError,
+    UplinkBuffer,
+    decode_message,
+    store_uplinks,
+    topic_shard,
+)
+from flood.site_index import SiteIndex
+from flood.spool import SpooledUplinkWriter, UplinkSpool
+
+UPLINK_TOPIC = "flood/+/uplink"
+SHARD_MODES = ("hash", "share")
+
+# Options passed through unchanged from the supervisor to its workers.
+WORKER_OPTIONS = (
+    "concurrency",
+    "stats_interval",
+    "batch_size",
+    "flush_interval",
+    "queue_size",
+    "backpressure",
+    "shard_mode",
+    "share_group",
+    "spool",
+)
+
+
+class _Worker:
+    def __init__(self, index: int):
+        self.index = index
+        self.process: subprocess.Popen | None = None
+        self.started = 0.0
+        self.next_start = 0.0
+        self.failures = 0
+        self.restarts = 0
+        self.last_stats = ""
 
 
 class Command(BaseCommand):
@@ -13,7 +61,242 @@ class Command(BaseCommand):
         "and a distance measurement in millimetres."
     )
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--async",
+            dest="use_async",
+            action="store_true",
+            help=(
+                "Use an asyncio MQTT client (amqtt) instead of paho. Messages are "
+                "decoded on the event loop and written in batches from a "
+                "dedicated writer thread; implies --buffered."
+            ),
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=4,
+            help="Number of concurrent message consumers in --async mode.",
+        )
+        parser.add_argument(
+            "--stats-interval",
+            type=float,
+            default=0,
+            help="Print throughput and latency every N seconds (0 disables).",
+        )
+        parser.add_argument(
+            "--buffered",
+            action="store_true",
+            default=getattr(settings, "FLOOD_INGEST_BUFFERED", False),
+            help="Queue parsed uplinks and write them in batches from a writer thread.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=getattr(settings, "FLOOD_INGEST_BATCH_SIZE", 200),
+            help="Maximum uplinks written per batch in buffered mode.",
+        )
+        parser.add_argument(
+            "--flush-interval",
+            type=float,
+            default=getattr(settings, "FLOOD_INGEST_FLUSH_INTERVAL", 1.0),
+            help="Seconds a queued uplink may wait before its batch is written.",
+        )
+        parser.add_argument(
+            "--queue-size",
+            type=int,
+            default=getattr(settings, "FLOOD_INGEST_QUEUE_SIZE", 10000),
+            help="Maximum uplinks held in memory in buffered mode.",
+        )
+        parser.add_argument(
+            "--backpressure",
+            choices=BACKPRESSURE_POLICIES,
+            default=getattr(settings, "FLOOD_INGEST_BACKPRESSURE", "block"),
+            help="What to do when the queue is full in buffered mode.",
+        )
+        parser.add_argument(
+            "--spool",
+            metavar="DIR",
+            default=getattr(settings, "FLOOD_SPOOL_DIR", ""),
+            help=(
+                "Write uplinks to an on-disk spool in DIR before acknowledging "
+                "them, and replay the spool into the database in order. Nothing "
+                "is lost while the database is locked or down. Implies --buffered."
+            ),
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help=(
+                "Run N listener processes under a supervisor that restarts them "
+                "and reports their health. Implies --buffered."
+            ),
+        )
+        parser.add_argument(
+            "--shard-mode",
+            choices=SHARD_MODES,
+            default="hash",
+            help=(
+                "How --workers split the load: 'hash' gives each worker a fixed "
+                "share of devices (per-site order preserved); 'share' uses an MQTT "
+                "$share/ group subscription, balanced by the broker (needs a "
+                "broker that supports it, e.g. Mosquitto or EMQX; not amqtt)."
+            ),
+        )
+        parser.add_argument(
+            "--share-group",
+            default="flood-ingest",
+            help="Group name for --shard-mode share.",
+        )
+        parser.add_argument(
+            "--health-interval",
+            type=float,
+            default=30,
+            help="With --workers, report each worker's status every N seconds (0 disables).",
+        )
+        parser.add_argument("--worker-index", type=int, default=None, help=argparse.SUPPRESS)
+
     def handle(self, *args, **options):
+        if options["workers"] > 1 and options["worker_index"] is None:
+            self._supervise(options)
+            return
+
+        host = getattr(settings, "MQTT_BROKER_HOST", "127.0.0.1")
+        port = getattr(settings, "MQTT_BROKER_PORT", 1883)
+        self.topic = UPLINK_TOPIC
+        self.shard = None
+        if options["worker_index"] is not None:
+            if options["shard_mode"] == "share":
+                self.topic = f"$share/{options['share_group']}/{UPLINK_TOPIC}"
+            else:
+                self.shard = (options["worker_index"], options["workers"])
+
+        self.sites = SiteIndex(
+            refresh_interval=getattr(settings, "FLOOD_SITE_INDEX_REFRESH_INTERVAL", 30.0),
+            negative_ttl=getattr(settings, "FLOOD_SITE_INDEX_NEGATIVE_TTL", 60.0),
+        ).connect_signals().load()
+        self.stdout.write(f"Loaded {len(self.sites)} flood sites into the site index")
+        default_registry()  # fail at startup on a bad FLOOD_PAYLOAD_PROFILES
+        self.stats = IngestStats()
+        self.alerts = None
+        dispatcher = None
+        if getattr(settings, "FLOOD_ALERTS", True):
+            dispatcher = AlertDispatcher(load_backends(), on_error=self.stderr.write).start()
+            self.alerts = AlertEngine(
+                self.sites,
+                hysteresis_mm=getattr(settings, "FLOOD_ALERT_HYSTERESIS_MM", 50),
+                debounce=getattr(settings, "FLOOD_ALERT_DEBOUNCE", 2),
+                dispatcher=dispatcher,
+                on_error=self.stderr.write,
+            )
+        self.dedupe = None
+        if getattr(settings, "FLOOD_DEDUPE", True):
+            self.dedupe = Deduplicator(
+                max_entries=getattr(settings, "FLOOD_DEDUPE_CACHE_SIZE", 100000),
+                window=getattr(settings, "FLOOD_DEDUPE_WINDOW", 3600),
+            )
+
+        if options["use_async"] or options["worker_index"] is not None:
+            options["buffered"] = True
+
+        buffer = None
+        if options["spool"]:
+            spool_dir = options["spool"]
+            if options["worker_index"] is not None:
+                spool_dir = f"{spool_dir}/worker-{options['worker_index']}"
+            buffer = SpooledUplinkWriter(
+                UplinkSpool(
+                    spool_dir,
+                    segment_bytes=getattr(settings, "FLOOD_SPOOL_SEGMENT_BYTES", 16 * 1024 * 1024),
+                    fsync=getattr(settings, "FLOOD_SPOOL_FSYNC", False),
+                ),
+                batch_size=options["batch_size"],
+                flush_interval=options["flush_interval"],
+                on_error=self.stderr.write,
+                on_flush=self._stored,
+            ).start()
+            self.stdout.write(
+                f"Spooled ingest in {spool_dir}: batches of {buffer.batch_size}, "
+                f"{buffer.backlog_bytes} bytes waiting to replay"
+            )
+        elif options["buffered"]:
+            buffer = UplinkBuffer(
+                batch_size=options["batch_size"],
+                flush_interval=options["flush_interval"],
+                max_size=options["queue_size"],
+                policy=options["backpressure"],
+                on_error=self.stderr.write,
+                on_flush=self._stored,
+            ).start()
+            self.stdout.write(
+                f"Buffered ingest: batches of {buffer.batch_size}, "
+                f"flush every {buffer.flush_interval}s, "
+                f"backpressure '{buffer.policy}'"
+            )
+
+        stop_stats = threading.Event()
+        if options["stats_interval"] > 0:
+            threading.Thread(
+                target=self._report_stats,
+                args=(options["stats_interval"], stop_stats),
+                daemon=True,
+            ).start()
+
+        try:
+            if options["use_async"]:
+                self._run_async(host, port, buffer, options)
+            else:
+                self._run_paho(host, port, buffer)
+        finally:
+            stop_stats.set()
+            if buffer is not None:
+                self.stdout.write("Draining ingest queue...")
+                buffer.close()
+                self.stdout.write(
+                    f"Wrote {buffer.written} buffered uplinks "
+                    f"({buffer.dropped} dropped)."
+                )
+            if dispatcher is not None:
+                dispatcher.close(timeout=30)
+            if options["stats_interval"] > 0:
+                self.stdout.write(self.stats.snapshot())
+
+    def _stored(self, uplinks, attempted: int) -> None:
+        self.stats.record_stored(uplinks, attempted)
+        if self.alerts is not None:
+            self.alerts.process(uplinks)
+
+    def _owns(self, topic: str) -> bool:
+        return self.shard is None or topic_shard(topic, self.shard[1]) == self.shard[0]
+
+    def _decode(self, data: bytes, topic: str):
+        try:
+            uplink = decode_message(data, self.sites, topic)
+        except PayloadError as exc:
+            self.stats.record_received(rejected=True)
+            self.stderr.write(str(exc))
+            return None
+        if self.dedupe is not None and self.dedupe.is_duplicate(uplink):
+            self.stats.record_received(duplicate=True)
+            return None
+        self.stats.record_received()
+        return uplink
+
+    def _reject(self, exc: Exception) -> None:
+        # Anything unexpected costs only the message that caused it.
+        self.stats.record_received(rejected=True)
+        self.stderr.write(f"Dropping message after {type(exc).__name__}: {exc}")
+
+    def _enqueue(self, buffer, uplink) -> None:
+        if not buffer.put(uplink):
+            self.stderr.write("Ingest queue full; dropped uplink")
+
+    def _report_stats(self, interval: float, stop: threading.Event) -> None:
+        while not stop.wait(interval):
+            self.stdout.write(self.stats.snapshot())
+
+    def _run_paho(self, host: str, port: int, buffer) -> None:
         try:
             import paho.mqtt.client as mqtt  # type: ignore[import-not-found]
         except Exception:  # noqa: BLE001
@@ -24,86 +307,224 @@ class Command(BaseCommand):
             )
             return
 
-        host = getattr(settings, "MQTT_BROKER_HOST", "127.0.0.1")
-        port = getattr(settings, "MQTT_BROKER_PORT", 1883)
-
         def on_connect(client, userdata, flags, rc):  # type: ignore[override]
             if rc == 0:
                 self.stdout.write(self.style.SUCCESS("Connected to MQTT broker"))
-                client.subscribe("flood/+/uplink")
+                client.subscribe(self.topic, qos=1)
             else:
                 self.stderr.write(f"MQTT connection failed with code {rc}")
 
         def on_message(client, userdata, msg):  # type: ignore[override]
-            try:
-                payload = json.loads(msg.payload.decode("utf-8"))
-            except Exception:
-                self.stderr.write("Received non-JSON payload; ignoring")
+            if not self._owns(msg.topic):
                 return
+            try:
+                self.sites.refresh_if_due()
+                uplink = self._decode(msg.payload, msg.topic)
+                if uplink is None:
+                    return
+                if buffer is None:
+                    self._stored(store_uplinks([uplink]), 1)
+                else:
+                    self._enqueue(buffer, uplink)
+            except Exception as exc:  # noqa: BLE001
+                self._reject(exc)
 
-            imei = payload.get("IMEI") or payload.get("imei")
-            handle = payload.get("handle") or payload.get("site") or payload.get(
-                "station"
-            )
+        client = mqtt.Client()
+        client.on_connect = on_connect
+        client.on_message = on_message
 
-            site = None
-            if imei:
-                site = FloodSite.objects.filter(imei=imei).first()
-            if site is None and handle:
-                site = FloodSite.objects.filter(handle=str(handle)).first()
+        def stop(signum, frame):
+            client.disconnect()
 
-            if site is None:
-                self.stderr.write(
-                    "No FloodSite found for incoming payload; "
-                    "ensure IMEI or handle fields match configured sites."
-                )
-                return
+        signal.signal(signal.SIGTERM, stop)
 
-            # Flexible distance parsing
-            distance = (
-                payload.get("distance_mm")
-                or payload.get("distance")
-                or payload.get("WL_Ht")
+        self.stdout.write(
+            f"Connecting to MQTT broker at {host}:{port} and subscribing to {self.topic}"
+        )
+        client.connect(host, port, 60)
+        try:
+            client.loop_forever()
+        except KeyboardInterrupt:
+            client.disconnect()
+
+    def _run_async(self, host: str, port: int, buffer, options) -> None:
+        try:
+            from amqtt.client import MQTTClient  # type: ignore[import-not-found]
+            from amqtt.mqtt.constants import QOS_1  # type: ignore[import-not-found]
+        except Exception:  # noqa: BLE001
+            self.stderr.write(
+                "The 'amqtt' package is not installed.\n"
+                "Install it with:\n"
+                "  pip install amqtt\n"
             )
-            if distance is None:
-                self.stderr.write("Payload missing distance field; ignoring")
-                return
+            return
 
-            try:
-                distance_mm = int(float(distance))
-            except (TypeError, ValueError):
-                self.stderr.write("Could not parse distance field; ignoring")
-                return
+        # Anything that may touch the database runs here, off the event loop.
+        db_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="flood-db")
+        blocking_put = buffer.policy == "block"
 
-            battery = payload.get("battery") or payload.get("battery_v")
-            signal = payload.get("signal") or payload.get("rssi")
+        async def refresh_sites():
+            loop = asyncio.get_running_loop()
+            while True:
+                try:
+                    await loop.run_in_executor(db_executor, self.sites.refresh_if_due)
+                except Exception as exc:  # noqa: BLE001
+                    self.stderr.write(f"Site index refresh failed: {exc}")
+                await asyncio.sleep(self.sites.refresh_interval or 1)
 
-            try:
-                battery_v = float(battery) if battery is not None else None
-            except (TypeError, ValueError):
-                battery_v = None
+        async def consume(client):
+            loop = asyncio.get_running_loop()
+            while True:
+                message = await client.deliver_message()
+                if not self._owns(message.topic):
+                    continue
+                try:
+                    uplink = self._decode(bytes(message.data), message.topic)
+                    if uplink is None:
+                        continue
+                    if blocking_put:
+                        # Wait for queue space without stalling the other consumers.
+                        await loop.run_in_executor(None, buffer.put, uplink)
+                    else:
+                        self._enqueue(buffer, uplink)
+                except Exception as exc:  # noqa: BLE001
+                    # An unhandled error would end this consumer for good.
+                    self._reject(exc)
 
-            try:
-                signal_dbm = int(signal) if signal is not None else None
-            except (TypeError, ValueError):
-                signal_dbm = None
-
-            Uplink.objects.create(
-                site=site,
-                distance_mm=distance_mm,
-                battery_v=battery_v,
-                signal_dbm=signal_dbm,
-                raw_payload=payload,
+        async def main():
+            client = MQTTClient()
+            self.stdout.write(
+                f"Connecting to MQTT broker at {host}:{port} and subscribing to "
+                f"{self.topic} (asyncio)"
             )
+            await client.connect(f"mqtt://{host}:{port}/")
+            await client.subscribe([(self.topic, QOS_1)])
+            self.stdout.write(self.style.SUCCESS("Connected to MQTT broker"))
 
-        client = mqtt.Client()
-        client.on_connect = on_connect
-        client.on_message = on_message
+            loop = asyncio.get_running_loop()
+            tasks = [loop.create_task(refresh_sites())]
+            tasks += [
+                loop.create_task(consume(client))
+                for _ in range(max(1, options["concurrency"]))
+            ]
+            stopped = asyncio.Event()
+            loop.add_signal_handler(signal.SIGTERM, stopped.set)
+            try:
+                await stopped.wait()
+            finally:
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                await client.disconnect()
+
+        try:
+            asyncio.run(main())
+        except KeyboardInterrupt:
+            self.stdout.write("Listener stopped by user.")
+        finally:
+            db_executor.shutdown(wait=True)
 
+    def _supervise(self, options) -> None:
+        """Run and watch ``--workers`` copies of this command."""
+        workers = [_Worker(index) for index in range(options["workers"])]
+        health_interval = options["health_interval"]
+        if health_interval > 0 and not options["stats_interval"]:
+            options["stats_interval"] = health_interval
+        stopping = threading.Event()
+
+        def stop(signum, frame):
+            stopping.set()
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
         self.stdout.write(
-            f"Connecting to MQTT broker at {host}:{port} and subscribing to flood/+/uplink"
+            f"Supervising {len(workers)} ingest workers ({options['shard_mode']} sharding)"
         )
-        client.connect(host, port, 60)
-        client.loop_forever()
 
+        next_health = time.monotonic() + health_interval
+        while not stopping.is_set():
+            now = time.monotonic()
+            for worker in workers:
+                process = worker.process
+                if process is not None and process.poll() is None:
+                    continue
+                if process is not None:
+                    # Back off on crash loops, but not after a long healthy run.
+                    worker.failures = worker.failures + 1 if now - worker.started < 60 else 0
+                    worker.next_start = now + min(60, 2**worker.failures)
+                    worker.process = None
+                    self.stderr.write(
+                        f"Worker {worker.index} exited with code {process.returncode}; "
+                        f"restarting in {worker.next_start - now:.0f}s"
+                    )
+                elif now >= worker.next_start:
+                    if worker.started:
+                        worker.restarts += 1
+                    self._spawn(worker, options)
+            if health_interval > 0 and now >= next_health:
+                next_health = now + health_interval
+                self._report_health(workers)
+            stopping.wait(0.5)
+
+        self.stdout.write("Stopping ingest workers...")
+        for worker in workers:
+            if worker.process is not None and worker.process.poll() is None:
+                worker.process.terminate()
+        for worker in workers:
+            if worker.process is None:
+                continue
+            try:
+                worker.process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                worker.process.kill()
+                self.stderr.write(f"Worker {worker.index} did not drain in time; killed")
+        self._report_health(workers)
+
+    def _spawn(self, worker: _Worker, options) -> None:
+        command = [
+            sys.executable,
+            sys.argv[0],
+            "run_flood_mqtt_listener",
+            f"--workers={options['workers']}",
+            f"--worker-index={worker.index}",
+        ]
+        command += [
+            f"--{name.replace('_', '-')}={options[name]}" for name in WORKER_OPTIONS
+        ]
+        if options["use_async"]:
+            command.append("--async")
+        worker.process = subprocess.Popen(
+            command,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            bufsize=1,
+            env={**os.environ, "PYTHONUNBUFFERED": "1"},
+            # Own session: a terminal Ctrl-C reaches only the supervisor, which
+            # then stops each worker once so it can drain its queue.
+            start_new_session=True,
+        )
+        worker.started = time.monotonic()
+        threading.Thread(
+            target=self._relay_output, args=(worker, worker.process), daemon=True
+        ).start()
+
+    def _relay_output(self, worker: _Worker, process: subprocess.Popen) -> None:
+        for line in process.stdout:
+            line = line.rstrip("\n")
+            if line.startswith("received="):
+                worker.last_stats = line
+            self.stdout.write(f"[worker {worker.index}] {line}")
 
+    def _report_health(self, workers: list[_Worker]) -> None:
+        now = time.monotonic()
+        for worker in workers:
+            process = worker.process
+            if process is not None and process.poll() is None:
+                state = f"up {now - worker.started:.0f}s pid={process.pid}"
+            else:
+                state = "down"
+            self.stdout.write(
+                f"worker {worker.index}: {state} restarts={worker.restarts} "
+                f"{worker.last_stats}".rstrip()
+            )
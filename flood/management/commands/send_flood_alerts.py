@@ -0,0 +1,29 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from flood.alerts import deliver_alerts, load_backends, pending_alerts
+
+
+class Command(BaseCommand):
+    help = (
+        "Send flood alerts that the ingest listener could not deliver "
+        "(for example while the mail server was down). Run from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--max-age-hours",
+            type=float,
+            default=24,
+            help="Skip alerts older than this; they are no longer useful to send.",
+        )
+
+    def handle(self, *args, **options):
+        since = timezone.now() - timedelta(hours=options["max_age_hours"])
+        alerts = pending_alerts().filter(created_at__gte=since).select_related(
+            "site", "site__owner"
+        )
+        sent, failed = deliver_alerts(alerts.order_by("created_at"), load_backends())
+        self.stdout.write(f"Sent {sent} flood alerts ({failed} failed)")
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+
+from flood.health import update_site_health
+from flood.models import FloodSite
+
+
+class Command(BaseCommand):
+    help = (
+        "Maintain the per-site sensor health table (last seen, expected reporting "
+        "interval, battery and signal trends, offline/battery-failing flags).\n"
+        "Run it from cron every few minutes; the map and dashboards read the result."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--site",
+            action="append",
+            dest="sites",
+            metavar="HANDLE",
+            help="Only update this site (repeatable).",
+        )
+
+    def handle(self, *args, **options) -> None:
+        handles = dict(FloodSite.objects.values_list("pk", "handle"))
+        site_ids = None
+        if options["sites"]:
+            site_ids = [pk for pk, handle in handles.items() if handle in options["sites"]]
+        results = update_site_health(site_ids=site_ids)
+        for health in results:
+            flags = [
+                label
+                for label, flag in (
+                    ("offline", health.offline),
+                    ("battery failing", health.battery_failing),
+                )
+                if flag
+            ]
+            if flags:
+                self.stderr.write(f"{handles[health.site_id]}: {', '.join(flags)}")
+        offline = sum(health.offline for health in results)
+        failing = sum(health.battery_failing for health in results)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Updated health for {len(results)} sites "
+                f"({offline} offline, {failing} battery failing)"
+            )
+        )
@@ -0,0 +1,38 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from flood.models import UplinkRollup
+from flood.rollups import update_rollups
+
+
+class Command(BaseCommand):
+    help = (
+        "Maintain hourly and daily floodway rollups (min/max/mean distance, "
+        "last battery, min signal, sample count) from raw uplinks.\n"
+        "Run it from cron; each run only recomputes buckets that can still change."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            help="Recompute buckets for the last N days.",
+        )
+        parser.add_argument(
+            "--rebuild",
+            action="store_true",
+            help="Delete all rollups and rebuild them from every stored uplink.",
+        )
+
+    def handle(self, *args, **options) -> None:
+        since = None
+        if options["rebuild"]:
+            deleted, _ = UplinkRollup.objects.all().delete()
+            self.stdout.write(f"Deleted {deleted} existing rollups")
+        elif options["days"] is not None:
+            since = timezone.now() - timedelta(days=options["days"])
+
+        written = update_rollups(since=since)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} rollup buckets"))
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-18 16:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flood', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='floodsite',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.1.4 on 2026-10-18 16:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_latest_uplink(apps, schema_editor):
+    FloodSite = apps.get_model('flood', 'FloodSite')
+    Uplink = apps.get_model('flood', 'Uplink')
+    for site in FloodSite.objects.all():
+        latest_pk = (
+            Uplink.objects.filter(site=site)
+            .order_by('-received_at', '-pk')
+            .values_list('pk', flat=True)
+            .first()
+        )
+        if latest_pk is not None:
+            FloodSite.objects.filter(pk=site.pk).update(latest_uplink_id=latest_pk)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flood', '0002_floodsite_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='floodsite',
+            name='latest_uplink',
+            field=models.ForeignKey(blank=True, editable=False, help_text='Most recent uplink, maintained at ingest time.', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='flood.uplink'),
+        ),
+        migrations.RunPython(backfill_latest_uplink, migrations.RunPython.noop),
+    ]
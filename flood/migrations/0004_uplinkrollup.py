@@ -0,0 +1,44 @@
+# Generated by Django 5.1.4 on 2026-10-18 16:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flood', '0003_floodsite_latest_uplink'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupProgress',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_uplink_id', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'rollup progress',
+            },
+        ),
+        migrations.CreateModel(
+            name='UplinkRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('hour', 'Hourly'), ('day', 'Daily')], max_length=4)),
+                ('bucket_start', models.DateTimeField()),
+                ('distance_min', models.IntegerField()),
+                ('distance_max', models.IntegerField()),
+                ('distance_mean', models.FloatField()),
+                ('battery_last', models.FloatField(blank=True, null=True)),
+                ('signal_min', models.IntegerField(blank=True, null=True)),
+                ('sample_count', models.PositiveIntegerField()),
+                ('site', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='flood.floodsite')),
+            ],
+            options={
+                'ordering': ['site', 'period', 'bucket_start'],
+                'constraints': [models.UniqueConstraint(fields=('site', 'period', 'bucket_start'), name='flood_rollup_unique_bucket')],
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.4 on 2026-10-18 16:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flood', '0004_uplinkrollup'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='uplink',
+            index=models.Index(fields=['site', 'received_at'], name='flood_uplink_site_recv_idx'),
+        ),
+    ]
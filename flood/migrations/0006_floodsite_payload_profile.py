@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-18 16:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flood', '0005_uplink_site_received_at_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='floodsite',
+            name='payload_profile',
+            field=models.CharField(blank=True, help_text='Payload decoder profile for this device (see FLOOD_PAYLOAD_PROFILES). Blank uses the default JSON decoder.', max_length=50),
+        ),
+    ]
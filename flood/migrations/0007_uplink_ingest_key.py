@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-18 16:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flood', '0006_floodsite_payload_profile'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uplink',
+            name='ingest_key',
+            field=models.CharField(blank=True, editable=False, help_text='Idempotency key set by the ingest spool; replays with the same key are skipped.', max_length=64, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.1.4 on 2026-10-18 16:37
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flood', '0007_uplink_ingest_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='floodsite',
+            name='alert_state',
+            field=models.CharField(default='unknown', editable=False, help_text='Level state last confirmed by the ingest alert engine.', max_length=10),
+        ),
+        migrations.CreateModel(
+            name='FloodAlert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('previous_state', models.CharField(max_length=10)),
+                ('state', models.CharField(max_length=10)),
+                ('distance_mm', models.IntegerField()),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('notified_at', models.DateTimeField(blank=True, null=True)),
+                ('notify_error', models.TextField(blank=True)),
+                ('site', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alerts', to='flood.floodsite')),
+                ('uplink', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='flood.uplink')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['site', 'created_at'], name='flood_alert_site_created_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.1.4 on 2026-10-18 16:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flood', '0008_floodalert'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SiteHealth',
+            fields=[
+                ('site', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='health', serialize=False, to='flood.floodsite')),
+                ('last_seen', models.DateTimeField(blank=True, null=True)),
+                ('expected_interval_s', models.FloatField(blank=True, help_text='Median gap between recent uplinks (seconds).', null=True)),
+                ('offline_after_s', models.FloatField(help_text='Silence (seconds) after which the sensor is considered offline.')),
+                ('battery_v', models.FloatField(blank=True, null=True)),
+                ('battery_slope_v_per_day', models.FloatField(blank=True, null=True)),
+                ('signal_mean_dbm', models.FloatField(blank=True, null=True)),
+                ('signal_slope_db_per_day', models.FloatField(blank=True, null=True)),
+                ('sample_count', models.PositiveIntegerField(default=0)),
+                ('offline', models.BooleanField(default=False)),
+                ('battery_failing', models.BooleanField(default=False)),
+                ('computed_at', models.DateTimeField()),
+                ('changed_at', models.DateTimeField(help_text='When the offline or battery_failing flag last changed.')),
+            ],
+            options={
+                'verbose_name_plural': 'site health',
+            },
+        ),
+    ]
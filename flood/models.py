@@ -2,6 +2,11 @@ from django.conf import settings
 from django.db import models
 from django.utils import timezone
 
+from . import levels
+
+# Sites without a computed health row are shown as offline after this long.
+DEFAULT_OFFLINE_MINUTES = 12 * 60
+
 
 class FloodSite(models.Model):
     handle = models.CharField(
@@ -20,6 +25,14 @@ class FloodSite(models.Model):
         blank=True,
         help_text="Optional IMEI or device identifier used in payloads.",
     )
+    payload_profile = models.CharField(
+        max_length=50,
+        blank=True,
+        help_text=(
+            "Payload decoder profile for this device (see FLOOD_PAYLOAD_PROFILES). "
+            "Blank uses the default JSON decoder."
+        ),
+    )
     owner = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.SET_NULL,
@@ -48,6 +61,22 @@ class FloodSite(models.Model):
         blank=True,
         help_text="Distance (mm) where water over road is significant.",
     )
+    alert_state = models.CharField(
+        max_length=10,
+        default="unknown",
+        editable=False,
+        help_text="Level state last confirmed by the ingest alert engine.",
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+    latest_uplink = models.ForeignKey(
+        "Uplink",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        editable=False,
+        related_name="+",
+        help_text="Most recent uplink, maintained at ingest time.",
+    )
 
     class Meta:
         ordering = ["handle"]
@@ -55,24 +84,37 @@ class FloodSite(models.Model):
     def __str__(self) -> str:
         return f"{self.name} [{self.handle}]"
 
-    def level_state_for_distance(self, distance_mm: int | None) -> str:
-        if distance_mm is None:
-            return "unknown"
+    def map_state(self, now=None, level_state: str | None = None) -> dict | None:
+        """Marker data for the map; pass ``level_state`` if already classified in bulk."""
+        uplink = self.latest_uplink
+        if uplink is None:
+            return None
+        now = now or timezone.now()
+        minutes_since = int((now - uplink.received_at).total_seconds() / 60)
+        try:
+            health = self.health
+        except SiteHealth.DoesNotExist:
+            health = None
+        if health is not None:
+            offline = health.is_offline(uplink.received_at, now)
+        else:
+            offline = minutes_since > DEFAULT_OFFLINE_MINUTES
+        return {
+            "lat": float(self.latitude),
+            "lng": float(self.longitude),
+            "location": self.location_description,
+            "distance": uplink.distance_mm,
+            "battery": uplink.battery_v,
+            "signal": uplink.signal_dbm,
+            "timestamp": uplink.received_at.isoformat(),
+            "minutes_since_last_uplink": minutes_since,
+            "offline": offline,
+            "battery_failing": health is not None and health.battery_failing,
+            "level_state": level_state or self.level_state_for_distance(uplink.distance_mm),
+        }
 
-        low_low = self.trigger_low_low_mm
-        low = self.trigger_low_mm
-        high = self.trigger_high_mm
-        high_high = self.trigger_high_high_mm
-
-        if high_high is not None and distance_mm >= high_high:
-            return "high_high"
-        if high is not None and distance_mm >= high:
-            return "high"
-        if low_low is not None and distance_mm <= low_low:
-            return "low_low"
-        if low is not None and distance_mm <= low:
-            return "low"
-        return "unknown"
+    def level_state_for_distance(self, distance_mm: int | None) -> str:
+        return levels.level_state(distance_mm, levels.site_thresholds(self))
 
 
 class Uplink(models.Model):
@@ -84,9 +126,22 @@ class Uplink(models.Model):
     signal_dbm = models.IntegerField(null=True, blank=True)
     received_at = models.DateTimeField(default=timezone.now)
     raw_payload = models.JSONField(blank=True, null=True)
+    ingest_key = models.CharField(
+        max_length=64,
+        unique=True,
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="Idempotency key set by the ingest spool; replays with the same key are skipped.",
+    )
 
     class Meta:
         ordering = ["-received_at"]
+        indexes = [
+            models.Index(
+                fields=["site", "received_at"], name="flood_uplink_site_recv_idx"
+            ),
+        ]
 
     def __str__(self) -> str:
         return f"{self.site.handle} at {self.received_at}"
@@ -96,3 +151,108 @@ class Uplink(models.Model):
         return self.site.level_state_for_distance(self.distance_mm)
 
 
+class UplinkRollup(models.Model):
+    PERIOD_CHOICES = [
+        ("hour", "Hourly"),
+        ("day", "Daily"),
+    ]
+
+    site = models.ForeignKey(
+        FloodSite, on_delete=models.CASCADE, related_name="rollups"
+    )
+    period = models.CharField(max_length=4, choices=PERIOD_CHOICES)
+    bucket_start = models.DateTimeField()
+    distance_min = models.IntegerField()
+    distance_max = models.IntegerField()
+    distance_mean = models.FloatField()
+    battery_last = models.FloatField(null=True, blank=True)
+    signal_min = models.IntegerField(null=True, blank=True)
+    sample_count = models.PositiveIntegerField()
+
+    class Meta:
+        ordering = ["site", "period", "bucket_start"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["site", "period", "bucket_start"],
+                name="flood_rollup_unique_bucket",
+            )
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.site.handle} {self.period} from {self.bucket_start}"
+
+
+class RollupProgress(models.Model):
+    """The newest uplink ``update_rollups`` has seen; a single row."""
+
+    last_uplink_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = "rollup progress"
+
+    def __str__(self) -> str:
+        return f"Rollups up to uplink {self.last_uplink_id}"
+
+
+class FloodAlert(models.Model):
+    """A confirmed change of a site's level state, detected at ingest."""
+
+    site = models.ForeignKey(
+        FloodSite, on_delete=models.CASCADE, related_name="alerts"
+    )
+    previous_state = models.CharField(max_length=10)
+    state = models.CharField(max_length=10)
+    distance_mm = models.IntegerField()
+    uplink = models.ForeignKey(
+        Uplink, on_delete=models.SET_NULL, null=True, blank=True, related_name="+"
+    )
+    created_at = models.DateTimeField(default=timezone.now)
+    notified_at = models.DateTimeField(null=True, blank=True)
+    notify_error = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["site", "created_at"], name="flood_alert_site_created_idx"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.site.handle}: {self.previous_state} -> {self.state}"
+
+
+class SiteHealth(models.Model):
+    """Sensor health for a site, maintained by ``update_flood_health``."""
+
+    site = models.OneToOneField(
+        FloodSite, on_delete=models.CASCADE, primary_key=True, related_name="health"
+    )
+    last_seen = models.DateTimeField(null=True, blank=True)
+    expected_interval_s = models.FloatField(
+        null=True, blank=True, help_text="Median gap between recent uplinks (seconds)."
+    )
+    offline_after_s = models.FloatField(
+        help_text="Silence (seconds) after which the sensor is considered offline."
+    )
+    battery_v = models.FloatField(null=True, blank=True)
+    battery_slope_v_per_day = models.FloatField(null=True, blank=True)
+    signal_mean_dbm = models.FloatField(null=True, blank=True)
+    signal_slope_db_per_day = models.FloatField(null=True, blank=True)
+    sample_count = models.PositiveIntegerField(default=0)
+    offline = models.BooleanField(default=False)
+    battery_failing = models.BooleanField(default=False)
+    computed_at = models.DateTimeField()
+    changed_at = models.DateTimeField(
+        help_text="When the offline or battery_failing flag last changed."
+    )
+
+    class Meta:
+        verbose_name_plural = "site health"
+
+    def __str__(self) -> str:
+        return f"{self.site.handle} health at {self.computed_at}"
+
+    def is_offline(self, last_seen, now) -> bool:
+        if last_seen is None:
+            return True
+        return (now - last_seen).total_seconds() > self.offline_after_s
@@ -0,0 +1,164 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+from amqtt.plugins.base import BasePlugin  # type: ignore[import-not-found]
+
+from .alerts import AlertDispatcher, AlertEngine, load_backends
+from .decoders import default_registry
+from .dedupe import Deduplicator
+from .ingest import (
+    IngestStats,
+    PayloadError,
+    UplinkBuffer,
+    decode_message,
+    topic_device,
+)
+from .site_index import SiteIndex
+from .spool import SpooledUplinkWriter, UplinkSpool
+
+PLUGIN_PATH = "flood.mqtt_bridge.FloodIngestPlugin"
+
+
+class FloodIngestPlugin(BasePlugin):
+    """
+    amqtt broker plugin that stores ``flood/+/uplink`` publishes directly.
+
+    This removes the separate ``run_flood_mqtt_listener`` process and its TCP
+    subscription from the ingest path: payloads are decoded on the broker's
+    event loop and handed to the same batched writer thread the listener
+    uses. Enable it with ``run_mqtt_broker --ingest``.
+    """
+
+    @dataclass
+    class Config:
+        batch_size: int = 200
+        flush_interval: float = 1.0
+        queue_size: int = 10000
+        backpressure: str = "block"
+        site_refresh_interval: float = 30.0
+        site_negative_ttl: float = 60.0
+        stats_interval: float = 0
+        dedupe: bool = True
+        alerts: bool = True
+        alert_hysteresis_mm: int = 50
+        alert_debounce: int = 2
+        dedupe_cache_size: int = 100000
+        dedupe_window: float = 3600.0
+        spool_dir: str = ""
+        spool_segment_bytes: int = 16 * 1024 * 1024
+        spool_fsync: bool = False
+
+    def __init__(self, context) -> None:
+        super().__init__(context)
+        self.stats = IngestStats()
+        default_registry()  # fail at startup on a bad FLOOD_PAYLOAD_PROFILES
+        self.sites = SiteIndex(
+            refresh_interval=self.config.site_refresh_interval,
+            negative_ttl=self.config.site_negative_ttl,
+        ).connect_signals()
+        self.dispatcher = None
+        self.alerts = None
+        if self.config.alerts:
+            self.dispatcher = AlertDispatcher(
+                load_backends(), on_error=self.context.logger.error
+            ).start()
+            self.alerts = AlertEngine(
+                self.sites,
+                hysteresis_mm=self.config.alert_hysteresis_mm,
+                debounce=self.config.alert_debounce,
+                dispatcher=self.dispatcher,
+                on_error=self.context.logger.error,
+            )
+        self.dedupe = None
+        if self.config.dedupe:
+            self.dedupe = Deduplicator(
+                max_entries=self.config.dedupe_cache_size,
+                window=self.config.dedupe_window,
+            )
+        if self.config.spool_dir:
+            self.buffer = SpooledUplinkWriter(
+                UplinkSpool(
+                    self.config.spool_dir,
+                    segment_bytes=self.config.spool_segment_bytes,
+                    fsync=self.config.spool_fsync,
+                ),
+                batch_size=self.config.batch_size,
+                flush_interval=self.config.flush_interval,
+                on_error=self.context.logger.error,
+                on_flush=self._stored,
+            ).start()
+        else:
+            self.buffer = UplinkBuffer(
+                batch_size=self.config.batch_size,
+                flush_interval=self.config.flush_interval,
+                max_size=self.config.queue_size,
+                policy=self.config.backpressure,
+                on_error=self.context.logger.error,
+                on_flush=self._stored,
+            ).start()
+        self._db_executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="flood-db"
+        )
+        self._tasks: list[asyncio.Task] = []
+
+    async def on_broker_pre_start(self) -> None:
+        # The broker is built inside its event loop, so every database call,
+        # including the initial site load, goes through the executor.
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._db_executor, self.sites.load)
+        self.context.logger.info(f"Loaded {len(self.sites)} flood sites into the site index")
+
+    async def on_broker_post_start(self) -> None:
+        loop = asyncio.get_running_loop()
+        self._tasks.append(loop.create_task(self._refresh_sites()))
+        if self.config.stats_interval > 0:
+            self._tasks.append(loop.create_task(self._report_stats()))
+
+    async def on_broker_message_received(self, *, client_id: str, message) -> None:
+        if message is None or topic_device(message.topic) is None:
+            return
+        try:
+            uplink = decode_message(bytes(message.data), self.sites, message.topic)
+        except PayloadError as exc:
+            self.stats.record_received(rejected=True)
+            self.context.logger.warning(str(exc))
+            return
+        if self.dedupe is not None and self.dedupe.is_duplicate(uplink):
+            self.stats.record_received(duplicate=True)
+            return
+        self.stats.record_received()
+        if self.buffer.policy == "block":
+            await asyncio.get_running_loop().run_in_executor(None, self.buffer.put, uplink)
+        elif not self.buffer.put(uplink):
+            self.context.logger.warning("Ingest queue full; dropped uplink")
+
+    async def close(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.buffer.close)
+        if self.dispatcher is not None:
+            await loop.run_in_executor(None, self.dispatcher.close, 30)
+        self._db_executor.shutdown(wait=False)
+        self.context.logger.info(
+            f"Flood ingest stopped: {self.buffer.written} uplinks written, "
+            f"{self.buffer.dropped} dropped"
+        )
+
+    def _stored(self, uplinks, attempted: int) -> None:
+        # Runs on the writer thread, after each batch is committed.
+        self.stats.record_stored(uplinks, attempted)
+        if self.alerts is not None:
+            self.alerts.process(uplinks)
+
+    async def _refresh_sites(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.sites.refresh_interval or 1)
+            await loop.run_in_executor(self._db_executor, self.sites.refresh_if_due)
+
+    async def _report_stats(self) -> None:
+        while True:
+            await asyncio.sleep(self.config.stats_interval)
+            self.context.logger.warning(f"Flood ingest: {self.stats.snapshot()}")
@@ -0,0 +1,184 @@
+from datetime import datetime
+
+from django.db.models import Avg, Count, Max, Min, Q
+from django.db.models.functions import TruncDay, TruncHour
+from django.utils import timezone
+
+from .models import FloodSite, RollupProgress, Uplink, UplinkRollup
+
+PERIODS = {"hour": TruncHour, "day": TruncDay}
+
+ROLLUP_FIELDS = [
+    "distance_min",
+    "distance_max",
+    "distance_mean",
+    "battery_last",
+    "signal_min",
+    "sample_count",
+]
+
+
+def bucket_start(value: datetime, period: str) -> datetime:
+    # Buckets follow local time so daily rollups line up with calendar days.
+    local = timezone.localtime(value).replace(minute=0, second=0, microsecond=0)
+    if period == "day":
+        local = local.replace(hour=0)
+    return local
+
+
+def update_rollups(*, since: datetime | None = None, site_ids=None, batch_size: int = 1000) -> int:
+    """
+    Recompute hourly and daily rollups from raw uplinks.
+
+    Without ``since`` each period restarts from its newest stored bucket,
+    which is the only one that can still be receiving readings, so repeated
+    runs only touch recent rows. Readings stored since the last such run
+    with an older ``received_at`` (spool replays, imported history) are
+    found by primary key, and their sites are recomputed from the earliest
+    of them. Pass ``since`` to recompute a range explicitly.
+    """
+    incremental = since is None and site_ids is None
+    late = {}
+    if incremental:
+        progress, created = RollupProgress.objects.get_or_create(pk=1)
+        newest = Uplink.objects.aggregate(newest=Max("pk"))["newest"] or 0
+        if not created:
+            late = dict(
+                Uplink.objects.filter(pk__gt=progress.last_uplink_id, pk__lte=newest)
+                .order_by()
+                .values("site_id")
+                .annotate(first=Min("received_at"))
+                .values_list("site_id", "first")
+            )
+
+    written = 0
+    for period in PERIODS:
+        uplinks = Uplink.objects.all()
+        if since is not None:
+            uplinks = uplinks.filter(received_at__gte=bucket_start(since, period))
+        else:
+            latest = (
+                UplinkRollup.objects.filter(period=period)
+                .aggregate(latest=Max("bucket_start"))["latest"]
+            )
+            if latest is not None:
+                recent = Q(received_at__gte=latest)
+                for site_id, first in late.items():
+                    if first < latest:
+                        recent |= Q(site_id=site_id, received_at__gte=bucket_start(first, period))
+                uplinks = uplinks.filter(recent)
+        if site_ids is not None:
+            uplinks = uplinks.filter(site_id__in=site_ids)
+        written += _roll(uplinks, period, batch_size)
+
+    if incremental:
+        progress.last_uplink_id = newest
+        progress.save(update_fields=["last_uplink_id", "updated_at"])
+    return written
+
+
+def _roll(uplinks, period: str, batch_size: int) -> int:
+    rows = uplinks.order_by("site_id", "received_at", "pk").values_list(
+        "site_id", "received_at", "distance_mm", "battery_v", "signal_dbm"
+    ).iterator(chunk_size=5000)
+
+    written = 0
+    pending: list[UplinkRollup] = []
+    current = None
+    for site_id, received_at, distance, battery, signal in rows:
+        key = (site_id, bucket_start(received_at, period))
+        if current is None or (current.site_id, current.bucket_start) != key:
+            if current is not None:
+                pending.append(_finish(current))
+            current = UplinkRollup(
+                site_id=site_id,
+                period=period,
+                bucket_start=key[1],
+                distance_min=distance,
+                distance_max=distance,
+                distance_mean=0.0,
+                sample_count=0,
+            )
+        current.distance_min = min(current.distance_min, distance)
+        current.distance_max = max(current.distance_max, distance)
+        current.distance_mean += distance
+        current.sample_count += 1
+        if battery is not None:
+            current.battery_last = battery
+        if signal is not None and (
+            current.signal_min is None or signal < current.signal_min
+        ):
+            current.signal_min = signal
+        if len(pending) >= batch_size:
+            written += _upsert(pending)
+            pending = []
+    if current is not None:
+        pending.append(_finish(current))
+    return written + _upsert(pending)
+
+
+def _finish(rollup: UplinkRollup) -> UplinkRollup:
+    rollup.distance_mean = rollup.distance_mean / rollup.sample_count
+    return rollup
+
+
+def _upsert(rollups: list[UplinkRollup]) -> int:
+    if not rollups:
+        return 0
+    UplinkRollup.objects.bulk_create(
+        rollups,
+        update_conflicts=True,
+        unique_fields=["site", "period", "bucket_start"],
+        update_fields=ROLLUP_FIELDS,
+    )
+    return len(rollups)
+
+
+def bucketed_rows(site: FloodSite, since: datetime, period: str) -> list[dict]:
+    """
+    Per-bucket mean/min/max/count for ``site`` from ``since`` until now.
+
+    Finished buckets come from the rollup table; the newest stored bucket
+    and anything after it are aggregated from raw uplinks so recent data is
+    never stale.
+    """
+    rollups = UplinkRollup.objects.filter(site=site, period=period)
+    cutoff = rollups.aggregate(latest=Max("bucket_start"))["latest"]
+
+    rows = []
+    if cutoff is not None:
+        rows = [
+            {
+                "bucket": timezone.localtime(bucket),
+                "mean": mean,
+                "low": low,
+                "high": high,
+                "count": count,
+            }
+            for bucket, mean, low, high, count in rollups.filter(
+                bucket_start__gte=bucket_start(since, period),
+                bucket_start__lt=cutoff,
+            )
+            .order_by("bucket_start")
+            .values_list(
+                "bucket_start",
+                "distance_mean",
+                "distance_min",
+                "distance_max",
+                "sample_count",
+            )
+        ]
+
+    raw = site.uplinks.filter(received_at__gte=max(since, cutoff or since))
+    rows.extend(
+        raw.annotate(bucket=PERIODS[period]("received_at"))
+        .values("bucket")
+        .annotate(
+            mean=Avg("distance_mm"),
+            low=Min("distance_mm"),
+            high=Max("distance_mm"),
+            count=Count("pk"),
+        )
+        .order_by("bucket")
+    )
+    return rows
@@ -0,0 +1,130 @@
+import threading
+import time
+
+from django.db.models.signals import post_delete, post_save
+
+from .models import FloodSite
+
+
+class SiteIndex:
+    """
+    In-memory IMEI/handle -> FloodSite lookup for the ingest hot path.
+
+    The index is loaded once and then kept current by two mechanisms:
+    ``post_save``/``post_delete`` signals for edits made in this process, and
+    a periodic check of every site's id and ``updated_at`` for edits made
+    elsewhere, e.g. through the admin. Only sites added or changed since the
+    last check are reloaded, and deleted ones are dropped. Misses are
+    remembered for ``negative_ttl`` seconds so unknown devices do not cost a
+    query per message either; at most ``max_misses`` are kept, so a stream of
+    random device ids cannot grow the index without bound.
+    """
+
+    def __init__(
+        self,
+        *,
+        refresh_interval: float = 30.0,
+        negative_ttl: float = 60.0,
+        max_misses: int = 10000,
+    ):
+        self.refresh_interval = refresh_interval
+        self.negative_ttl = negative_ttl
+        self.max_misses = max_misses
+        self._by_imei: dict[str, FloodSite] = {}
+        self._by_handle: dict[str, FloodSite] = {}
+        self._by_pk: dict[int, FloodSite] = {}
+        self._misses: dict[tuple[str | None, str | None], float] = {}
+        self._next_check = 0.0
+        self._stale = True
+        self._lock = threading.Lock()
+
+    def connect_signals(self) -> "SiteIndex":
+        post_save.connect(self._mark_stale, sender=FloodSite, weak=False)
+        post_delete.connect(self._mark_stale, sender=FloodSite, weak=False)
+        return self
+
+    def disconnect_signals(self) -> None:
+        post_save.disconnect(self._mark_stale, sender=FloodSite)
+        post_delete.disconnect(self._mark_stale, sender=FloodSite)
+
+    def load(self) -> "SiteIndex":
+        with self._lock:
+            self._reload(FloodSite.objects.all(), full=True)
+        return self
+
+    def resolve(self, imei=None, handle=None) -> FloodSite | None:
+        self.refresh_if_due()
+        return self.lookup(imei=imei, handle=handle)
+
+    def lookup(self, imei=None, handle=None) -> FloodSite | None:
+        """Like ``resolve`` but never queries; safe to call from async code."""
+        site = None
+        if imei:
+            site = self._by_imei.get(str(imei))
+        if site is None and handle:
+            site = self._by_handle.get(str(handle))
+        if site is not None:
+            return site
+
+        key = (imei and str(imei), handle and str(handle))
+        now = time.monotonic()
+        expires = self._misses.get(key)
+        if expires is not None and expires > now:
+            return None
+        if len(self._misses) >= self.max_misses:
+            self._misses = {
+                miss: until for miss, until in self._misses.items() if until > now
+            }
+            if len(self._misses) >= self.max_misses:
+                self._misses = {}
+        self._misses[key] = now + self.negative_ttl
+        return None
+
+    def get(self, pk: int) -> FloodSite | None:
+        return self._by_pk.get(pk)
+
+    def refresh_if_due(self) -> None:
+        now = time.monotonic()
+        if not self._stale and now < self._next_check:
+            return
+        with self._lock:
+            self._next_check = now + self.refresh_interval
+            self._stale = False
+            if not self._by_pk:
+                self._reload(FloodSite.objects.all(), full=True)
+                return
+            versions = dict(FloodSite.objects.values_list("pk", "updated_at"))
+            # Ids catch a delete and an add between checks, which leave the
+            # count and newest updated_at as they were.
+            changed = [
+                pk
+                for pk, updated_at in versions.items()
+                if pk not in self._by_pk or self._by_pk[pk].updated_at != updated_at
+            ]
+            removed = self._by_pk.keys() - versions.keys()
+            if changed or removed:
+                self._reload(FloodSite.objects.filter(pk__in=changed), full=False, removed=removed)
+
+    def __len__(self) -> int:
+        return len(self._by_pk)
+
+    def _mark_stale(self, **kwargs) -> None:
+        self._stale = True
+
+    def _reload(self, sites, *, full: bool, removed=()) -> None:
+        if full:
+            by_pk: dict[int, FloodSite] = {}
+        else:
+            by_pk = dict(self._by_pk)
+            for pk in removed:
+                by_pk.pop(pk, None)
+        for site in sites:
+            by_pk[site.pk] = site
+
+        self._by_pk = by_pk
+        self._by_handle = {site.handle: site for site in by_pk.values()}
+        # Reversed so the first site by handle wins when IMEIs are shared.
+        self._by_imei = {
+            site.imei: site for site in reversed(by_pk.values()) if site.imei
+        }
+        self._misses = {}
@@ -0,0 +1,284 @@
+import json
+import os
+import threading
+import uuid
+from pathlib import Path
+
+from django.db import DatabaseError, IntegrityError, connections
+from django.utils.dateparse import parse_datetime
+
+from .ingest import store_uplinks
+from .models import Uplink
+
+CHECKPOINT_FILE = "checkpoint.json"
+
+
+class UplinkSpool:
+    """
+    Append-only on-disk log of decoded uplinks, stored as NDJSON segments.
+
+    Records are appended to ``NNNNNNNNNNNN.ndjson`` files; a new segment is
+    started once the current one reaches ``segment_bytes``. A checkpoint file
+    records how far the replayer has got, and segments wholly before it are
+    deleted. A torn final line (from a crash mid-write) is truncated on open.
+    With ``fsync`` each append is forced to disk; otherwise it is flushed to
+    the OS, which survives a process crash but not a power cut.
+    """
+
+    def __init__(self, directory, *, segment_bytes: int = 16 * 1024 * 1024, fsync: bool = False):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.segment_bytes = segment_bytes
+        self.fsync = fsync
+        self._lock = threading.Lock()
+        segments = self.segments()
+        self._segment = segments[-1] if segments else 0
+        self._truncate_torn_tail(self._path(self._segment))
+        self._file = open(self._path(self._segment), "ab")
+        self._size = self._file.tell()
+
+    def _path(self, segment: int) -> Path:
+        return self.directory / f"{segment:012d}.ndjson"
+
+    def segments(self) -> list[int]:
+        return sorted(int(path.stem) for path in self.directory.glob("*.ndjson"))
+
+    def _truncate_torn_tail(self, path: Path) -> None:
+        if not path.exists():
+            return
+        with open(path, "rb+") as fh:
+            data = fh.read()
+            if data and not data.endswith(b"\n"):
+                fh.truncate(data.rfind(b"\n") + 1)
+
+    def append(self, records: list[dict]) -> None:
+        data = b"".join(
+            json.dumps(record, separators=(",", ":")).encode("utf-8") + b"\n"
+            for record in records
+        )
+        with self._lock:
+            if self._size and self._size + len(data) > self.segment_bytes:
+                self._file.close()
+                self._segment += 1
+                self._file = open(self._path(self._segment), "ab")
+                self._size = 0
+            self._file.write(data)
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+            self._size += len(data)
+
+    def checkpoint(self) -> tuple[int, int]:
+        try:
+            with open(self.directory / CHECKPOINT_FILE) as fh:
+                data = json.load(fh)
+            return data["segment"], data["offset"]
+        except FileNotFoundError:
+            segments = self.segments()
+            return (segments[0] if segments else 0), 0
+
+    def commit(self, position: tuple[int, int]) -> None:
+        """Record that everything before ``position`` is in the database."""
+        segment, offset = position
+        tmp = self.directory / f"{CHECKPOINT_FILE}.tmp"
+        with open(tmp, "w") as fh:
+            json.dump({"segment": segment, "offset": offset}, fh)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp, self.directory / CHECKPOINT_FILE)
+        for old in self.segments():
+            if old >= segment:
+                break
+            self._path(old).unlink(missing_ok=True)
+
+    def read(self, position: tuple[int, int], limit: int) -> tuple[list[dict], tuple[int, int]]:
+        """Return up to ``limit`` complete records after ``position`` and the new position."""
+        segment, offset = position
+        records: list[dict] = []
+        while len(records) < limit:
+            # Check for a later segment first: once it exists, this one is
+            # complete, so reaching its end means moving on.
+            sealed = self._path(segment + 1).exists()
+            try:
+                with open(self._path(segment), "rb") as fh:
+                    fh.seek(offset)
+                    for line in fh:
+                        if not line.endswith(b"\n"):
+                            break  # still being written
+                        offset += len(line)
+                        records.append(json.loads(line))
+                        if len(records) >= limit:
+                            return records, (segment, offset)
+            except FileNotFoundError:
+                pass
+            if not sealed:
+                break
+            segment, offset = segment + 1, 0
+        return records, (segment, offset)
+
+    def pending_bytes(self, position: tuple[int, int]) -> int:
+        segment, offset = position
+        total = -offset
+        for number in self.segments():
+            if number >= segment:
+                total += self._path(number).stat().st_size
+        return max(total, 0)
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+def uplink_to_record(uplink: Uplink) -> dict:
+    return {
+        "key": uplink.ingest_key,
+        "site": uplink.site_id,
+        "received_at": uplink.received_at.isoformat(),
+        "distance_mm": uplink.distance_mm,
+        "battery_v": uplink.battery_v,
+        "signal_dbm": uplink.signal_dbm,
+        "raw_payload": uplink.raw_payload,
+    }
+
+
+def record_to_uplink(record: dict) -> Uplink:
+    return Uplink(
+        ingest_key=record["key"],
+        site_id=record["site"],
+        received_at=parse_datetime(record["received_at"]),
+        distance_mm=record["distance_mm"],
+        battery_v=record["battery_v"],
+        signal_dbm=record["signal_dbm"],
+        raw_payload=record["raw_payload"],
+    )
+
+
+class SpooledUplinkWriter:
+    """
+    Drop-in alternative to ``UplinkBuffer`` that writes through a spool.
+
+    ``put`` appends to the spool and returns once the uplink is on disk, so
+    a message is never acknowledged while it exists only in memory. A single
+    replayer thread drains the spool into the database in order, batching
+    like ``UplinkBuffer``. While the database is locked or down it backs off
+    and retries indefinitely; uplinks simply accumulate on disk. Each uplink
+    carries an ``ingest_key``, so a batch replayed after a crash between the
+    database commit and the checkpoint is not stored twice.
+    """
+
+    policy = "block"
+
+    def __init__(
+        self,
+        spool: UplinkSpool,
+        *,
+        batch_size: int = 200,
+        flush_interval: float = 1.0,
+        max_backoff: float = 30.0,
+        on_error=None,
+        on_flush=None,
+    ):
+        self.spool = spool
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = max(0.0, flush_interval)
+        self.max_backoff = max_backoff
+        self.on_error = on_error
+        self.on_flush = on_flush
+        self.written = 0
+        self.dropped = 0
+        self._position = spool.checkpoint()
+        self._wakeup = threading.Event()
+        self._closing = threading.Event()
+        self._closed = False
+        self._thread = threading.Thread(
+            target=self._run, name="flood-spool-replayer", daemon=True
+        )
+
+    def start(self) -> "SpooledUplinkWriter":
+        self._thread.start()
+        return self
+
+    @property
+    def backlog_bytes(self) -> int:
+        return self.spool.pending_bytes(self._position)
+
+    def put(self, uplink: Uplink) -> bool:
+        if self._closed:
+            return False
+        if not uplink.ingest_key:
+            uplink.ingest_key = uuid.uuid4().hex
+        try:
+            self.spool.append([uplink_to_record(uplink)])
+        except OSError as exc:
+            self.dropped += 1
+            self._report(f"Could not spool uplink: {exc}")
+            return False
+        self._wakeup.set()
+        return True
+
+    def close(self, timeout: float | None = None) -> None:
+        """Stop accepting uplinks and replay what the database will take."""
+        if self._closed:
+            return
+        self._closed = True
+        self._closing.set()
+        self._wakeup.set()
+        self._thread.join(timeout)
+        self.spool.close()
+
+    def _run(self) -> None:
+        try:
+            while True:
+                records, position = self.spool.read(self._position, self.batch_size)
+                if not records:
+                    if self._closing.is_set():
+                        return
+                    self._wakeup.wait()
+                    self._wakeup.clear()
+                    continue
+                if len(records) < self.batch_size and not self._closing.is_set():
+                    # Give a partial batch up to flush_interval to fill.
+                    self._closing.wait(self.flush_interval)
+                    records, position = self.spool.read(self._position, self.batch_size)
+                if not self._store([record_to_uplink(record) for record in records]):
+                    return  # closing with the database unavailable; kept on disk
+                self.spool.commit(position)
+                self._position = position
+        finally:
+            connections.close_all()
+
+    def _store(self, batch: list[Uplink]) -> bool:
+        delay = 0.1
+        while True:
+            try:
+                try:
+                    stored = store_uplinks(batch)
+                except IntegrityError:
+                    # E.g. a site deleted since the uplink was spooled. Store
+                    # the rest one at a time rather than blocking the spool.
+                    stored = self._store_individually(batch)
+            except DatabaseError as exc:
+                self._report(f"Database unavailable, {len(batch)} uplinks kept in spool: {exc}")
+                connections.close_all()
+                if self._closing.wait(delay):
+                    return False
+                delay = min(delay * 2, self.max_backoff)
+                continue
+            self.written += len(stored)
+            if self.on_flush is not None:
+                self.on_flush(stored, len(batch))
+            return True
+
+    def _store_individually(self, batch: list[Uplink]) -> list[Uplink]:
+        stored = []
+        for uplink in batch:
+            try:
+                stored += store_uplinks([uplink])
+            except IntegrityError as exc:
+                self.dropped += 1
+                self._report(f"Discarding spooled uplink {uplink.ingest_key}: {exc}")
+        return stored
+
+    def _report(self, message: str) -> None:
+        if self.on_error is not None:
+            self.on_error(message)
@@ -0,0 +1,450 @@
+import asyncio
+import importlib.util
+import io
+import json
+import logging
+import struct
+import tempfile
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest import mock, skipUnless
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .alerts import AlertEngine, next_state
+from .archive import iter_archived
+from .backfill import HistoryImporter, RowParser, UnreadableRow, iter_records
+from .decoders import BUILTIN_PROFILES, MappingDecoder, PayloadError, build_decoder
+from .dedupe import Deduplicator, dedupe_key
+from .downsample import lttb_indices
+from .ingest import UplinkBuffer, store_uplinks
+from .models import FloodAlert, FloodSite, Uplink, UplinkRollup
+from .rollups import bucketed_rows, update_rollups
+
+
+def make_site(handle: str, imei: str = "", **fields) -> FloodSite:
+    return FloodSite.objects.create(
+        handle=handle,
+        name=handle,
+        location_description="",
+        latitude=0,
+        longitude=0,
+        imei=imei,
+        **fields,
+    )
+
+
+def add_uplink(site: FloodSite, received_at: datetime, distance_mm: int = 100) -> Uplink:
+    uplink = Uplink.objects.create(
+        site=site, distance_mm=distance_mm, raw_payload={}, received_at=received_at
+    )
+    FloodSite.objects.filter(pk=site.pk).update(latest_uplink=uplink)
+    return uplink
+
+
+class UplinkBufferTests(TransactionTestCase):
+    def test_flushes_full_batches_then_the_rest_on_close(self):
+        batches = []
+
+        def store(batch):
+            batches.append(len(batch))
+            return list(batch)
+
+        with mock.patch("flood.ingest.store_uplinks", side_effect=store):
+            buffer = UplinkBuffer(batch_size=2, flush_interval=60).start()
+            for _ in range(5):
+                buffer.put(Uplink(distance_mm=1))
+            buffer.close(timeout=5)
+        self.assertEqual(batches, [2, 2, 1])
+        self.assertEqual(buffer.written, 5)
+
+    def test_drop_newest_when_full(self):
+        buffer = UplinkBuffer(max_size=1, policy="drop_newest")
+        self.assertTrue(buffer.put(Uplink(distance_mm=1)))
+        self.assertFalse(buffer.put(Uplink(distance_mm=2)))
+        self.assertEqual(buffer.dropped, 1)
+
+    def test_bad_uplink_costs_only_itself(self):
+        site = make_site("s1")
+        errors = []
+        buffer = UplinkBuffer(on_error=errors.append)
+        batch = [Uplink(site=site, distance_mm=n, raw_payload={}) for n in range(5)]
+        batch.insert(2, Uplink(site=site, distance_mm=10**20, raw_payload={}))
+        buffer._flush(batch)
+        self.assertEqual((buffer.written, buffer.dropped), (5, 1))
+        self.assertEqual(Uplink.objects.count(), 5)
+        self.assertEqual(len(errors), 2)
+
+
+class LttbTests(SimpleTestCase):
+    def test_short_series_is_returned_whole(self):
+        self.assertEqual(lttb_indices([0, 1, 2], [5, 6, 7], 10), [0, 1, 2])
+        self.assertEqual(lttb_indices([0, 1, 2, 3], [5, 6, 7, 8], 2), [0, 1, 2, 3])
+
+    def test_keeps_ends_and_peaks(self):
+        xs = list(range(1000))
+        ys = [0.0] * 1000
+        ys[421] = 50.0
+        ys[777] = -30.0
+        indices = lttb_indices(xs, ys, 20)
+        self.assertEqual(len(indices), 20)
+        self.assertEqual(indices[0], 0)
+        self.assertEqual(indices[-1], 999)
+        self.assertEqual(indices, sorted(indices))
+        self.assertIn(421, indices)
+        self.assertIn(777, indices)
+
+
+class RollupTests(TestCase):
+    def setUp(self):
+        self.site = make_site("s1")
+        self.day = timezone.make_aware(datetime(2024, 1, 1))
+
+    def at(self, hour, minute=0):
+        return self.day + timedelta(hours=hour, minutes=minute)
+
+    def hourly(self):
+        return list(
+            UplinkRollup.objects.filter(site=self.site, period="hour")
+            .order_by("bucket_start")
+            .values_list("bucket_start", "sample_count")
+        )
+
+    def test_incremental_run_picks_up_late_readings(self):
+        add_uplink(self.site, self.at(10, 15), 100)
+        add_uplink(self.site, self.at(12, 15), 300)
+        update_rollups()
+        add_uplink(self.site, self.at(10, 45), 200)
+        update_rollups()
+        self.assertEqual(self.hourly(), [(self.at(10), 2), (self.at(12), 1)])
+        rollup = UplinkRollup.objects.get(site=self.site, period="hour", bucket_start=self.at(10))
+        self.assertEqual((rollup.distance_min, rollup.distance_max, rollup.distance_mean), (100, 200, 150))
+        self.assertEqual(UplinkRollup.objects.get(site=self.site, period="day").sample_count, 3)
+
+    def test_bucketed_rows_join_rollups_and_raw_readings(self):
+        for hour, minute in ((10, 0), (11, 0), (11, 30), (12, 0)):
+            add_uplink(self.site, self.at(hour, minute), 100 + minute)
+        update_rollups()
+        # Stored after the run; only the raw half of the query sees it.
+        add_uplink(self.site, self.at(12, 30), 130)
+        rows = bucketed_rows(self.site, self.day, "hour")
+        self.assertEqual([row["bucket"] for row in rows], [self.at(10), self.at(11), self.at(12)])
+        self.assertEqual([row["count"] for row in rows], [1, 2, 2])
+        self.assertEqual([row["mean"] for row in rows], [100, 115, 115])
+
+
+class RetentionTests(TestCase):
+    def setUp(self):
+        archive_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(archive_dir.cleanup)
+        settings_override = override_settings(FLOOD_ARCHIVE_DIR=archive_dir.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.site = make_site("archived")
+        self.now = timezone.now()
+
+    def history(self, **params):
+        response = self.client.get(reverse("flood:api_history"), {"handle": "archived", **params})
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.content)
+
+    def test_archived_readings_are_still_served(self):
+        for days in (20, 19):
+            add_uplink(self.site, self.now - timedelta(days=days), 100 + days)
+        latest = add_uplink(self.site, self.now - timedelta(days=15), 50)
+        call_command(
+            "prune_flood_uplinks", archive_days=10, strip_payload_days=0, pause=0, stdout=io.StringIO()
+        )
+        self.assertEqual(list(Uplink.objects.values_list("pk", flat=True)), [latest.pk])
+        archived = list(iter_archived(self.site.pk, self.now - timedelta(days=30), self.now))
+        self.assertEqual([record["distance_mm"] for record in archived], [120, 119])
+
+        data = self.history(days=30)
+        self.assertEqual(data["resolution"], "raw")
+        self.assertEqual([point["distance"] for point in data["history"]], [120, 119, 50])
+
+    def test_long_raw_window_is_served_from_hourly_rollups(self):
+        add_uplink(self.site, self.now - timedelta(days=40))
+        update_rollups()
+        self.assertEqual(self.history(days=60)["resolution"], "hour")
+
+
+@mock.patch("flood.conditional.time.time", return_value=1_700_000_000.0)
+class ConditionalApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.site = make_site("cached")
+        add_uplink(self.site, timezone.now() - timedelta(minutes=5))
+
+    def check(self, url):
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, 200)
+        etag = first["ETag"]
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        add_uplink(self.site, timezone.now(), 200)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertNotEqual(response.content, first.content)
+
+    def test_uplinks(self, _time):
+        self.check(reverse("flood:api_uplinks"))
+
+    def test_history(self, _time):
+        self.check(reverse("flood:api_history") + "?handle=cached&days=1")
+
+
+class DecoderTests(SimpleTestCase):
+    def test_json_fields(self):
+        reading = MappingDecoder().decode(b'{"imei": "86", "distance": "120.6", "battery": 3.6, "rssi": -70}')
+        self.assertEqual(
+            (reading.imei, reading.distance_mm, reading.battery_v, reading.signal_dbm), ("86", 120, 3.6, -70)
+        )
+
+    def test_out_of_range_numbers(self):
+        for payload in (b'{"distance": 1e999}', b'{"distance": 1e30}', b'{"distance": "x"}', b"[1]"):
+            with self.subTest(payload=payload), self.assertRaises(PayloadError):
+                MappingDecoder().decode(payload)
+        reading = MappingDecoder().decode(b'{"distance": 5, "battery": "NaN", "signal": 1e30}')
+        self.assertEqual((reading.distance_mm, reading.battery_v, reading.signal_dbm), (5, None, None))
+
+    def test_struct_frame(self):
+        reading = build_decoder(BUILTIN_PROFILES["struct"]).decode(struct.pack("<HHb", 1200, 3600, -70))
+        self.assertEqual((reading.distance_mm, reading.battery_v, reading.signal_dbm), (1200, 3.6, -70))
+
+    @skipUnless(importlib.util.find_spec("cbor2"), "cbor2 is not installed")
+    def test_cbor_raw_payload_is_json_safe(self):
+        import cbor2
+
+        data = cbor2.dumps({"distance": 5, "id": b"\x01\xff", "at": datetime(2024, 1, 1, tzinfo=dt_timezone.utc)})
+        reading = MappingDecoder(format="cbor").decode(data)
+        self.assertEqual(reading.distance_mm, 5)
+        self.assertEqual(reading.raw, {"distance": 5, "id": "01ff", "at": "2024-01-01T00:00:00+00:00"})
+        json.dumps(reading.raw)
+
+
+class DedupeTests(SimpleTestCase):
+    def uplink(self, payload, site_id=1):
+        return Uplink(site_id=site_id, distance_mm=100, raw_payload=payload)
+
+    def test_device_time_gives_durable_key(self):
+        key, durable = dedupe_key(self.uplink({"ts": 1700000000, "seq": 4, "d": 100}))
+        self.assertTrue(durable)
+        self.assertEqual(key, dedupe_key(self.uplink({"ts": 1700000000, "seq": 4, "d": 101}))[0])
+        self.assertNotEqual(key, dedupe_key(self.uplink({"ts": 1700000000, "seq": 5}))[0])
+        self.assertNotEqual(key, dedupe_key(self.uplink({"ts": 1700000000, "seq": 4}, site_id=2))[0])
+
+    def test_content_key_without_device_time(self):
+        key, durable = dedupe_key(self.uplink({"d": 100}))
+        self.assertFalse(durable)
+        self.assertEqual(key, dedupe_key(self.uplink({"d": 100}))[0])
+
+    def test_durable_duplicate_sets_ingest_key(self):
+        dedupe = Deduplicator()
+        first = self.uplink({"ts": 1})
+        self.assertFalse(dedupe.is_duplicate(first))
+        self.assertTrue(first.ingest_key)
+        self.assertTrue(dedupe.is_duplicate(self.uplink({"ts": 1})))
+
+    def test_content_duplicates_only_within_window(self):
+        dedupe = Deduplicator(window=60)
+        with mock.patch("flood.dedupe.time.monotonic", return_value=1000.0):
+            self.assertFalse(dedupe.is_duplicate(self.uplink({"d": 1})))
+            self.assertTrue(dedupe.is_duplicate(self.uplink({"d": 1})))
+        with mock.patch("flood.dedupe.time.monotonic", return_value=1100.0):
+            self.assertFalse(dedupe.is_duplicate(self.uplink({"d": 1})))
+
+    def test_oldest_entries_are_forgotten(self):
+        dedupe = Deduplicator(max_entries=2)
+        for ts in (1, 2, 3):
+            dedupe.is_duplicate(self.uplink({"ts": ts}))
+        self.assertEqual(len(dedupe), 2)
+        self.assertFalse(dedupe.is_duplicate(self.uplink({"ts": 1})))
+
+
+class StoreUplinksTests(TestCase):
+    def setUp(self):
+        self.site = make_site("s1")
+        self.now = timezone.now()
+
+    def uplink(self, minutes, key=None):
+        return Uplink(
+            site=self.site,
+            distance_mm=100 + minutes,
+            raw_payload={},
+            received_at=self.now + timedelta(minutes=minutes),
+            ingest_key=key,
+        )
+
+    def test_plain_batch(self):
+        stored = store_uplinks([self.uplink(0), self.uplink(1)])
+        self.assertEqual(len(stored), 2)
+        self.site.refresh_from_db()
+        self.assertEqual(self.site.latest_uplink_id, stored[1].pk)
+
+    def test_keyed_batch_skips_stored_and_repeated_keys(self):
+        store_uplinks([self.uplink(0, key="a")])
+        stored = store_uplinks([self.uplink(1, key="a"), self.uplink(2, key="b"), self.uplink(3, key="b")])
+        self.assertEqual([uplink.ingest_key for uplink in stored], ["b"])
+        self.assertIsNotNone(stored[0].pk)
+        self.assertEqual(Uplink.objects.count(), 2)
+
+    def test_mixed_batch_keeps_unkeyed_uplinks(self):
+        stored = store_uplinks([self.uplink(0, key="a"), self.uplink(1)])
+        self.assertEqual(len(stored), 2)
+        self.assertTrue(all(uplink.pk for uplink in stored))
+        self.assertEqual(Uplink.objects.count(), 2)
+        self.site.refresh_from_db()
+        self.assertEqual(self.site.latest_uplink_id, stored[1].pk)
+
+    def test_latest_uplink_never_moves_back(self):
+        newest = store_uplinks([self.uplink(10)])[0]
+        store_uplinks([self.uplink(0)])
+        self.site.refresh_from_db()
+        self.assertEqual(self.site.latest_uplink_id, newest.pk)
+
+
+# (low_low, low, high, high_high); a larger distance is higher water.
+THRESHOLDS = (100, 200, 800, 900)
+
+
+class NextStateTests(SimpleTestCase):
+    def test_moving_away_from_normal_happens_at_the_trigger(self):
+        self.assertEqual(next_state("unknown", 800, THRESHOLDS, 50), "high")
+        self.assertEqual(next_state("high", 900, THRESHOLDS, 50), "high_high")
+        self.assertEqual(next_state("unknown", 200, THRESHOLDS, 50), "low")
+
+    def test_falling_back_needs_the_hysteresis(self):
+        self.assertEqual(next_state("high", 760, THRESHOLDS, 50), "high")
+        self.assertEqual(next_state("high", 740, THRESHOLDS, 50), "unknown")
+        self.assertEqual(next_state("high_high", 860, THRESHOLDS, 50), "high_high")
+        self.assertEqual(next_state("high_high", 840, THRESHOLDS, 50), "high")
+        self.assertEqual(next_state("low", 240, THRESHOLDS, 50), "low")
+        self.assertEqual(next_state("low", 260, THRESHOLDS, 50), "unknown")
+        self.assertEqual(next_state("high", 760, THRESHOLDS, 0), "unknown")
+
+    def test_large_drop_goes_straight_to_the_new_state(self):
+        self.assertEqual(next_state("high_high", 150, THRESHOLDS, 50), "low")
+        self.assertEqual(next_state("low_low", 850, THRESHOLDS, 50), "high")
+
+
+class AlertEngineTests(TestCase):
+    def setUp(self):
+        self.site = make_site(
+            "s1",
+            trigger_low_low_mm=THRESHOLDS[0],
+            trigger_low_mm=THRESHOLDS[1],
+            trigger_high_mm=THRESHOLDS[2],
+            trigger_high_high_mm=THRESHOLDS[3],
+        )
+
+    def engine(self, **options):
+        site = FloodSite.objects.get(pk=self.site.pk)
+        return AlertEngine({site.pk: site}, **options)
+
+    def uplinks(self, *distances):
+        return [
+            Uplink(site_id=self.site.pk, distance_mm=distance, received_at=timezone.now())
+            for distance in distances
+        ]
+
+    def test_new_state_needs_consecutive_readings(self):
+        engine = self.engine(debounce=2)
+        self.assertEqual(engine.process(self.uplinks(850, 500, 850)), [])
+        alerts = engine.process(self.uplinks(860))
+        self.assertEqual([(a.previous_state, a.state) for a in alerts], [("unknown", "high")])
+        self.assertEqual(FloodAlert.objects.count(), 1)
+
+    def test_confirmed_state_is_stored_and_seeds_a_new_engine(self):
+        self.engine(debounce=1).process(self.uplinks(950))
+        self.site.refresh_from_db()
+        self.assertEqual(self.site.alert_state, "high_high")
+        engine = self.engine(debounce=1, hysteresis_mm=50)
+        self.assertEqual(engine.process(self.uplinks(860)), [])
+        alerts = engine.process(self.uplinks(150))
+        self.assertEqual([(a.previous_state, a.state) for a in alerts], [("high_high", "low")])
+        self.site.refresh_from_db()
+        self.assertEqual(self.site.alert_state, "low")
+
+
+@skipUnless(importlib.util.find_spec("amqtt"), "amqtt is not installed")
+class FloodIngestPluginTests(SimpleTestCase):
+    def test_alert_engine_shares_the_site_index(self):
+        from amqtt.plugins.manager import BaseContext
+
+        from .mqtt_bridge import FloodIngestPlugin
+
+        context = BaseContext()
+        context.config = FloodIngestPlugin.Config()
+        context.logger = logging.getLogger(__name__)
+        plugin = FloodIngestPlugin(context)
+        self.addCleanup(plugin.sites.disconnect_signals)
+        self.addCleanup(asyncio.run, plugin.close())
+        self.assertIsNotNone(plugin.alerts)
+        self.assertIs(plugin.alerts.sites, plugin.sites)
+
+
+class RowParserTests(TestCase):
+    def setUp(self):
+        self.site = make_site("s1", imei="861234")
+        self.parser = RowParser(tz=dt_timezone(timedelta(hours=10)))
+
+    def test_parses_handle_iso_time_and_readings(self):
+        row = self.parser.parse(
+            {"handle": "s1", "time": "2024-01-01T10:00:00", "distance_mm": "120.7", "battery_v": "3.6"}
+        )
+        self.assertEqual(row[0], self.site.pk)
+        self.assertEqual(row[1], datetime(2024, 1, 1, 0, 0, tzinfo=dt_timezone.utc))
+        self.assertEqual(row[2:5], (120, 3.6, None))
+
+    def test_parses_imei_and_unix_time(self):
+        row = self.parser.parse({"imei": "861234", "timestamp": 1700000000, "distance": 5})
+        self.assertEqual(row[0], self.site.pk)
+        self.assertEqual(row[1], datetime.fromtimestamp(1700000000, dt_timezone.utc))
+
+    def test_rejects_bad_rows(self):
+        self.parser.parse({"handle": "s1", "time": 1, "distance_mm": 1})
+        bad_rows = [
+            {"handle": "nope", "time": 1, "distance_mm": 1},
+            {"handle": "s1", "time": "", "distance_mm": 1},
+            {"handle": "s1", "time": [1], "distance_mm": 1},
+            {"handle": "s1", "time": 1e30, "distance_mm": 1},
+            {"handle": "s1", "time": 1, "distance_mm": "inf"},
+            [1, 2],
+            UnreadableRow("Invalid JSON"),
+        ]
+        for record in bad_rows:
+            with self.subTest(record=record), self.assertRaises(ValueError):
+                self.parser.parse(record)
+
+
+class HistoryImporterTests(TestCase):
+    def setUp(self):
+        self.site = make_site("s1")
+
+    def test_bad_lines_are_rejected_and_the_rest_imported(self):
+        source = io.StringIO(
+            '{"handle": "s1", "time": "2024-01-01T00:00:00+00:00", "distance_mm": 5}\n'
+            "{not json\n"
+            "[1, 2]\n"
+            '{"handle": "s1", "time": {"at": 1}, "distance_mm": 5}\n'
+            '{"handle": "s1", "time": 1704067260, "distance_mm": 6}\n'
+        )
+        importer = HistoryImporter(RowParser(), batch_size=1)
+        importer.load(iter_records(source, "ndjson"))
+        self.assertEqual(importer.read, 5)
+        self.assertEqual(importer.imported, 2)
+        self.assertEqual(sum(importer.rejected.values()), 3)
+        self.assertEqual(Uplink.objects.filter(site=self.site).count(), 2)
+
+    def test_skip_existing(self):
+        source = "handle,time,distance_mm\ns1,2024-01-01T00:00:00+00:00,5\ns1,2024-01-01T00:01:00+00:00,6\n"
+        HistoryImporter(RowParser()).load(iter_records(io.StringIO(source), "csv"))
+        importer = HistoryImporter(RowParser(), skip_existing=True)
+        importer.load(iter_records(io.StringIO(source), "csv"))
+        self.assertEqual((importer.imported, importer.existing), (0, 2))
+        self.assertEqual(Uplink.objects.count(), 2)
@@ -9,6 +9,7 @@ urlpatterns = [
     path("plot/<str:handle>/", views.flood_plot, name="plot"),
     path("api/uplinks/", views.api_uplinks, name="api_uplinks"),
     path("api/history/", views.api_history, name="api_history"),
+    path("api/stream/", views.api_stream, name="api_stream"),
 ]
 
 
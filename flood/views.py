@@ -1,11 +1,21 @@
+import asyncio
+import json
 from datetime import timedelta
 
 from django.conf import settings
-from django.http import JsonResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, render
 from django.utils import timezone
 
+from .archive import iter_archived
+from .conditional import conditional_api, history_state, uplinks_state
+from .downsample import lttb_indices
+from .encoding import HISTORY_FORMATS, history_format, history_response
+from .levels import classify, classify_sites, site_thresholds
+from .live import broadcaster
 from .models import FloodSite, Uplink
+from .rollups import PERIODS, bucketed_rows
 
 
 def flood_home(request):
@@ -21,29 +31,60 @@ def flood_plot(request, handle: str):
     return render(request, "flood/plot.html", {"handle": site.handle})
 
 
+@conditional_api(uplinks_state)
 def api_uplinks(request):
     now = timezone.now()
     data: dict[str, dict] = {}
-    sites = FloodSite.objects.filter(active=True).prefetch_related("uplinks")
-    for site in sites:
-        uplink = site.uplinks.order_by("-received_at").first()
-        if uplink is None:
-            continue
-        minutes_since = int((now - uplink.received_at).total_seconds() / 60)
-        data[site.handle] = {
-            "lat": float(site.latitude),
-            "lng": float(site.longitude),
-            "location": site.location_description,
-            "distance": uplink.distance_mm,
-            "battery": uplink.battery_v,
-            "signal": uplink.signal_dbm,
-            "timestamp": uplink.received_at.isoformat(),
-            "minutes_since_last_uplink": minutes_since,
-            "level_state": uplink.level_state,
-        }
+    sites = list(
+        FloodSite.objects.filter(
+            active=True, latest_uplink__isnull=False
+        ).select_related("latest_uplink", "health")
+    )
+    states = classify_sites(
+        [site.latest_uplink.distance_mm for site in sites],
+        [site_thresholds(site) for site in sites],
+    )
+    for site, state in zip(sites, states):
+        data[site.handle] = site.map_state(now, state)
     return JsonResponse(data)
 
 
+async def api_stream(request):
+    """Server-Sent Events stream of site states as new uplinks are stored."""
+    if not isinstance(request, ASGIRequest):
+        # Under WSGI an endless stream would pin a worker; tell the browser to
+        # reconnect later instead, which degrades to slow polling.
+        response = StreamingHttpResponse(
+            iter(["retry: 60000\n\n"]), content_type="text/event-stream"
+        )
+        response["Cache-Control"] = "no-cache"
+        return response
+
+    keepalive = getattr(settings, "FLOOD_STREAM_KEEPALIVE", 20)
+
+    async def events():
+        queue = broadcaster.subscribe()
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                try:
+                    states = await asyncio.wait_for(queue.get(), timeout=keepalive)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if states is None:
+                    return
+                yield f"event: sites\ndata: {json.dumps(states)}\n\n"
+        finally:
+            broadcaster.unsubscribe(queue)
+
+    response = StreamingHttpResponse(events(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+@conditional_api(history_state)
 def api_history(request):
     handle = request.GET.get("handle")
     if not handle:
@@ -55,25 +96,90 @@ def api_history(request):
     except ValueError:
         days = 7
 
+    output = history_format(request)
+    if output is None:
+        return JsonResponse(
+            {"error": f"format must be one of {', '.join(HISTORY_FORMATS)}"}, status=400
+        )
+
+    resolution = request.GET.get("resolution") or "raw"
+    if resolution != "raw" and resolution not in PERIODS:
+        return JsonResponse(
+            {"error": "resolution must be one of raw, hour, day"}, status=400
+        )
+
+    default_max_points = getattr(settings, "FLOOD_HISTORY_MAX_POINTS", 2000)
+    try:
+        max_points = int(request.GET.get("max_points") or default_max_points)
+    except ValueError:
+        max_points = default_max_points
+    max_points = max(3, min(max_points, default_max_points))
+
+    if resolution == "raw" and days > getattr(settings, "FLOOD_HISTORY_RAW_MAX_DAYS", 31):
+        # Every reading (and archive file) in a long window would be read on
+        # each request; hourly rollups show the same shape.
+        resolution = "hour"
+
     site = get_object_or_404(FloodSite, handle=handle)
     since = timezone.now() - timedelta(days=days)
-    uplinks = (
-        site.uplinks.filter(received_at__gte=since)
-        .order_by("received_at")
-        .only("received_at", "distance_mm")
-    )
-    history = [
-        {"created_at": u.received_at.isoformat(), "distance": u.distance_mm}
-        for u in uplinks
-    ]
-    payload = {
+    if resolution == "raw":
+        columns = _raw_history(site, since, max_points)
+    else:
+        columns = _bucketed_history(site, since, resolution, max_points)
+    meta = {
         "site_details": {
             "handle": site.handle,
             "location": site.location_description,
             "lat": float(site.latitude),
             "lng": float(site.longitude),
+            "thresholds": dict(
+                zip(("low_low", "low", "high", "high_high"), site_thresholds(site))
+            ),
         },
-        "history": history,
+        "resolution": resolution,
+    }
+    return history_response(output, meta, columns)
+
+
+def _raw_history(site, since, max_points: int) -> dict[str, list]:
+    uplinks = site.uplinks.filter(received_at__gte=since).order_by("received_at")
+    rows = list(uplinks.values_list("received_at", "distance_mm"))
+
+    # Readings older than the retention window live in the archive files.
+    oldest = rows[0][0] if rows else timezone.now()
+    if since < oldest and not site.uplinks.filter(received_at__lt=since).exists():
+        archived = sorted(
+            (record["received_at"], record["distance_mm"])
+            for record in iter_archived(site.pk, since, oldest)
+        )
+        rows = archived + rows
+    if len(rows) > max_points:
+        xs = [received_at.timestamp() for received_at, _ in rows]
+        ys = [distance for _, distance in rows]
+        rows = [rows[i] for i in lttb_indices(xs, ys, max_points)]
+    distances = [distance for _, distance in rows]
+    return {
+        "time": [received_at for received_at, _ in rows],
+        "distance": distances,
+        "level_state": classify(distances, site_thresholds(site)),
+    }
+
+
+def _bucketed_history(site, since, period: str, max_points: int) -> dict[str, list]:
+    rows = bucketed_rows(site, since, period)
+    if len(rows) > max_points:
+        xs = [row["bucket"].timestamp() for row in rows]
+        ys = [row["mean"] for row in rows]
+        rows = [rows[i] for i in lttb_indices(xs, ys, max_points)]
+    # Buckets are coloured by their peak (largest distance), so a short
+    # spike inside an hour or day is not averaged away.
+    highs = [row["high"] for row in rows]
+    return {
+        "time": [row["bucket"] for row in rows],
+        "distance": [round(row["mean"], 1) for row in rows],
+        "min": [row["low"] for row in rows],
+        "max": highs,
+        "count": [row["count"] for row in rows],
+        "level_state": classify(highs, site_thresholds(site)),
     }
-    return JsonResponse(payload)
 
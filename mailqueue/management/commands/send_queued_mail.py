@@ -0,0 +1,70 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.utils import timezone
+
+from mailqueue.models import OutboundEmail
+from mailqueue.outbox import purge_finished, send_queued
+
+
+class Command(BaseCommand):
+    help = (
+        "Send queued outbound email in batches over one SMTP connection, "
+        "retrying failures with exponential backoff. Sent and failed messages "
+        "older than MAIL_QUEUE_RETENTION_DAYS are deleted.\n"
+        "Run it from cron, or keep one running with --loop."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, help="Default: MAIL_QUEUE_BATCH_SIZE.")
+        parser.add_argument("--max-attempts", type=int, help="Default: MAIL_QUEUE_MAX_ATTEMPTS.")
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep running, checking for new mail every --interval seconds.",
+        )
+        parser.add_argument("--interval", type=float, default=5.0)
+        parser.add_argument(
+            "--retry-failed",
+            action="store_true",
+            help="Queue messages that used up their attempts again before sending.",
+        )
+
+    def handle(self, *args, **options) -> None:
+        if options["retry_failed"]:
+            requeued = OutboundEmail.objects.filter(status="failed").update(
+                status="queued", attempts=0, send_after=timezone.now()
+            )
+            self.stdout.write(f"Re-queued {requeued} failed messages")
+
+        purged_at = None
+        try:
+            while True:
+                if purged_at is None or time.monotonic() - purged_at >= 3600:
+                    purged = purge_finished()
+                    purged_at = time.monotonic()
+                    if purged:
+                        self.stdout.write(f"Deleted {purged} finished messages")
+                sent, failed = self._send_all(options)
+                if sent or failed or not options["loop"]:
+                    self.stdout.write(f"Sent {sent} queued messages ({failed} failed)")
+                if not options["loop"]:
+                    return
+                connections.close_all()
+                time.sleep(options["interval"])
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping mail queue worker")
+
+    def _send_all(self, options) -> tuple[int, int]:
+        total_sent = total_failed = 0
+        while True:
+            sent, failed = send_queued(
+                batch_size=options["batch_size"], max_attempts=options["max_attempts"]
+            )
+            total_sent += sent
+            total_failed += failed
+            # Keep going while batches come back full of sent mail; stop on
+            # failures so a dead SMTP server is not hammered.
+            if not sent or failed:
+                return total_sent, total_failed
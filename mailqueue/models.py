@@ -0,0 +1,36 @@
+from django.db import models
+from django.utils import timezone
+
+
+class OutboundEmail(models.Model):
+    """A message waiting in (or sent from) the outbox; see ``send_queued_mail``."""
+
+    STATUS_CHOICES = [
+        ("queued", "Queued"),
+        ("sending", "Sending"),
+        ("sent", "Sent"),
+        ("failed", "Failed"),
+    ]
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField(help_text="Blanked once sent; sign-in links are not kept.")
+    from_email = models.CharField(max_length=255)
+    to = models.JSONField(help_text="List of recipient addresses.")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="queued")
+    created_at = models.DateTimeField(default=timezone.now)
+    send_after = models.DateTimeField(
+        default=timezone.now,
+        help_text="Not sent before this time (retry backoff, or the end of a worker's claim).",
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["created_at"]
+        indexes = [
+            models.Index(fields=["status", "send_after"], name="mailqueue_due_idx"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.subject} to {', '.join(self.to)} ({self.status})"
@@ -0,0 +1,147 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import OutboundEmail
+
+
+def queue_mail(subject: str, message: str, from_email, recipient_list) -> OutboundEmail:
+    """
+    Queue a plain-text message for ``send_queued_mail``; takes the same
+    arguments as ``django.core.mail.send_mail``.
+
+    The row is written in the caller's transaction, so mail for work that is
+    rolled back is never sent.
+    """
+    return OutboundEmail.objects.create(
+        subject=subject,
+        body=message,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        to=list(recipient_list),
+    )
+
+
+def retry_delay(attempts: int) -> timedelta:
+    base = getattr(settings, "MAIL_QUEUE_RETRY_BASE_SECONDS", 60)
+    maximum = getattr(settings, "MAIL_QUEUE_RETRY_MAX_SECONDS", 3600)
+    return timedelta(seconds=min(maximum, base * 2 ** max(0, attempts - 1)))
+
+
+def due_messages(limit: int):
+    # Rows left "sending" by a worker that died are due again once its
+    # claim runs out.
+    return OutboundEmail.objects.filter(
+        Q(status="queued") | Q(status="sending"), send_after__lte=timezone.now()
+    ).order_by("send_after", "pk")[:limit]
+
+
+def claim(email: OutboundEmail) -> bool:
+    """
+    Mark ``email`` as being sent by this worker, unless another worker got to
+    it first. The claim lasts ``MAIL_QUEUE_CLAIM_SECONDS``, after which the
+    message is due again.
+    """
+    until = timezone.now() + timedelta(seconds=getattr(settings, "MAIL_QUEUE_CLAIM_SECONDS", 600))
+    claimed = OutboundEmail.objects.filter(
+        pk=email.pk, status=email.status, send_after=email.send_after
+    ).update(status="sending", send_after=until)
+    if claimed:
+        email.status, email.send_after = "sending", until
+    return bool(claimed)
+
+
+def purge_finished(days: int | None = None) -> int:
+    """Delete sent and failed messages created more than ``days`` ago."""
+    if days is None:
+        days = getattr(settings, "MAIL_QUEUE_RETENTION_DAYS", 30)
+    cutoff = timezone.now() - timedelta(days=days)
+    deleted, _ = OutboundEmail.objects.filter(
+        status__in=("sent", "failed"), created_at__lt=cutoff
+    ).delete()
+    return deleted
+
+
+def send_queued(*, batch_size: int | None = None, max_attempts: int | None = None) -> tuple[int, int]:
+    """
+    Send up to ``batch_size`` due messages over one SMTP connection.
+
+    Each message is claimed just before it is sent, so two workers never
+    send the same one, and marked sent (with its body blanked) as soon as it
+    is handed over, so a crash mid-batch resends at most one message. A
+    failed message waits ``retry_delay`` (doubling per attempt) and is
+    marked failed after ``max_attempts``. If the connection cannot be
+    opened, or drops and cannot be reopened, the rest of the batch is put
+    back for ``retry_delay(1)`` without using up an attempt: an SMTP outage
+    says nothing about the messages. Returns ``(sent, not sent)``.
+    """
+    if batch_size is None:
+        batch_size = getattr(settings, "MAIL_QUEUE_BATCH_SIZE", 100)
+    if max_attempts is None:
+        max_attempts = getattr(settings, "MAIL_QUEUE_MAX_ATTEMPTS", 8)
+    batch = list(due_messages(batch_size))
+    if not batch:
+        return 0, 0
+
+    connection = get_connection()
+    sent = failed = 0
+    try:
+        connection.open()
+    except Exception as exc:  # noqa: BLE001
+        return 0, _defer(batch, exc)
+    try:
+        for index, email in enumerate(batch):
+            if not claim(email):
+                continue
+            message = EmailMessage(
+                email.subject, email.body, email.from_email, email.to, connection=connection
+            )
+            try:
+                message.send()
+            except Exception as exc:  # noqa: BLE001
+                _record_failure(email, exc, max_attempts)
+                failed += 1
+                # The connection may be unusable after an error; start afresh.
+                try:
+                    connection.close()
+                    connection.open()
+                except Exception as reopen_exc:  # noqa: BLE001
+                    return sent, failed + _defer(batch[index + 1 :], reopen_exc)
+                continue
+            email.status = "sent"
+            email.sent_at = timezone.now()
+            email.attempts += 1
+            email.last_error = ""
+            email.body = ""
+            email.save(update_fields=["status", "sent_at", "attempts", "last_error", "body"])
+            sent += 1
+    finally:
+        connection.close()
+    return sent, failed
+
+
+def _defer(emails, exc: Exception) -> int:
+    # Rows another worker has claimed since they were read are left alone.
+    now = timezone.now()
+    return OutboundEmail.objects.filter(
+        pk__in=[email.pk for email in emails],
+        status__in=("queued", "sending"),
+        send_after__lte=now,
+    ).update(
+        status="queued",
+        send_after=now + retry_delay(1),
+        last_error=f"{type(exc).__name__}: {exc}",
+    )
+
+
+def _record_failure(email: OutboundEmail, exc: Exception, max_attempts: int) -> None:
+    email.attempts += 1
+    email.last_error = f"{type(exc).__name__}: {exc}"
+    if email.attempts >= max_attempts:
+        email.status = "failed"
+    else:
+        email.status = "queued"
+        email.send_after = timezone.now() + retry_delay(email.attempts)
+    email.save(update_fields=["attempts", "last_error", "status", "send_after"])
@@ -0,0 +1,76 @@
+from datetime import timedelta
+from smtplib import SMTPException
+from unittest import mock
+
+from django.core import mail
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .models import OutboundEmail
+from .outbox import claim, purge_finished, queue_mail, retry_delay, send_queued
+
+
+@override_settings(MAIL_QUEUE_RETRY_BASE_SECONDS=60, MAIL_QUEUE_RETRY_MAX_SECONDS=3600)
+class OutboxTests(TestCase):
+    def queue(self, subject="Hello"):
+        return queue_mail(subject, "body", None, ["a@example.com"])
+
+    def test_sent_mail_is_marked_and_blanked(self):
+        email = self.queue()
+        self.assertEqual(send_queued(), (1, 0))
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].body, "body")
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts, email.body), ("sent", 1, ""))
+        self.assertEqual(send_queued(), (0, 0))
+
+    def test_claim_fails_for_a_stale_copy(self):
+        email = self.queue()
+        stale = OutboundEmail.objects.get(pk=email.pk)
+        self.assertTrue(claim(email))
+        self.assertFalse(claim(stale))
+        self.assertEqual(email.status, "sending")
+        self.assertEqual(send_queued(), (0, 0))
+
+    def test_retry_delay_doubles_up_to_the_maximum(self):
+        self.assertEqual(
+            [retry_delay(attempts).total_seconds() for attempts in (0, 1, 2, 3, 10)],
+            [60, 60, 120, 240, 3600],
+        )
+
+    def test_failed_sends_back_off_then_give_up(self):
+        email = self.queue()
+        with mock.patch("mailqueue.outbox.EmailMessage.send", side_effect=SMTPException("rejected")):
+            for attempts in (1, 2):
+                self.assertEqual(send_queued(max_attempts=3), (0, 1))
+                email.refresh_from_db()
+                self.assertEqual((email.status, email.attempts), ("queued", attempts))
+                self.assertGreater(email.send_after, timezone.now() + retry_delay(attempts) - timedelta(seconds=5))
+                # Not due until the backoff has passed.
+                self.assertEqual(send_queued(max_attempts=3), (0, 0))
+                OutboundEmail.objects.filter(pk=email.pk).update(send_after=timezone.now())
+            self.assertEqual(send_queued(max_attempts=3), (0, 1))
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), ("failed", 3))
+        self.assertIn("rejected", email.last_error)
+
+    def test_connection_failure_does_not_use_up_attempts(self):
+        first, second = self.queue("one"), self.queue("two")
+        with mock.patch("mailqueue.outbox.get_connection") as get_connection:
+            get_connection.return_value.open.side_effect = OSError("connection refused")
+            self.assertEqual(send_queued(), (0, 2))
+        for email in (first, second):
+            email.refresh_from_db()
+            self.assertEqual((email.status, email.attempts), ("queued", 0))
+            self.assertGreater(email.send_after, timezone.now())
+            self.assertIn("connection refused", email.last_error)
+
+    def test_purge_keeps_recent_and_unsent_mail(self):
+        old = timezone.now() - timedelta(days=40)
+        sent = self.queue()
+        queued = self.queue()
+        recent = self.queue()
+        OutboundEmail.objects.filter(pk__in=[sent.pk, queued.pk]).update(created_at=old)
+        OutboundEmail.objects.filter(pk__in=[sent.pk, recent.pk]).update(status="sent")
+        self.assertEqual(purge_finished(30), 1)
+        self.assertFalse(OutboundEmail.objects.filter(pk=sent.pk).exists())
@@ -1,4 +1,5 @@
 import asyncio
+import signal
 
 from django.conf import settings
 from django.core.management.base import BaseCommand
@@ -10,6 +11,22 @@ class Command(BaseCommand):
         "This is intended for development and small deployments."
     )
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--ingest",
+            action="store_true",
+            help=(
+                "Store floodway uplinks published to flood/+/uplink directly from "
+                "the broker process, instead of running run_flood_mqtt_listener."
+            ),
+        )
+        parser.add_argument(
+            "--stats-interval",
+            type=float,
+            default=0,
+            help="With --ingest, log throughput and latency every N seconds (0 disables).",
+        )
+
     def handle(self, *args, **options):
         try:
             from amqtt.broker import Broker  # type: ignore[import-not-found]
@@ -35,18 +52,69 @@ class Command(BaseCommand):
             "auth": {"allow-anonymous": True, "password-file": None},
         }
 
-        async def start_broker():
+        if options["ingest"]:
+            config = self._ingest_config(config, options)
+            if config is None:
+                return
+
+        async def run_broker():
             broker = Broker(config)
             await broker.start()
+            stopped = asyncio.Event()
+            loop = asyncio.get_running_loop()
+            for signum in (signal.SIGINT, signal.SIGTERM):
+                loop.add_signal_handler(signum, stopped.set)
+            await stopped.wait()
+            # Shutting down closes plugins, which drains the ingest queue.
+            await broker.shutdown()
 
-        loop = asyncio.get_event_loop()
         self.stdout.write(
             self.style.SUCCESS(f"Starting MQTT broker on {host}:{port} (amqtt)")
         )
-        try:
-            loop.run_until_complete(start_broker())
-            loop.run_forever()
-        except KeyboardInterrupt:
-            self.stdout.write("Broker stopped by user.")
+        asyncio.run(run_broker())
+        self.stdout.write("Broker stopped.")
 
+    def _ingest_config(self, config, options):
+        try:
+            from flood.mqtt_bridge import PLUGIN_PATH
+        except ImportError:
+            self.stderr.write(
+                "--ingest needs amqtt 0.11 or later for broker plugins.\n"
+                "Upgrade it with:\n"
+                "  pip install -U amqtt\n"
+            )
+            return None
 
+        # An explicit plugin list replaces the legacy auth/sys sections, so
+        # the equivalent built-in plugins are listed here.
+        config = {key: value for key, value in config.items() if key not in ("sys_interval", "auth")}
+        config["plugins"] = {
+            "amqtt.plugins.authentication.AnonymousAuthPlugin": {"allow_anonymous": True},
+            "amqtt.plugins.sys.broker.BrokerSysPlugin": {"sys_interval": 60},
+            PLUGIN_PATH: {
+                "batch_size": getattr(settings, "FLOOD_INGEST_BATCH_SIZE", 200),
+                "flush_interval": float(getattr(settings, "FLOOD_INGEST_FLUSH_INTERVAL", 1.0)),
+                "queue_size": getattr(settings, "FLOOD_INGEST_QUEUE_SIZE", 10000),
+                "backpressure": getattr(settings, "FLOOD_INGEST_BACKPRESSURE", "block"),
+                "site_refresh_interval": float(
+                    getattr(settings, "FLOOD_SITE_INDEX_REFRESH_INTERVAL", 30.0)
+                ),
+                "site_negative_ttl": float(
+                    getattr(settings, "FLOOD_SITE_INDEX_NEGATIVE_TTL", 60.0)
+                ),
+                "stats_interval": float(options["stats_interval"]),
+                "dedupe": bool(getattr(settings, "FLOOD_DEDUPE", True)),
+                "dedupe_cache_size": getattr(settings, "FLOOD_DEDUPE_CACHE_SIZE", 100000),
+                "dedupe_window": float(getattr(settings, "FLOOD_DEDUPE_WINDOW", 3600)),
+                "alerts": bool(getattr(settings, "FLOOD_ALERTS", True)),
+                "alert_hysteresis_mm": getattr(settings, "FLOOD_ALERT_HYSTERESIS_MM", 50),
+                "alert_debounce": getattr(settings, "FLOOD_ALERT_DEBOUNCE", 2),
+                "spool_dir": str(getattr(settings, "FLOOD_SPOOL_DIR", "")),
+                "spool_segment_bytes": getattr(
+                    settings, "FLOOD_SPOOL_SEGMENT_BYTES", 16 * 1024 * 1024
+                ),
+                "spool_fsync": bool(getattr(settings, "FLOOD_SPOOL_FSYNC", False)),
+            },
+        }
+        self.stdout.write("Floodway uplinks will be stored by the broker (--ingest)")
+        return config
@@ -0,0 +1,195 @@
+import base64
+import binascii
+import datetime
+import json
+from functools import cached_property
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class KeysetPage:
+    """
+    One page of a ``KeysetPaginator``. Behaves like a ``Page`` for iteration;
+    instead of page numbers it links to its neighbours with ``next_cursor``
+    and ``previous_cursor`` (``?after=`` / ``?before=``).
+    """
+
+    def __init__(self, object_list, paginator, *, has_next: bool, has_previous: bool):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self) -> int:
+        return len(self.object_list)
+
+    def __bool__(self) -> bool:
+        return bool(self.object_list)
+
+    def has_next(self) -> bool:
+        return self._has_next
+
+    def has_previous(self) -> bool:
+        return self._has_previous
+
+    def has_other_pages(self) -> bool:
+        return self._has_next or self._has_previous
+
+    @property
+    def next_cursor(self) -> str | None:
+        if not self._has_next:
+            return None
+        return self.paginator.cursor_for(self.object_list[-1])
+
+    @property
+    def previous_cursor(self) -> str | None:
+        if not self._has_previous:
+            return None
+        return self.paginator.cursor_for(self.object_list[0])
+
+
+class KeysetPaginator:
+    """
+    Paginate ``queryset`` by seeking past the last row shown rather than with
+    ``OFFSET``, so every page costs the same as the first however deep it is.
+
+    ``ordering`` is a sequence of field names as for ``order_by()``. The
+    primary key is appended as a tie-breaker when it is not already last, so
+    give the model an index on ``(first field, id)`` to match. Ordering
+    fields must be concrete, non-null fields of the model.
+
+    No total is needed to page; ``count`` is only run when asked for and
+    stops at ``count_limit`` rows (``count_is_capped`` then says so).
+    """
+
+    def __init__(self, queryset, per_page: int, ordering=("-pk",), *, count_limit: int | None = None):
+        self.per_page = per_page
+        self.model = queryset.model
+        ordering = list(ordering)
+        if ordering[-1].lstrip("-") not in ("pk", self.model._meta.pk.name):
+            ordering.append("-pk" if ordering[-1].startswith("-") else "pk")
+        self.ordering = ordering
+        self.keys = [
+            (name.lstrip("-"), self._field(name.lstrip("-")), name.startswith("-"))
+            for name in ordering
+        ]
+        self.queryset = queryset.order_by(*ordering)
+        if count_limit is None:
+            count_limit = getattr(settings, "PAGINATION_COUNT_LIMIT", 1000)
+        self.count_limit = count_limit
+
+    def _field(self, name: str):
+        if name == "pk":
+            return self.model._meta.pk
+        return self.model._meta.get_field(name)
+
+    @cached_property
+    def _bounded_count(self) -> int:
+        return self.queryset.order_by().values("pk")[: self.count_limit + 1].count()
+
+    @property
+    def count(self) -> int:
+        return min(self._bounded_count, self.count_limit)
+
+    @property
+    def count_is_capped(self) -> bool:
+        return self._bounded_count > self.count_limit
+
+    def cursor_for(self, obj) -> str:
+        values = []
+        for name, field, _ in self.keys:
+            value = getattr(obj, field.attname)
+            if isinstance(value, (datetime.date, datetime.time)):
+                value = value.isoformat()
+            values.append(value)
+        raw = json.dumps(values, separators=(",", ":")).encode("utf-8")
+        return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+    def decode_cursor(self, cursor: str) -> list:
+        try:
+            raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+            values = json.loads(raw)
+        except (binascii.Error, UnicodeDecodeError, ValueError):
+            raise InvalidCursor(cursor) from None
+        if not isinstance(values, list) or len(values) != len(self.keys):
+            raise InvalidCursor(cursor)
+        if not all(isinstance(value, (str, int, float)) for value in values):
+            raise InvalidCursor(cursor)
+        try:
+            return [field.to_python(value) for (_, field, _), value in zip(self.keys, values)]
+        except (TypeError, ValidationError, ValueError):
+            raise InvalidCursor(cursor) from None
+
+    def _seek(self, values: list, forward: bool) -> Q:
+        # (a, b) beyond (x, y) as "a <= x AND (a < x OR (a = x AND b < y))"
+        # for descending keys; the leading range lets the index seek directly.
+        def lookup(descending: bool, strict: bool) -> str:
+            before = descending == forward
+            return ("lt" if before else "gt") + ("" if strict else "e")
+
+        first_name, _, first_desc = self.keys[0]
+        condition = Q()
+        equal = Q()
+        for (name, _, descending), value in zip(self.keys, values):
+            condition |= equal & Q(**{f"{name}__{lookup(descending, True)}": value})
+            equal &= Q(**{name: value})
+        return Q(**{f"{first_name}__{lookup(first_desc, False)}": values[0]}) & condition
+
+    def get_page(self, *, after: str | None = None, before: str | None = None) -> KeysetPage:
+        """The page after or before a cursor; the first page for none or a bad one."""
+        try:
+            if after:
+                return self._page(self.decode_cursor(after), forward=True)
+            if before:
+                return self._page(self.decode_cursor(before), forward=False)
+        except InvalidCursor:
+            pass
+        rows = list(self.queryset[: self.per_page + 1])
+        return KeysetPage(
+            rows[: self.per_page], self, has_next=len(rows) > self.per_page, has_previous=False
+        )
+
+    def _page(self, values: list, forward: bool) -> KeysetPage:
+        queryset = self.queryset.filter(self._seek(values, forward))
+        if not forward:
+            queryset = queryset.reverse()
+        rows = list(queryset[: self.per_page + 1])
+        more = len(rows) > self.per_page
+        rows = rows[: self.per_page]
+        if forward:
+            return KeysetPage(rows, self, has_next=more, has_previous=True)
+        rows.reverse()
+        return KeysetPage(rows, self, has_next=True, has_previous=more)
+
+
+def paginate_by_key(request, queryset, per_page: int, ordering, **kwargs) -> KeysetPage:
+    """The page of ``queryset`` named by the request's ``after``/``before`` parameter."""
+    paginator = KeysetPaginator(queryset, per_page, ordering, **kwargs)
+    return paginator.get_page(after=request.GET.get("after"), before=request.GET.get("before"))
+
+
+class KeysetPaginationMixin:
+    """
+    Keyset pagination for a ``ListView``: set ``ordering`` (the tie-breaking
+    primary key is added) and ``paginate_by``. Templates get the usual
+    ``page_obj``, ``paginator`` and ``is_paginated``.
+    """
+
+    paginate_by = 50
+    ordering = ("-pk",)
+    count_limit = None
+
+    def paginate_queryset(self, queryset, page_size):
+        page = paginate_by_key(
+            self.request, queryset, page_size, self.get_ordering(), count_limit=self.count_limit
+        )
+        return page.paginator, page, page.object_list, page.has_other_pages()
@@ -1,3 +1,129 @@
-from django.test import TestCase
+import base64
+import datetime
+import hashlib
+import io
+import json
+import zipfile
+from decimal import Decimal
+from xml.etree import ElementTree
 
-# Create your tests here.
+from django.test import SimpleTestCase, TestCase
+
+from fleet.models import MaintenanceRecord, Vehicle
+
+from .exports import stream_csv, stream_xlsx
+from .pagination import InvalidCursor, KeysetPaginator
+
+SHEET_NS = {"s": "http://schemas.openxmlformats.org/spreadsheetml/2006/main"}
+
+
+class KeysetPaginatorTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        vehicle = Vehicle.objects.create(unit_number=1)
+        # Three records a day, so pages split runs of equal dates.
+        MaintenanceRecord.objects.bulk_create(
+            MaintenanceRecord(
+                vehicle=vehicle,
+                date=datetime.date(2024, 1, 1) + datetime.timedelta(days=i // 3),
+                description=f"record {i}",
+            )
+            for i in range(50)
+        )
+
+    def walk(self, paginator):
+        pages = [paginator.get_page()]
+        while pages[-1].has_next():
+            pages.append(paginator.get_page(after=pages[-1].next_cursor))
+        return pages
+
+    def test_forward_pages_match_ordering(self):
+        for ordering in (("date",), ("-date",)):
+            with self.subTest(ordering=ordering):
+                paginator = KeysetPaginator(MaintenanceRecord.objects.all(), 7, ordering)
+                pages = self.walk(paginator)
+                expected = list(
+                    MaintenanceRecord.objects.order_by(*ordering, ordering[0].replace("date", "pk"))
+                    .values_list("pk", flat=True)
+                )
+                self.assertEqual([record.pk for page in pages for record in page], expected)
+                self.assertEqual(len(pages), 8)
+                self.assertFalse(pages[0].has_previous())
+
+    def test_backward_pages_mirror_forward(self):
+        paginator = KeysetPaginator(MaintenanceRecord.objects.all(), 7, ("-date",))
+        pages = self.walk(paginator)
+        page = pages[-1]
+        for expected in reversed(pages[:-1]):
+            self.assertTrue(page.has_previous())
+            page = paginator.get_page(before=page.previous_cursor)
+            self.assertEqual(list(page), list(expected))
+        self.assertFalse(page.has_previous())
+
+    def test_bad_cursor_gives_first_page(self):
+        paginator = KeysetPaginator(MaintenanceRecord.objects.all(), 7, ("-date",))
+        self.assertEqual(list(paginator.get_page(after="not a cursor")), list(paginator.get_page()))
+
+    def test_malformed_cursor_values_are_rejected(self):
+        paginator = KeysetPaginator(MaintenanceRecord.objects.all(), 7, ("-date",))
+        for values in (["2024-01-01"], [["2024-01-01"], 1], [{"a": 1}, 1], ["not a date", 1], ["2024-01-01", "x"]):
+            cursor = base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+            with self.subTest(values=values):
+                with self.assertRaises(InvalidCursor):
+                    paginator.decode_cursor(cursor)
+                self.assertEqual(list(paginator.get_page(after=cursor)), list(paginator.get_page()))
+
+    def test_count_is_capped(self):
+        paginator = KeysetPaginator(MaintenanceRecord.objects.all(), 7, count_limit=20)
+        self.assertEqual(paginator.count, 20)
+        self.assertTrue(paginator.count_is_capped)
+        paginator = KeysetPaginator(MaintenanceRecord.objects.all(), 7, count_limit=100)
+        self.assertEqual(paginator.count, 50)
+        self.assertFalse(paginator.count_is_capped)
+
+
+class StreamCsvTests(SimpleTestCase):
+    def test_formula_text_is_quoted(self):
+        rows = [["=1+1", "+A1", "-B2", "@SUM(A1)", "plain", -5, None]]
+        data = b"".join(stream_csv(["a", "b", "c", "d", "e", "f", "g"], rows)).decode("utf-8-sig")
+        self.assertEqual(data.splitlines()[1], "'=1+1,'+A1,'-B2,'@SUM(A1),plain,-5,")
+
+
+class StreamXlsxTests(SimpleTestCase):
+    def cells(self, workbook: bytes):
+        with zipfile.ZipFile(io.BytesIO(workbook)) as archive:
+            self.assertIsNone(archive.testzip())
+            self.assertIn("xl/styles.xml", archive.namelist())
+            sheet = ElementTree.fromstring(archive.read("xl/worksheets/sheet1.xml"))
+        return [row.findall("s:c", SHEET_NS) for row in sheet.iterfind(".//s:row", SHEET_NS)]
+
+    def test_cell_types(self):
+        rows = [
+            [
+                "a & <b>\x01",
+                7,
+                Decimal("1.50"),
+                True,
+                None,
+                datetime.date(1900, 3, 1),
+                datetime.datetime(1900, 3, 1, 12, 0),
+            ]
+        ]
+        header, row = self.cells(b"".join(stream_xlsx("Sheet", ["h"] * 7, rows)))
+        self.assertEqual(header[0].get("s"), "3")
+        self.assertEqual(row[0].get("t"), "inlineStr")
+        self.assertEqual(row[0].findtext("s:is/s:t", namespaces=SHEET_NS), "a & <b>")
+        self.assertEqual(row[1].findtext("s:v", namespaces=SHEET_NS), "7")
+        self.assertEqual(row[2].findtext("s:v", namespaces=SHEET_NS), "1.50")
+        self.assertEqual((row[3].get("t"), row[3].findtext("s:v", namespaces=SHEET_NS)), ("b", "1"))
+        self.assertIsNone(row[4].find("s:v", SHEET_NS))
+        self.assertEqual((row[5].get("s"), row[5].findtext("s:v", namespaces=SHEET_NS)), ("1", "61"))
+        self.assertEqual((row[6].get("s"), row[6].findtext("s:v", namespaces=SHEET_NS)), ("2", "61.5"))
+
+    def test_streams_many_rows_in_chunks(self):
+        rows = ([i, hashlib.md5(str(i).encode()).hexdigest()] for i in range(5000))
+        chunks = list(stream_xlsx("Sheet", ["n", "digest"], rows, flush_bytes=1024))
+        self.assertGreater(len(chunks), 2)
+        rows = self.cells(b"".join(chunks))
+        self.assertEqual(len(rows), 5001)
+        self.assertEqual(rows[-1][0].findtext("s:v", namespaces=SHEET_NS), "4999")
@@ -47,6 +47,7 @@ INSTALLED_APPS = [
     'journeys',
     'flood',
     'mqtt_broker',
+    'mailqueue',
 ]
 
 MIDDLEWARE = [
@@ -137,6 +138,17 @@ LOGIN_URL = 'accounts:request_link'
 LOGIN_REDIRECT_URL = 'home'
 LOGOUT_REDIRECT_URL = 'home'
 
+# List pages are paged by key (?after=/?before=) rather than page number; the
+# total shown under each list stops counting at this many rows.
+PAGINATION_COUNT_LIMIT = int(os.getenv('PAGINATION_COUNT_LIMIT', '1000'))
+
+# Group membership used by role checks (accounts.roles) is cached for this
+# many seconds and cleared when memberships or groups change.
+ROLE_CACHE_SECONDS = int(os.getenv('ROLE_CACHE_SECONDS', '300'))
+
+# CSV/XLSX report exports are streamed, fetching this many rows at a time.
+EXPORT_CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', '2000'))
+
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -154,6 +166,20 @@ DEFAULT_FROM_EMAIL = os.getenv(
     f'no-reply@{LGA_DOMAIN}',
 )
 
+# Outbound mail queue. Magic links and defect updates are queued in the
+# database and sent by `manage.py send_queued_mail` in batches over one
+# connection; failures are retried after MAIL_QUEUE_RETRY_BASE_SECONDS,
+# doubling up to MAIL_QUEUE_RETRY_MAX_SECONDS, for MAIL_QUEUE_MAX_ATTEMPTS tries.
+# A worker claims each message for MAIL_QUEUE_CLAIM_SECONDS while sending it.
+# Bodies are blanked once sent, and sent and failed rows are deleted after
+# MAIL_QUEUE_RETENTION_DAYS.
+MAIL_QUEUE_BATCH_SIZE = int(os.getenv('MAIL_QUEUE_BATCH_SIZE', '100'))
+MAIL_QUEUE_MAX_ATTEMPTS = int(os.getenv('MAIL_QUEUE_MAX_ATTEMPTS', '8'))
+MAIL_QUEUE_RETRY_BASE_SECONDS = int(os.getenv('MAIL_QUEUE_RETRY_BASE_SECONDS', '60'))
+MAIL_QUEUE_RETRY_MAX_SECONDS = int(os.getenv('MAIL_QUEUE_RETRY_MAX_SECONDS', '3600'))
+MAIL_QUEUE_CLAIM_SECONDS = int(os.getenv('MAIL_QUEUE_CLAIM_SECONDS', '600'))
+MAIL_QUEUE_RETENTION_DAYS = int(os.getenv('MAIL_QUEUE_RETENTION_DAYS', '30'))
+
 
 # Simple JWT-like settings for email login
 
@@ -167,3 +193,91 @@ MQTT_BROKER_PORT = int(os.getenv('MQTT_BROKER_PORT', '1883'))
 
 # Optional Google Maps key for floodway map
 GOOGLE_MAPS_API_KEY = os.getenv('GOOGLE_MAPS_API_KEY', '')
+
+# Floodway uplink ingest tuning (run_flood_mqtt_listener --buffered)
+FLOOD_INGEST_BUFFERED = os.getenv('FLOOD_INGEST_BUFFERED', 'False').lower() in {'1', 'true', 'yes', 'on'}
+FLOOD_INGEST_BATCH_SIZE = int(os.getenv('FLOOD_INGEST_BATCH_SIZE', '200'))
+FLOOD_INGEST_FLUSH_INTERVAL = float(os.getenv('FLOOD_INGEST_FLUSH_INTERVAL', '1.0'))
+FLOOD_INGEST_QUEUE_SIZE = int(os.getenv('FLOOD_INGEST_QUEUE_SIZE', '10000'))
+FLOOD_INGEST_BACKPRESSURE = os.getenv('FLOOD_INGEST_BACKPRESSURE', 'block')
+
+# How often the listener re-checks FloodSite rows for changes, and how long
+# an unknown IMEI/handle is remembered before being looked up again (seconds).
+FLOOD_SITE_INDEX_REFRESH_INTERVAL = float(os.getenv('FLOOD_SITE_INDEX_REFRESH_INTERVAL', '30'))
+FLOOD_SITE_INDEX_NEGATIVE_TTL = float(os.getenv('FLOOD_SITE_INDEX_NEGATIVE_TTL', '60'))
+
+# Upper bound on points returned by /flood/api/history/; longer series are
+# downsampled (LTTB) so the response size stays bounded for any window.
+FLOOD_HISTORY_MAX_POINTS = int(os.getenv('FLOOD_HISTORY_MAX_POINTS', '2000'))
+
+# Raw uplink retention (prune_flood_uplinks). Uplinks older than the archive
+# age are moved to gzip'd NDJSON files under FLOOD_ARCHIVE_DIR; raw payloads
+# are cleared after the strip age. Set either to 0 to disable that step.
+FLOOD_ARCHIVE_DIR = os.getenv('FLOOD_ARCHIVE_DIR', os.path.join(BASE_DIR, 'archive'))
+FLOOD_RETENTION_ARCHIVE_DAYS = int(os.getenv('FLOOD_RETENTION_ARCHIVE_DAYS', '365'))
+FLOOD_RETENTION_STRIP_PAYLOAD_DAYS = int(os.getenv('FLOOD_RETENTION_STRIP_PAYLOAD_DAYS', '90'))
+# Longest window /flood/api/history/ serves at raw resolution; longer raw
+# requests get hourly rollups instead of reading every row and archive file.
+FLOOD_HISTORY_RAW_MAX_DAYS = int(os.getenv('FLOOD_HISTORY_RAW_MAX_DAYS', '31'))
+
+# Seconds a rendered /flood/api/ response is reused for identical requests.
+# Entries are keyed on the latest stored uplinks, so new readings are never
+# hidden by the cache.
+FLOOD_API_CACHE_SECONDS = int(os.getenv('FLOOD_API_CACHE_SECONDS', '30'))
+
+# Live map updates (/flood/api/stream/, requires an ASGI server). Seconds
+# between checks for new readings, and between keep-alive comments.
+FLOOD_STREAM_POLL_INTERVAL = float(os.getenv('FLOOD_STREAM_POLL_INTERVAL', '2'))
+FLOOD_STREAM_KEEPALIVE = float(os.getenv('FLOOD_STREAM_KEEPALIVE', '20'))
+
+# Uplink payload decoders, chosen per site via FloodSite.payload_profile.
+# Extra profiles are added here, e.g. for a 9-byte binary frame:
+#   {'sensor-v2': {'format': 'struct', 'layout': '<HHbI',
+#                  'fields': ['distance_mm', 'battery_v', 'signal_dbm', 'seq'],
+#                  'scale': {'battery_v': 0.001}},
+#    'vendor-json': {'format': 'json', 'keys': {'distance_mm': 'level'}}}
+FLOOD_PAYLOAD_PROFILES = {}
+FLOOD_DEFAULT_PAYLOAD_PROFILE = os.getenv('FLOOD_DEFAULT_PAYLOAD_PROFILE', 'json')
+
+# Durable ingest spool. When set, listeners append each uplink to segment
+# files here before acknowledging it and replay them into the database in
+# order, so readings survive a locked or unavailable database. FSYNC forces
+# every append to disk (slower, but also survives power loss).
+FLOOD_SPOOL_DIR = os.getenv('FLOOD_SPOOL_DIR', '')
+FLOOD_SPOOL_SEGMENT_BYTES = int(os.getenv('FLOOD_SPOOL_SEGMENT_BYTES', str(16 * 1024 * 1024)))
+FLOOD_SPOOL_FSYNC = os.getenv('FLOOD_SPOOL_FSYNC', 'False').lower() in {'1', 'true', 'yes', 'on'}
+
+# Drop retransmitted uplinks at ingest. Payloads with a device timestamp
+# (plus optional sequence number) are deduplicated for good; others by content
+# hash within the window (seconds). The cache holds this many recent readings.
+FLOOD_DEDUPE = os.getenv('FLOOD_DEDUPE', 'True').lower() in {'1', 'true', 'yes', 'on'}
+FLOOD_DEDUPE_CACHE_SIZE = int(os.getenv('FLOOD_DEDUPE_CACHE_SIZE', '100000'))
+FLOOD_DEDUPE_WINDOW = float(os.getenv('FLOOD_DEDUPE_WINDOW', '3600'))
+
+# Flood alerts, detected as uplinks are stored. A new level state must hold
+# for DEBOUNCE consecutive readings, and falling back towards normal must
+# clear the trigger by HYSTERESIS_MM. Changes into or out of high/high_high
+# are sent through each backend to FLOOD_ALERT_EMAILS (comma-separated) and
+# the site owner; run send_flood_alerts from cron to retry failures.
+FLOOD_ALERTS = os.getenv('FLOOD_ALERTS', 'True').lower() in {'1', 'true', 'yes', 'on'}
+FLOOD_ALERT_HYSTERESIS_MM = int(os.getenv('FLOOD_ALERT_HYSTERESIS_MM', '50'))
+FLOOD_ALERT_DEBOUNCE = int(os.getenv('FLOOD_ALERT_DEBOUNCE', '2'))
+FLOOD_ALERT_BACKENDS = ['flood.alerts.EmailBackend']
+FLOOD_ALERT_EMAILS = [
+    address.strip()
+    for address in os.getenv('FLOOD_ALERT_EMAILS', '').split(',')
+    if address.strip()
+]
+
+# Sensor health (update_flood_health, run from cron). A sensor is offline after
+# FLOOD_HEALTH_OFFLINE_FACTOR times its usual reporting interval (learned from
+# the last FLOOD_HEALTH_WINDOW_DAYS of uplinks), and its battery is failing
+# below FLOOD_HEALTH_BATTERY_MIN_V or when the trend reaches that voltage
+# within FLOOD_HEALTH_BATTERY_WARN_DAYS.
+FLOOD_HEALTH_WINDOW_DAYS = int(os.getenv('FLOOD_HEALTH_WINDOW_DAYS', '14'))
+FLOOD_HEALTH_MAX_SAMPLES = int(os.getenv('FLOOD_HEALTH_MAX_SAMPLES', '2000'))
+FLOOD_HEALTH_OFFLINE_FACTOR = float(os.getenv('FLOOD_HEALTH_OFFLINE_FACTOR', '3'))
+FLOOD_HEALTH_OFFLINE_MIN_MINUTES = int(os.getenv('FLOOD_HEALTH_OFFLINE_MIN_MINUTES', '60'))
+FLOOD_HEALTH_DEFAULT_OFFLINE_HOURS = int(os.getenv('FLOOD_HEALTH_DEFAULT_OFFLINE_HOURS', '12'))
+FLOOD_HEALTH_BATTERY_MIN_V = float(os.getenv('FLOOD_HEALTH_BATTERY_MIN_V', '3.3'))
+FLOOD_HEALTH_BATTERY_WARN_DAYS = float(os.getenv('FLOOD_HEALTH_BATTERY_WARN_DAYS', '14'))